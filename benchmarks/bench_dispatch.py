@@ -0,0 +1,36 @@
+"""Measures the cost of receiving a message with a Receiver that has many
+handlers. Each handler expects a different tag, and the message matches the
+last handler, so without a dispatch table every filter would be called."""
+
+
+import time
+
+import candygram as cg
+
+
+HANDLERS = [1, 10, 50]
+ROUNDS = 10000
+
+
+def measure(numHandlers):
+    """return seconds per send/receive pair"""
+    r = cg.Receiver()
+    for i in range(numHandlers):
+        r.addHandler(("tag%d" % i, int, cg.Any))
+    message = ("tag%d" % (numHandlers - 1), 1, None)
+    proc = cg.self()
+    start = time.time()
+    for i in xrange(ROUNDS):
+        proc.send(message)
+        r.receive()
+    return (time.time() - start) / ROUNDS
+
+
+def main():
+    for numHandlers in HANDLERS:
+        print "%3d handlers: %6.1f us/msg" % (numHandlers, measure(numHandlers) * 1e6)
+    # end for
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measures how an EXIT signal propagates from a hub process that is linked to
+many workers: how long the dying hub spends in Process._exit(), and how long
+until every worker has exited as well.
+"""
+
+
+import time
+
+import candygram as cg
+
+
+SIZES = [1000, 5000]
+
+
+class TimedProcess(cg.Process):
+
+    """records how long its _exit() takes"""
+
+    exitTime = None
+
+    def _exit(self, exitError):
+        start = time.time()
+        cg.Process._exit(self, exitError)
+        TimedProcess.exitTime = time.time() - start
+
+
+def idle():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def hub(proc, size):
+    for i in xrange(size):
+        cg.spawnLink(idle)
+    # end for
+    proc.send("linked")
+    idle()
+
+
+def measure(size):
+    """return seconds in hub's _exit(), and until all workers have exited"""
+    before = len(cg.processes())
+    TimedProcess.exitTime = None
+    proc = cg.spawn(hub, cg.self(), size, _processClass=TimedProcess)
+    r = cg.Receiver()
+    r.addHandler("linked")
+    r.receive()
+    start = time.time()
+    cg.exit(proc, "kill")
+    while len(cg.processes()) > before:
+        time.sleep(0.001)
+    # end while
+    elapsed = time.time() - start
+    while TimedProcess.exitTime is None:
+        time.sleep(0.001)
+    # end while
+    return TimedProcess.exitTime, elapsed
+
+
+def main():
+    for size in SIZES:
+        print "%5d links: hub's _exit() %8.1f ms, all exited %8.1f ms" % (
+            (size,) + tuple(t * 1000 for t in measure(size))
+        )
+    # end for
+
+
+if __name__ == "__main__":
+    main()
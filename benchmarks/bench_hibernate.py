@@ -0,0 +1,94 @@
+"""Compares the OS threads and memory used by idle processes that wait in
+receive() with those of idle processes that hibernate, and measures how quickly
+hibernating processes can be woken up.
+
+Thread counts and memory usage are read from /proc/self/status, so they are only
+reported on Linux.
+"""
+
+
+import time
+
+import candygram as cg
+
+
+NUM_PROCS = 1000
+NUM_WAKEUPS = 5000
+
+
+def waiter():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def sleeper():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    cg.hibernate(r)
+
+
+def echo(count=0):
+    r = cg.Receiver()
+    r.addHandler(("ping", cg.Process), pong, cg.Message)
+    r.addHandler("stop")
+    cg.hibernate(r)
+
+
+def pong(message):
+    message[1].send("pong")
+    echo()
+
+
+def status(field):
+    """return value of field in /proc/self/status, or None"""
+    try:
+        for line in open("/proc/self/status"):
+            if line.startswith(field + ":"):
+                return line.split(":", 1)[1].strip()
+            # end if
+        # end for
+    except IOError:
+        pass
+    # end try
+    return None
+
+
+def idle(func):
+    """return thread count and memory usage with NUM_PROCS idle processes"""
+    procs = [cg.spawn(func) for i in xrange(NUM_PROCS)]
+    # Give the processes a chance to start waiting.
+    time.sleep(1)
+    result = status("Threads"), status("VmRSS")
+    for proc in procs:
+        proc.send("stop")
+    # end for
+    time.sleep(1)
+    return result
+
+
+def wakeups():
+    """return round trips per second to a hibernating process"""
+    proc = cg.spawn(echo)
+    r = cg.Receiver()
+    r.addHandler("pong")
+    start = time.time()
+    for i in xrange(NUM_WAKEUPS):
+        proc.send(("ping", cg.self()))
+        r.receive()
+    # end for
+    elapsed = time.time() - start
+    proc.send("stop")
+    return NUM_WAKEUPS / elapsed
+
+
+def main():
+    print "%d processes in receive():  %s threads, %s" % ((NUM_PROCS,) + idle(waiter))
+    print "%d processes in hibernate(): %s threads, %s" % (
+        (NUM_PROCS,) + idle(sleeper)
+    )
+    print "hibernate() round trips:       %8d/sec" % wakeups()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compares watching many processes with link() and trap_exit against
+watching them with monitor(): the cost of setting up the watch, and of being
+told that every watched process has exited.
+"""
+
+
+import time
+
+import candygram as cg
+
+
+NUM_PROCS = 1000
+
+
+def idle():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def watch(setUp, pattern):
+    """return setup and notification times for NUM_PROCS processes"""
+    procs = [cg.spawn(idle) for i in xrange(NUM_PROCS)]
+    start = time.time()
+    for proc in procs:
+        setUp(proc)
+    # end for
+    setUpTime = time.time() - start
+    r = cg.Receiver()
+    r.addHandler(pattern)
+    start = time.time()
+    for proc in procs:
+        proc.send("stop")
+    # end for
+    for proc in procs:
+        r.receive()
+    # end for
+    return setUpTime, time.time() - start
+
+
+def main():
+    cg.processFlag("trap_exit", True)
+    setUpTime, exitTime = watch(cg.link, ("EXIT", cg.Process, cg.Any))
+    cg.processFlag("trap_exit", False)
+    print "link():    set up %6.3f sec, %6.3f sec until all exited" % (
+        setUpTime,
+        exitTime,
+    )
+    setUpTime, exitTime = watch(cg.monitor, ("DOWN", cg.Reference, cg.Process, cg.Any))
+    print "monitor(): set up %6.3f sec, %6.3f sec until all exited" % (
+        setUpTime,
+        exitTime,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compares CPU-bound processes spawned with candygram.spawn(), which share one
+interpreter, with processes spawned with candygram.multiproc.spawn(), which
+run in child interpreters.
+
+Only the latter can use more than one processor, so the difference depends on
+the number of processors available.
+"""
+
+
+import time
+
+import candygram as cg
+from candygram import multiproc
+
+
+NUM_PROCESSES = 4
+ITERATIONS = 2000000
+
+
+def burn(proc, iterations):
+    total = 0
+    for i in xrange(iterations):
+        total += i
+    # end for
+    proc.send(("done", total))
+
+
+def measure(spawn):
+    """return seconds taken by NUM_PROCESSES processes spawned with spawn"""
+    r = cg.Receiver()
+    r.addHandler(("done", cg.Any))
+    start = time.time()
+    for i in xrange(NUM_PROCESSES):
+        spawn(burn, cg.self(), ITERATIONS)
+    # end for
+    for i in xrange(NUM_PROCESSES):
+        r.receive()
+    # end for
+    return time.time() - start
+
+
+def main():
+    print "candygram.spawn():            %6.2f sec" % measure(cg.spawn)
+    print "candygram.multiproc.spawn():  %6.2f sec" % measure(multiproc.spawn)
+
+
+if __name__ == "__main__":
+    main()
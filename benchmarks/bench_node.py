@@ -0,0 +1,50 @@
+"""Measures message round trips between two processes, both within one node
+and between two Nodes connected over TCP on localhost.
+"""
+
+
+import time
+
+import candygram as cg
+from candygram.node import Node
+
+
+NUM_ROUND_TRIPS = 5000
+
+
+def echo():
+    r = cg.Receiver()
+    r.addHandler((cg.Process, int), lambda m: m[0].send(m[1]), cg.Message)
+    for _ in r:
+        pass
+    # end for
+
+
+def measure(proc):
+    """return round trips per second to echo process proc"""
+    r = cg.Receiver()
+    r.addHandler(int)
+    me = cg.self()
+    start = time.time()
+    for i in xrange(NUM_ROUND_TRIPS):
+        proc.send((me, i))
+        r.receive()
+    # end for
+    return NUM_ROUND_TRIPS / (time.time() - start)
+
+
+def main():
+    local = cg.spawn(echo)
+    print "local process:   %8d round trips/sec" % measure(local)
+    a = Node("a")
+    b = Node("b")
+    b.register("echo", local)
+    remote = a.whereis(b.address, "echo")
+    print "remote process:  %8d round trips/sec" % measure(remote)
+    a.stop()
+    b.stop()
+    cg.exit(local, "kill")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Compares the cost of matching with closure filters (genFilter()) and with
+compiled filters (compileFilter()) for each kind of pattern."""
+
+
+import timeit
+
+import candygram as cg
+from candygram.pattern import genFilter, compileFilter
+
+
+# (name, pattern, matching message)
+CASES = [
+    ("value", "land shark", "land shark"),
+    ("type", int, 42),
+    ("tuple2", (str, int), ("shark", 42)),
+    ("tuple4", ("tag", cg.Process, int, cg.Any), ("tag", cg.self(), 1, None)),
+    ("list", ["tag", int], ["tag", 1, 2, 3, 4]),
+    ("nested", ("tag", (int, int), [str]), ("tag", (1, 2), ["a", "b"])),
+    ("dict", {"id": int, "name": str}, {"id": 1, "name": "shark"}),
+]
+NUMBER = 100000
+
+
+def measure(filter_, message):
+    """return seconds per call of filter_(message)"""
+    timer = timeit.Timer(lambda: filter_(message))
+    return min(timer.repeat(3, NUMBER)) / NUMBER
+
+
+def main():
+    for name, pattern, message in CASES:
+        closureFilter = genFilter(pattern)
+        compiledFilter = compileFilter(pattern)
+        assert closureFilter(message) and compiledFilter(message)
+        closure = measure(closureFilter, message)
+        compiled = measure(compiledFilter, message)
+        print "%-8s closure %6.3f us, compiled %6.3f us (%.1fx)" % (
+            name,
+            closure * 1e6,
+            compiled * 1e6,
+            closure / compiled,
+        )
+    # end for
+    closure = min(timeit.Timer(lambda: genFilter(CASES[3][1])).repeat(3, 10000))
+    compiled = min(timeit.Timer(lambda: compileFilter(CASES[3][1])).repeat(3, 10000))
+    print "generating tuple4: closure %.1f us, compiled (cached) %.1f us" % (
+        closure * 100,
+        compiled * 100,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compares running short tasks on a Pool with spawning a new process for each
+task, both for a batch of concurrent tasks and for one task at a time.
+"""
+
+
+import time
+
+import candygram as cg
+from candygram.pool import Pool
+
+
+NUM_TASKS = 5000
+
+
+def task(x):
+    return x
+
+
+def runTask(proc, x):
+    proc.send(("result", x, task(x)))
+
+
+def spawnBatch():
+    r = cg.Receiver()
+    r.addHandler(("result", int, cg.Any), lambda m: m[2], cg.Message)
+    for i in xrange(NUM_TASKS):
+        cg.spawn(runTask, cg.self(), i)
+    # end for
+    for i in xrange(NUM_TASKS):
+        r.receive()
+    # end for
+
+
+def spawnSequential():
+    for i in xrange(NUM_TASKS):
+        cg.spawn(runTask, cg.self(), i)
+        r = cg.Receiver()
+        r.addHandler(("result", i, cg.Any), lambda m: m[2], cg.Message)
+        r.receive()
+    # end for
+
+
+def poolBatch(pool):
+    pool.map(task, xrange(NUM_TASKS))
+
+
+def poolSequential(pool):
+    for i in xrange(NUM_TASKS):
+        pool.call(task, i)
+    # end for
+
+
+def measure(func, *args):
+    """return tasks per second"""
+    start = time.time()
+    func(*args)
+    return NUM_TASKS / (time.time() - start)
+
+
+def main():
+    print "spawn() per task, batch:       %8d tasks/sec" % measure(spawnBatch)
+    print "spawn() per task, sequential:  %8d tasks/sec" % measure(spawnSequential)
+    for strategy in ("round_robin", "least_loaded"):
+        pool = Pool(4, strategy)
+        print "Pool.map() (%s):%s %8d tasks/sec" % (
+            strategy,
+            " " * (18 - len(strategy)),
+            measure(poolBatch, pool),
+        )
+        print "Pool.call() (%s):%s %8d tasks/sec" % (
+            strategy,
+            " " * (17 - len(strategy)),
+            measure(poolSequential, pool),
+        )
+        pool.stop()
+    # end for
+
+
+if __name__ == "__main__":
+    main()
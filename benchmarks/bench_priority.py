@@ -0,0 +1,90 @@
+"""Compares receiving by priority with handlers registered with the _priority
+argument against the PriorityReceiver of examples/priority_receiver.py, which
+chains one Receiver per priority level and calls receive(0) on each in turn.
+
+'mixed' sends a batch of messages of random priorities and then receives all of
+them. 'urgent' keeps a backlog of low priority messages in the mailbox and
+times receiving a high priority message that is sent behind it.
+"""
+
+
+import os
+import random
+import sys
+import time
+
+import candygram as cg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "examples"))
+from priority_receiver import PriorityReceiver
+
+
+LEVELS = ["high", "mid", "low"]
+NUM_MESSAGES = 20000
+BACKLOGS = [100, 1000, 10000]
+NUM_URGENT = 2000
+
+
+def chained():
+    """return a PriorityReceiver for LEVELS"""
+    receivers = []
+    for level in LEVELS:
+        r = cg.Receiver()
+        r.addHandler((level, int), lambda m: m, cg.Message)
+        receivers.append(r)
+    # end for
+    return PriorityReceiver(receivers)
+
+
+def prioritized():
+    """return a Receiver whose handlers have priorities for LEVELS"""
+    r = cg.Receiver()
+    for i, level in enumerate(LEVELS):
+        r.addHandler((level, int), lambda m: m, cg.Message, _priority=len(LEVELS) - i)
+    # end for
+    return r
+
+
+def mixed(receiver):
+    """return microseconds per message to receive a batch of random priorities"""
+    rand = random.Random(42)
+    cg.self().sendMany([(rand.choice(LEVELS), i) for i in xrange(NUM_MESSAGES)])
+    start = time.time()
+    for i in xrange(NUM_MESSAGES):
+        receiver.receive()
+    # end for
+    return (time.time() - start) / NUM_MESSAGES * 1e6
+
+
+def urgent(receiver, backlog):
+    """return microseconds to receive a high priority message behind a backlog"""
+    me = cg.self()
+    me.sendMany([("low", i) for i in xrange(backlog)])
+    start = time.time()
+    for i in xrange(NUM_URGENT):
+        me.send(("high", i))
+        message = receiver.receive()
+    # end for
+    elapsed = time.time() - start
+    assert message == ("high", NUM_URGENT - 1)
+    for i in xrange(backlog):
+        receiver.receive()
+    # end for
+    return elapsed / NUM_URGENT * 1e6
+
+
+def main():
+    cg.self()
+    print "%-24s %12s %12s" % ("", "chained", "_priority")
+    print "%-24s %9.2f us %9.2f us" % ("mixed", mixed(chained()), mixed(prioritized()))
+    for backlog in BACKLOGS:
+        print "%-24s %9.2f us %9.2f us" % (
+            "urgent, %d backlog" % backlog,
+            urgent(chained(), backlog),
+            urgent(prioritized(), backlog),
+        )
+    # end for
+
+
+if __name__ == "__main__":
+    main()
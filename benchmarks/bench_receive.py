@@ -0,0 +1,42 @@
+"""Compares message throughput of Receiver.receive() and Receiver.receiveMany().
+
+The mailbox of the current process is filled up front, so only the cost of
+receiving is measured.
+"""
+
+
+import time
+
+import candygram as cg
+
+
+NUM_MESSAGES = 100000
+BATCH_SIZES = [10, 100, 1000]
+
+
+def measure(batchSize):
+    """return messages per second, receiving batchSize messages at a time"""
+    cg.self().sendMany(xrange(NUM_MESSAGES))
+    r = cg.Receiver()
+    r.addHandler(int)
+    start = time.time()
+    if batchSize == 1:
+        for i in xrange(NUM_MESSAGES):
+            r.receive()
+        # end for
+    else:
+        for i in xrange(NUM_MESSAGES / batchSize):
+            r.receiveMany(batchSize)
+        # end for
+    return NUM_MESSAGES / (time.time() - start)
+
+
+def main():
+    print "receive():          %9d msgs/sec" % measure(1)
+    for batchSize in BATCH_SIZES:
+        print "receiveMany(%4d):  %9d msgs/sec" % (batchSize, measure(batchSize))
+    # end for
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Measures selective receive against a mailbox full of unmatched messages.
+
+A receiver whose patterns all start with a literal tag only inspects messages
+filed under that tag, so its cost should not grow with the depth of the
+mailbox. A pattern without a literal first element has to scan every message,
+and is included for comparison. As in the example programs, a new Receiver is
+created for every receive, so no Receiver can skip messages it scanned before.
+"""
+
+
+import time
+
+import candygram as cg
+
+
+DEPTHS = [0, 100, 1000, 10000]
+ROUNDS = 1000
+
+
+def clearMailbox():
+    r = cg.Receiver()
+    r.addHandler(cg.Any)
+    while r.receive(0, lambda: False) is not False:
+        pass
+    # end while
+
+
+def measure(pattern, depth):
+    """return seconds per send/receive pair with depth unmatched messages"""
+    proc = cg.self()
+    clearMailbox()
+    for i in xrange(depth):
+        proc.send(("noise", i))
+    start = time.time()
+    for i in xrange(ROUNDS):
+        proc.send(("wanted", i))
+        r = cg.Receiver()
+        r.addHandler(pattern)
+        r.receive()
+    result = (time.time() - start) / ROUNDS
+    clearMailbox()
+    return result
+
+
+def main():
+    for depth in DEPTHS:
+        indexed = measure(("wanted", int), depth)
+        scanned = measure((lambda x: x == "wanted", int), depth)
+        print "depth %6d: indexed %8.1f us/msg, scanned %8.1f us/msg" % (
+            depth,
+            indexed * 1e6,
+            scanned * 1e6,
+        )
+    # end for
+
+
+if __name__ == "__main__":
+    main()
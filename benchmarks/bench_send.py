@@ -0,0 +1,65 @@
+"""Compares message throughput of Process.send(), Process.sendMany() and
+sending to a registered name.
+
+The messages are sent to a process that is waiting for a message that never
+comes, so only the cost of sending is measured.
+"""
+
+
+import time
+
+import candygram as cg
+
+
+NUM_MESSAGES = 100000
+BATCH_SIZES = [10, 100, 1000]
+
+
+def idle():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def measure(batchSize):
+    """return messages per second, sending batchSize messages at a time"""
+    proc = cg.spawn(idle)
+    start = time.time()
+    if batchSize == 1:
+        for i in xrange(NUM_MESSAGES):
+            proc.send(i)
+        # end for
+    else:
+        batch = range(batchSize)
+        for i in xrange(NUM_MESSAGES / batchSize):
+            proc.sendMany(batch)
+        # end for
+    result = NUM_MESSAGES / (time.time() - start)
+    cg.exit(proc, "kill")
+    return result
+
+
+def measureByName():
+    """return messages per second, sending to a registered name"""
+    proc = cg.spawn(idle)
+    cg.register("idle", proc)
+    send = cg.send
+    start = time.time()
+    for i in xrange(NUM_MESSAGES):
+        send("idle", i)
+    # end for
+    result = NUM_MESSAGES / (time.time() - start)
+    cg.exit(proc, "kill")
+    return result
+
+
+def main():
+    print "send():          %9d msgs/sec" % measure(1)
+    print "send(name):      %9d msgs/sec" % measureByName()
+    for batchSize in BATCH_SIZES:
+        print "sendMany(%4d):  %9d msgs/sec" % (batchSize, measure(batchSize))
+    # end for
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Measures the per-call cost of the API calls that a process makes in a tight
+message loop, which is where checking for pending signals used to add up:
+Process.send() to an idle process, send() by registered name, and a send() to
+the current process followed by a receive().
+"""
+
+
+import time
+
+import candygram as cg
+
+
+NUM_MESSAGES = 200000
+
+
+def idle():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def measureSend(send, target):
+    """return microseconds per call of send(target, i)"""
+    start = time.time()
+    for i in xrange(NUM_MESSAGES):
+        send(target, i)
+    # end for
+    return (time.time() - start) / NUM_MESSAGES * 1e6
+
+
+def measureRoundTrip():
+    """return microseconds per send() to current process and receive()"""
+    me = cg.self()
+    r = cg.Receiver()
+    r.addHandler(int)
+    start = time.time()
+    for i in xrange(NUM_MESSAGES):
+        me.send(i)
+        r.receive()
+    # end for
+    return (time.time() - start) / NUM_MESSAGES * 1e6
+
+
+def main():
+    proc = cg.spawn(idle)
+    cg.register("idle", proc)
+    print "Process.send():     %6.3f us/msg" % measureSend(cg.Process.send, proc)
+    print "send(name):         %6.3f us/msg" % measureSend(cg.send, "idle")
+    proc.send("stop")
+    print "send()+receive():   %6.3f us/msg" % measureRoundTrip()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Measures what mailbox statistics cost: message throughput of sending to the
+current process and receiving again, with the 'stats' process flag cleared and
+with it set.
+"""
+
+
+import time
+
+import candygram as cg
+
+
+NUM_MESSAGES = 100000
+BATCH_SIZE = 100
+
+
+def measure(recordStats):
+    """return messages per second sent and received one at a time, and sent and
+    received in batches of BATCH_SIZE"""
+    cg.processFlag("stats", recordStats)
+    me = cg.self()
+    r = cg.Receiver()
+    r.addHandler(int)
+    start = time.time()
+    for i in xrange(NUM_MESSAGES):
+        me.send(i)
+        r.receive()
+    # end for
+    single = NUM_MESSAGES / (time.time() - start)
+    batch = range(BATCH_SIZE)
+    start = time.time()
+    for i in xrange(NUM_MESSAGES / BATCH_SIZE):
+        me.sendMany(batch)
+        r.receiveMany(BATCH_SIZE)
+    # end for
+    batched = NUM_MESSAGES / (time.time() - start)
+    cg.processFlag("stats", False)
+    return single, batched
+
+
+def main():
+    for recordStats in (False, True):
+        single, batched = measure(recordStats)
+        print "stats %-5s  send+receive: %8d msgs/sec  batches of %d: %8d msgs/sec" % (
+            recordStats,
+            single,
+            BATCH_SIZE,
+            batched,
+        )
+    # end for
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measures how quickly a supervisor restarts crashed children: the latency of
+restarting a single child, and the time to recover from a storm in which every
+child crashes at once, for each restart strategy.
+"""
+
+
+import time
+
+import candygram as cg
+from candygram.supervisor import Supervisor, ChildSpec
+
+
+NUM_RESTARTS = 1000
+STORM_SIZES = [10, 100, 1000]
+
+
+def child(proc):
+    proc.send(("started", cg.self()))
+    r = cg.Receiver()
+    r.addHandler("crash", cg.exit, "crashed")
+    r.receive()
+
+
+def startedReceiver():
+    r = cg.Receiver()
+    r.addHandler(("started", cg.Process), lambda m: m[1], cg.Message)
+    return r
+
+
+def latency():
+    """return average seconds from a crash until the child runs again"""
+    spec = ChildSpec("child", child, (cg.self(),))
+    sup = Supervisor([spec], maxRestarts=NUM_RESTARTS)
+    r = startedReceiver()
+    proc = r.receive()
+    start = time.time()
+    for i in xrange(NUM_RESTARTS):
+        proc.send("crash")
+        proc = r.receive()
+    # end for
+    result = (time.time() - start) / NUM_RESTARTS
+    sup.stop()
+    return result
+
+
+def storm(strategy, size):
+    """return seconds from all size children crashing until all run again"""
+    specs = [ChildSpec(i, child, (cg.self(),)) for i in xrange(size)]
+    sup = Supervisor(specs, strategy, maxRestarts=size)
+    r = startedReceiver()
+    procs = [r.receive() for i in xrange(size)]
+    start = time.time()
+    for proc in procs:
+        proc.send("crash")
+    # end for
+    if strategy == "one_for_one":
+        restarts = size
+    else:
+        # Children that are terminated before they crash are restarted once; the
+        # rest may be restarted several times over. Wait until things settle.
+        restarts = None
+    # end if
+    if restarts is None:
+        while r.receive(200, lambda: None) is not None:
+            pass
+        # end while
+        elapsed = time.time() - start - 0.2
+    else:
+        for i in xrange(restarts):
+            r.receive()
+        # end for
+        elapsed = time.time() - start
+    sup.stop()
+    return elapsed
+
+
+def main():
+    cg.processFlag("trap_exit", True)
+    print "restart latency:                 %8.3f ms" % (latency() * 1000)
+    for strategy in ("one_for_one", "one_for_all", "rest_for_one"):
+        for size in STORM_SIZES:
+            print "storm of %4d crashes (%s):%s %8.3f ms" % (
+                size,
+                strategy,
+                " " * (12 - len(strategy)),
+                storm(strategy, size) * 1000,
+            )
+        # end for
+    # end for
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measures the cost of scheduling and cancelling timeouts, as every timed
+receive() does, with different numbers of long timeouts already pending, and the
+throughput of sendAfter() with short delays.
+"""
+
+
+import time
+
+import candygram as cg
+from candygram import threadimpl
+
+
+NUM_TIMERS = 100000
+PENDING = [0, 10000, 100000]
+NUM_MESSAGES = 10000
+
+
+def noop():
+    pass
+
+
+def scheduleAndCancel(pending):
+    """return timers per second scheduled and then cancelled"""
+    background = [threadimpl.callLater(3600 + i, noop) for i in xrange(pending)]
+    callLater = threadimpl.callLater
+    start = time.time()
+    for i in xrange(NUM_TIMERS):
+        callLater(60, noop).cancel()
+    # end for
+    result = NUM_TIMERS / (time.time() - start)
+    for timer in background:
+        timer.cancel()
+    # end for
+    return result
+
+
+def sendAfter():
+    """return messages per second delivered by sendAfter()"""
+    me = cg.self()
+    start = time.time()
+    for i in xrange(NUM_MESSAGES):
+        cg.sendAfter(i % 10, me, i)
+    # end for
+    r = cg.Receiver()
+    r.addHandler(int)
+    for i in xrange(NUM_MESSAGES):
+        r.receive()
+    # end for
+    return NUM_MESSAGES / (time.time() - start)
+
+
+def main():
+    cg.self()
+    for pending in PENDING:
+        print "schedule+cancel, %6d pending: %8d timers/sec" % (
+            pending,
+            scheduleAndCancel(pending),
+        )
+    # end for
+    print "sendAfter():                     %8d msgs/sec" % sendAfter()
+
+
+if __name__ == "__main__":
+    main()
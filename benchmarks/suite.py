@@ -0,0 +1,356 @@
+"""Benchmark suite for Candygram's core primitives.
+
+Runs each benchmark below and prints its results, or writes them as JSON so
+that runs can be compared. Comparing a run against an earlier one reports every
+result that got worse by more than the tolerance, and exits with status 1 if
+there were any:
+
+    python benchmarks/suite.py -o baseline.json
+    ... change something ...
+    python benchmarks/suite.py --compare baseline.json
+
+Each benchmark is a generator of (name, value, unit) results. A result whose
+unit ends in '/sec' is better when it is higher; any other is better when it is
+lower. The bench_*.py scripts in this directory compare alternative
+implementations of a single feature; this suite tracks the hot paths over time.
+"""
+
+
+import json
+import optparse
+import platform
+import sys
+import time
+
+import candygram as cg
+from candygram.pattern import compileFilter
+
+
+def idle():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def echo():
+    r = cg.Receiver()
+    r.addHandler((cg.Process, int), lambda m: m[0].send(m[1]), cg.Message)
+    r.addHandler("stop", lambda: False)
+    while r.receive() is not False:
+        pass
+    # end while
+
+
+def sendBack(proc):
+    proc.send("started")
+
+
+def spawnLatency(count=2000):
+    """time spent in spawn(), and from spawn() until the process runs"""
+    start = time.time()
+    procs = [cg.spawn(idle) for i in xrange(count)]
+    yield "spawn", (time.time() - start) / count * 1e6, "us"
+    for proc in procs:
+        proc.send("stop")
+    # end for
+    me = cg.self()
+    r = cg.Receiver()
+    r.addHandler("started")
+    start = time.time()
+    for i in xrange(count):
+        cg.spawn(sendBack, me)
+        r.receive()
+    # end for
+    yield "spawn_until_running", (time.time() - start) / count * 1e6, "us"
+
+
+def pingPong(count=20000):
+    """round trip of a message to another process and back, like program_5.x"""
+    proc = cg.spawn(echo)
+    me = cg.self()
+    r = cg.Receiver()
+    r.addHandler(int)
+    start = time.time()
+    for i in xrange(count):
+        proc.send((me, i))
+        r.receive()
+    # end for
+    yield "ping_pong", (time.time() - start) / count * 1e6, "us"
+    proc.send("stop")
+
+
+def fanOutFanIn(sizes=(10, 100), rounds=200):
+    """send a message to each of many processes and collect their replies"""
+    me = cg.self()
+    r = cg.Receiver()
+    r.addHandler(int)
+    for size in sizes:
+        procs = [cg.spawn(echo) for i in xrange(size)]
+        start = time.time()
+        for i in xrange(rounds):
+            for proc in procs:
+                proc.send((me, i))
+            # end for
+            for proc in procs:
+                r.receive()
+            # end for
+        # end for
+        yield "fan_out_in_%d" % size, size * rounds / (time.time() - start), "msgs/sec"
+        for proc in procs:
+            proc.send("stop")
+        # end for
+    # end for
+
+
+def selectiveReceive(depths=(1000, 10000), count=1000):
+    """receive a message that sits behind a deep backlog of unmatched ones"""
+    me = cg.self()
+    for name, pattern in [
+        ("indexed", ("wanted", int)),
+        ("scanned", (lambda x: x == "wanted", int)),
+    ]:
+        for depth in depths:
+            # The backlog is of tuples, so an indexed pattern skips all of it.
+            me.sendMany(("unwanted", i) for i in xrange(depth))
+            r = cg.Receiver()
+            r.addHandler(pattern)
+            start = time.time()
+            for i in xrange(count):
+                me.send(("wanted", i))
+                r.receive()
+            # end for
+            yield "selective_%s_%d" % (name, depth), (
+                time.time() - start
+            ) / count * 1e6, "us"
+            drain = cg.Receiver()
+            drain.addHandler(("unwanted", int))
+            drain.receiveMany(depth)
+        # end for
+    # end for
+
+
+# (name, pattern, matching message) for each shape of pattern
+PATTERNS = [
+    ("any", cg.Any, "shark"),
+    ("value", "land shark", "land shark"),
+    ("type", int, 42),
+    ("func", lambda x: x > 0, 42),
+    ("tuple", ("tag", str, int, cg.Any), ("tag", "shark", 1, None)),
+    ("list", ["tag", int], ["tag", 1, 2, 3, 4]),
+    ("nested", ("tag", (int, int), [str]), ("tag", (1, 2), ["a", "b"])),
+    ("dict", {"id": int, "name": str}, {"id": 1, "name": "shark"}),
+]
+
+
+def patternMatch(count=100000, repeat=3):
+    """call the compiled filter of each shape of pattern on a matching message"""
+    for name, pattern, message in PATTERNS:
+        filter_ = compileFilter(pattern)
+        assert filter_(message)
+        best = None
+        for i in xrange(repeat):
+            start = time.time()
+            for j in xrange(count):
+                filter_(message)
+            # end for
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+            # end if
+        # end for
+        yield "pattern_%s" % name, best / count * 1e9, "ns"
+    # end for
+
+
+def chainLink(next_, proc):
+    """link to next_ process, tell proc, and wait until an EXIT signal kills us"""
+    cg.link(next_)
+    proc.send("linked")
+    idle()
+
+
+def exitStorm(size=1000):
+    """propagate an EXIT signal through linked processes"""
+    cg.processFlag("trap_exit", True)
+    try:
+        me = cg.self()
+        r = cg.Receiver()
+        r.addHandler(("EXIT", cg.Process, cg.Any))
+        linked = cg.Receiver()
+        linked.addHandler("linked")
+        # A star: many processes linked to one that dies
+        hub = cg.spawnLink(idle)
+        for i in xrange(size):
+            cg.spawnLink(chainLink, hub, me)
+            linked.receive()
+        # end for
+        start = time.time()
+        cg.exit(hub, "kill")
+        for i in xrange(size + 1):
+            r.receive()
+        # end for
+        yield "exit_star_%d" % size, (time.time() - start) * 1000, "ms"
+        # A chain: each process linked to the one before it
+        proc = me
+        for i in xrange(size):
+            proc = cg.spawn(chainLink, proc, me)
+            linked.receive()
+        # end for
+        start = time.time()
+        cg.exit(proc, "kill")
+        r.receive()
+        yield "exit_chain_%d" % size, (time.time() - start) * 1000, "ms"
+    finally:
+        cg.processFlag("trap_exit", False)
+    # end try
+
+
+def timeoutAccuracy(timeouts=(1, 10, 50), count=20):
+    """how late a receive() with a timeout returns"""
+    r = cg.Receiver()
+    r.addHandler("never")
+    for timeout in timeouts:
+        lateness = []
+        for i in xrange(count):
+            start = time.time()
+            r.receive(timeout)
+            lateness.append((time.time() - start) * 1000 - timeout)
+        # end for
+        yield "timeout_%dms_mean_late" % timeout, sum(lateness) / count, "ms"
+        yield "timeout_%dms_max_late" % timeout, max(lateness), "ms"
+    # end for
+
+
+BENCHMARKS = [
+    ("spawn", spawnLatency),
+    ("ping_pong", pingPong),
+    ("fan_out_in", fanOutFanIn),
+    ("selective", selectiveReceive),
+    ("pattern", patternMatch),
+    ("exit", exitStorm),
+    ("timeout", timeoutAccuracy),
+]
+
+
+def higherIsBetter(unit):
+    return unit.endswith("/sec")
+
+
+def run(names, out):
+    """run the named benchmarks (all if names is empty); return list of result
+    dictionaries"""
+    unknown = set(names) - set(name for name, benchmark in BENCHMARKS)
+    if unknown:
+        raise SystemExit("unknown benchmark: %s" % ", ".join(sorted(unknown)))
+    results = []
+    for group, benchmark in BENCHMARKS:
+        if names and group not in names:
+            continue
+        for name, value, unit in benchmark():
+            results.append({"name": name, "value": value, "unit": unit})
+            if out is not None:
+                out.write("%-28s %12.3f %s\n" % (name, value, unit))
+                out.flush()
+            # end if
+        # end for
+    # end for
+    return results
+
+
+def compare(results, baseline, tolerance, out):
+    """report results that are worse than baseline's by more than tolerance;
+    return number of them"""
+    old = dict((result["name"], result) for result in baseline["results"])
+    regressions = 0
+    for result in results:
+        previous = old.get(result["name"])
+        if previous is None or previous["unit"] != result["unit"]:
+            continue
+        if not previous["value"] or not result["value"]:
+            continue
+        if higherIsBetter(result["unit"]):
+            change = previous["value"] / result["value"] - 1
+        else:
+            change = result["value"] / previous["value"] - 1
+        if change > tolerance:
+            regressions += 1
+            out.write(
+                "REGRESSION %-28s %12.3f -> %12.3f %s (%+.0f%%)\n"
+                % (
+                    result["name"],
+                    previous["value"],
+                    result["value"],
+                    result["unit"],
+                    change * 100,
+                )
+            )
+        # end if
+    # end for
+    return regressions
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="%prog [options] [benchmark...]")
+    parser.add_option(
+        "-o", "--output", metavar="FILE", help="write results to FILE as JSON"
+    )
+    parser.add_option(
+        "--json", action="store_true", help="write results to stdout as JSON"
+    )
+    parser.add_option(
+        "--compare", metavar="FILE", help="compare results with an earlier JSON run"
+    )
+    parser.add_option(
+        "--tolerance",
+        type="float",
+        default=0.2,
+        help="fraction by which a result may get worse [default: %default]",
+    )
+    parser.add_option(
+        "--backend", default="thread", help="process backend [default: %default]"
+    )
+    parser.add_option("-l", "--list", action="store_true", help="list benchmarks")
+    options, names = parser.parse_args(argv)
+    if options.list:
+        for name, benchmark in BENCHMARKS:
+            print "%-12s %s" % (name, benchmark.__doc__)
+        # end for
+        return 0
+    cg.useBackend(options.backend)
+    if options.json:
+        progress = None
+    else:
+        progress = sys.stdout
+    results = run(names, progress)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": options.backend,
+        "time": time.time(),
+        "results": results,
+    }
+    if options.json:
+        json.dump(report, sys.stdout, indent=1, sort_keys=True)
+        sys.stdout.write("\n")
+    if options.output:
+        f = open(options.output, "w")
+        try:
+            json.dump(report, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+        # end try
+    if options.compare:
+        f = open(options.compare)
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+        # end try
+        if compare(results, baseline, options.tolerance, sys.stderr):
+            return 1
+        # end if
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
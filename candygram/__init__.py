@@ -31,13 +31,25 @@ from candygram.main import (
     exit,
     link,
     unlink,
+    monitor,
+    demonitor,
     processFlag,
     processes,
+    stats,
     isProcessAlive,
+    register,
+    unregister,
+    whereis,
+    registered,
     send,
+    sendMany,
+    sendAfter,
+    cancelTimer,
+    hibernate,
+    useBackend,
     ExitError,
 )
-from candygram.process import Process
+from candygram.process import Process, Reference
 from candygram.receiver import Receiver, Message
 from candygram.pattern import Any
 
@@ -50,12 +62,25 @@ __all__ = [
     "exit",
     "link",
     "unlink",
+    "monitor",
+    "demonitor",
     "processFlag",
     "processes",
+    "stats",
     "isProcessAlive",
+    "register",
+    "unregister",
+    "whereis",
+    "registered",
     "send",
+    "sendMany",
+    "sendAfter",
+    "cancelTimer",
+    "hibernate",
+    "useBackend",
     "ExitError",
     "Process",
+    "Reference",
     "Receiver",
     "Message",
     "Any",
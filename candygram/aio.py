@@ -0,0 +1,294 @@
+# aio.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Processes that run as asyncio tasks
+
+spawn() runs a coroutine as a task on an event loop, and makes the task a
+Candygram process: other processes can send messages to it, link to it, monitor
+it and send it exit signals, just as with any other process. The task receives
+its messages by awaiting AsyncReceiver.areceive(), which returns a future rather
+than blocking the event loop's thread. When a message arrives, the sender wakes
+the loop with call_soon_threadsafe(), so no thread waits on the task's behalf.
+
+Since Candygram's own functions find the current process by thread, cg.self()
+in a task returns the process of the event loop's thread, not the task's. Use
+this module's self() instead. Like a process that runs on a thread, a task
+notices an EXIT signal when it awaits areceive(). A task that awaits anything
+else is cancelled instead, and its process terminates with the signal's reason.
+If the event loop is closed before the task finishes, the process terminates
+with the reason 'killed' once it is sent a message or signal, or isAlive() is
+called.
+
+This module requires the asyncio package, or trollius on Python 2. With
+trollius, a task's event loop must be the current event loop of its thread.
+"""
+
+__revision__ = "$Id$"
+
+
+import sys
+
+try:
+    import asyncio
+except ImportError:
+    import trollius as asyncio
+# end try
+
+from candygram.main import ExitError
+from candygram.process import Process, ExceptionReason
+from candygram.receiver import Receiver, _invoke
+
+
+# Maps each task started by spawn() to its process
+_Processes = {}
+
+
+class AsyncProcess(Process):
+
+    """A process that runs as a task on an event loop"""
+
+    def __init__(self, loop):
+        Process.__init__(self)
+        self.__loop = loop
+        # The task that the process runs as
+        self.task = None
+        # _Waiters of the areceive() calls that are waiting for a message, oldest
+        # first. Only touched on the event loop's thread.
+        self.__waiters = []
+        # True if __service() has been scheduled but hasn't run yet
+        self.__servicePending = False
+        # Reason of the signal that the task was cancelled for, or None
+        self.__cancelReason = None
+        self._wakeup = self.__scheduleService
+
+    def _startTask(self, func, args, kwargs):
+        """start running func(*args, **kwargs) as a task"""
+        self.task = asyncio.ensure_future(func(*args, **kwargs), loop=self.__loop)
+        _Processes[self.task] = self
+        self.task.add_done_callback(self.__done)
+
+    def isAlive(self):
+        """Return True if process is still running"""
+        if self.__loop.is_closed():
+            self.__abandon()
+        return Process.isAlive(self)
+
+    isProcessAlive = isAlive
+
+    def _receive(self, receiver, timeout, handler, args, kwargs):
+        """return a future of the result of receiving a message with receiver"""
+        if timeout is not None and (not isinstance(timeout, int) or timeout < 0):
+            raise ExitError("badarg")
+        if handler is not None and not callable(handler):
+            raise ExitError("badarg")
+        future = asyncio.Future(loop=self.__loop)
+        waiter = _Waiter(receiver, future)
+        self.__waiters.append(waiter)
+        if timeout is not None:
+            # Timeout is specified in milliseconds
+            waiter.timer = self.__loop.call_later(
+                float(timeout) / 1000, self.__expire, waiter, handler, args, kwargs
+            )
+        self.__service()
+        return future
+
+    def __scheduleService(self):
+        """have the event loop look for messages that its waiters can receive"""
+        if self.__servicePending:
+            return
+        self.__servicePending = True
+        try:
+            self.__loop.call_soon_threadsafe(self.__service)
+        except RuntimeError:
+            # The loop has been closed, so the task will never run again.
+            self.__abandon()
+        # end try
+
+    def __service(self):
+        """hand messages to waiters and signals to the task"""
+        # Clear the flag first, so that a message sent while we are looking
+        # schedules another look.
+        self.__servicePending = False
+        waiters = self.__waiters
+        if not waiters:
+            # The task awaits something else, so it can only notice a signal by
+            # being cancelled.
+            if self._signalSet:
+                self.__cancel()
+            return
+        try:
+            self._checkSignal()
+        except:
+            for waiter in waiters:
+                waiter.cancelTimer()
+                if not waiter.future.done():
+                    waiter.future.set_exception(sys.exc_info()[1])
+                # end if
+            # end for
+            del waiters[:]
+            return
+        # end try
+        for waiter in waiters[:]:
+            if waiter.future.done():
+                # The task was cancelled while it waited.
+                waiter.cancelTimer()
+                waiters.remove(waiter)
+                continue
+            handlerInfo = waiter.receiver._poll(self)
+            if handlerInfo is None:
+                continue
+            waiter.cancelTimer()
+            waiters.remove(waiter)
+            _resolve(waiter.future, handlerInfo)
+        # end for
+
+    def __expire(self, waiter, handler, args, kwargs):
+        """give up waiting for a message"""
+        waiter.timer = None
+        if waiter not in self.__waiters:
+            return
+        self.__waiters.remove(waiter)
+        if not waiter.future.done():
+            _resolve(waiter.future, (None, handler, args, kwargs))
+
+    def __cancel(self):
+        """cancel the task for the pending signal"""
+        try:
+            self._checkSignal()
+        except ExitError, ex:
+            self.__cancelReason = ex.reason
+        except:
+            self.__cancelReason = ExceptionReason()
+        # end try
+        self.task.cancel()
+
+    def __abandon(self):
+        """terminate process whose event loop has been closed before its task
+        finished"""
+        # Whoever removes the task from _Processes terminates the process, and
+        # __done() removes it if the task did finish.
+        if _Processes.pop(self.task, None) is None:
+            return
+        for waiter in self.__waiters:
+            waiter.cancelTimer()
+        # end for
+        del self.__waiters[:]
+        self._exit(ExitError("killed", self))
+
+    def __done(self, task):
+        """terminate process when its task finishes"""
+        if _Processes.pop(task, None) is None:
+            return
+        try:
+            task.result()
+        except asyncio.CancelledError:
+            reason = self.__cancelReason
+            if reason is None:
+                reason = "killed"
+            exitError = ExitError(reason, self)
+        except ExitError, ex:
+            exitError = ex
+            if ex.proc is not self:
+                exitError = ExitError(ex.reason, self)
+            # end if
+        except:
+            exitError = ExitError(ExceptionReason(), self)
+        else:
+            exitError = ExitError("normal", self)
+        # end try
+        for waiter in self.__waiters:
+            waiter.cancelTimer()
+        # end for
+        del self.__waiters[:]
+        self._exit(exitError)
+
+
+class AsyncReceiver(Receiver):
+
+    """A Receiver that a task started by spawn() can await"""
+
+    def areceive(self, timeout=None, handler=None, *args, **kwargs):
+        """return a future of the result of retrieving one message from the
+        current task's mailbox"""
+        return self_()._receive(self, timeout, handler, args, kwargs)
+
+
+class _Waiter:
+
+    """An areceive() call that is waiting for a message"""
+
+    def __init__(self, receiver, future):
+        self.receiver = receiver
+        self.future = future
+        # Handle of the call_later() for the timeout, or None
+        self.timer = None
+
+    def cancelTimer(self):
+        """cancel the timeout, if any"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        # end if
+
+
+def spawn(func, *args, **kwargs):
+    """run the coroutine func(*args, **kwargs) as a task on the event loop given
+    by the _loop keyword argument, or the current one; return its process"""
+    loop = kwargs.pop("_loop", None)
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    if not callable(func):
+        raise ExitError("badarg")
+    proc = AsyncProcess(loop)
+    proc._startTask(func, args, kwargs)
+    return proc
+
+
+def self():
+    """return process of the current task"""
+    task = _currentTask()
+    proc = _Processes.get(task)
+    assert proc is not None, "Only tasks created by spawn() may invoke self()"
+    return proc
+
+
+# Alternate name so that the self() function can be used in class methods where
+# 'self' is already defined:
+self_ = self
+
+
+def _currentTask():
+    """return the task that is running on the current thread's event loop"""
+    currentTask = getattr(asyncio, "current_task", None)
+    if currentTask is None:
+        currentTask = asyncio.Task.current_task
+    return currentTask()
+
+
+def _resolve(future, handlerInfo):
+    """set result of future to what the handler in handlerInfo returns, or its
+    exception to what the handler raises"""
+    try:
+        result = _invoke(*handlerInfo)
+    except:
+        future.set_exception(sys.exc_info()[1])
+    else:
+        future.set_result(result)
+    # end try
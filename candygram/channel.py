@@ -0,0 +1,375 @@
+# channel.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Channel class
+
+A Channel carries messages and exit signals between the processes of two
+interpreters, over a pair of file objects such as the ends of a pipe or a
+socket. Each message is pickled into a frame. A Process in a frame is pickled as
+a reference to it; the other side gets a RemoteProcess that stands in for it, or
+the original Process if the reference comes back again.
+
+Every process that the other side has been told about is linked to a pseudo
+process of the Channel, so that the other side can be told when it terminates.
+This makes isAlive(), link() and trap_exit work for RemotePIDs the same way as
+for local processes. When the connection is lost, all RemoteProcesses of the
+Channel terminate with the reason 'noconnection'.
+"""
+
+__revision__ = "$Id$"
+
+
+import cPickle
+import traceback
+from cStringIO import StringIO
+
+from candygram.main import ExitError
+from candygram.process import Process, ExceptionReason
+from candygram import process, threadimpl
+
+
+class RemoteProcess(Process):
+
+    """A process on the other side of a channel"""
+
+    def __init__(self, channel, remoteId):
+        Process.__init__(self)
+        self._channel = channel
+        self._remoteId = remoteId
+
+    def send(self, message):
+        """Send message to process"""
+        # Like a local send(), only check for a signal if the sender has asked
+        # for periodic checks.
+        if process._PeriodicSignalChecks:
+            process._countSend()
+        if self.isAlive():
+            self._channel.write(("send", self._remoteId, message))
+        return message
+
+    __or__ = send
+
+    def __repr__(self):
+        if self._channel.peer is None:
+            return "<RemotePID %d>" % id(self)
+        return "<RemotePID %d on %s>" % (id(self), self._channel.peer)
+
+    def node(self):
+        """return name of node that process runs on, or None if it's unknown"""
+        return self._channel.peer
+
+    def _signal(self, signal):
+        """Send signal to process"""
+        assert isinstance(signal, ExitError)
+        if not self.isAlive():
+            return
+        self._channel.writeReason("signal", self._remoteId, signal.reason, signal.proc)
+
+
+class RemoteExceptionReason:
+
+    """An ExceptionReason that has been sent to another interpreter
+
+    Tracebacks can't be pickled, so the traceback is converted to text.
+    """
+
+    def __init__(self, exceptionReason):
+        type_, value, tb = exceptionReason.excInfo
+        self.excType = "%s.%s" % (type_.__module__, type_.__name__)
+        self.excValue = str(value)
+        self.traceback = "".join(traceback.format_exception(type_, value, tb))
+
+    def __str__(self):
+        return "<exception: %s>" % self.excValue
+
+
+class _ExitWatcher(Process):
+
+    """A pseudo process that is linked to every process referred to by the other
+    side of a channel, so that the other side can be told when it terminates"""
+
+    def __init__(self, channel):
+        Process.__init__(self)
+        self.__channel = channel
+
+    def _signal(self, signal):
+        """Receive exit signal of linked process"""
+        self.__channel.exited(signal.proc, signal.reason)
+
+
+class Channel:
+
+    """One end of a connection between two interpreters"""
+
+    def __init__(self, input, output, onClose=None):
+        self.__input = input
+        self.__output = output
+        # Called after the channel has been closed
+        self.__onClose = onClose
+        # Name of the node on the other side, if it has one
+        self.peer = None
+        self.__unpickler = cPickle.Unpickler(input)
+        self.__unpickler.persistent_load = self.__persistentLoad
+        self.__writeLock = threadimpl.allocateLock()
+        self.__closed = False
+        # Lock for __exports, __exportIds, __pendingExports, __nextId, and
+        # __proxies
+        self.__lock = threadimpl.allocateLock()
+        # Maps export ID to our processes that the other side may refer to
+        self.__exports = {}
+        # Maps id() of exported process to its export ID
+        self.__exportIds = {}
+        # Maps id() of exported process that no frame has been sent with yet to
+        # the number of write() calls that are pickling it
+        self.__pendingExports = {}
+        self.__nextId = 0
+        # Maps export ID of the other side to a RemoteProcess
+        self.__proxies = {}
+        self.__watcher = _ExitWatcher(self)
+        # Export ID (of the other side) of the child's initial process
+        self.__rootId = None
+
+    def setRoot(self, proc):
+        """hang up when the child's initial process terminates"""
+        self.__rootId = proc._remoteId
+
+    def write(self, frame):
+        """send frame to other side"""
+        newExports = []
+
+        def persistentId(obj):
+            """refer to processes by their export IDs"""
+            if not isinstance(obj, Process):
+                return None
+            return self.__persistentId(obj, newExports)
+
+        # Pickle the frame in full before writing any of it, so that a pickling
+        # error can't corrupt the stream.
+        buf = StringIO()
+        pickler = cPickle.Pickler(buf, 2)
+        pickler.persistent_id = persistentId
+        try:
+            pickler.dump(frame)
+        except:
+            self.__dropExports(newExports)
+            raise
+        # end try
+        self.__lock.acquire()
+        for proc in newExports:
+            self.__pendingExports.pop(id(proc), None)
+        # end for
+        self.__lock.release()
+        data = buf.getvalue()
+        self.__writeLock.acquire()
+        try:
+            try:
+                if not self.__closed:
+                    self.__output.write(data)
+                    self.__output.flush()
+                # end if
+            except (IOError, OSError, ValueError):
+                # The other side is gone. The reader will find out soon enough.
+                pass
+            # end try
+        finally:
+            self.__writeLock.release()
+        # end try
+        for proc in newExports:
+            proc._addLink(self.__watcher)
+            # If proc has already terminated, this tells the other side so.
+            self.__watcher._addLink(proc)
+        # end for
+
+    def read(self):
+        """return next frame from other side, or None if the connection is closed"""
+        try:
+            return self.__unpickler.load()
+        except (EOFError, IOError, OSError):
+            return None
+        except:
+            # E.g., a message refers to a class that can't be imported here. There's
+            # no telling where the next frame starts, so give up on the connection.
+            traceback.print_exc()
+            return None
+        # end try
+
+    def run(self):
+        """dispatch frames from other side until the connection is closed"""
+        while True:
+            frame = self.read()
+            if frame is None:
+                break
+            tag = frame[0]
+            if tag == "send":
+                proc = self.__getExport(frame[1])
+                if proc is not None:
+                    proc.send(frame[2])
+                # end if
+            elif tag == "signal":
+                proc = self.__getExport(frame[1])
+                if proc is not None:
+                    proc._signal(ExitError(frame[2], frame[3]))
+                # end if
+            elif tag == "exited":
+                self.__lock.acquire()
+                proxy = self.__proxies.pop(frame[1], None)
+                self.__lock.release()
+                if proxy is not None:
+                    proxy._exit(ExitError(frame[2], proxy))
+                if frame[1] == self.__rootId:
+                    # The child's work is done; tell it to go away.
+                    self.__closeOutput()
+                # end if
+            # end if
+        # end while
+        self.close()
+
+    def close(self):
+        """hang up and terminate all RemoteProcesses of this channel"""
+        self.__closeOutput()
+        self.__lock.acquire()
+        proxies = self.__proxies.values()
+        self.__proxies.clear()
+        self.__lock.release()
+        for proxy in proxies:
+            proxy._exit(ExitError("noconnection", proxy))
+        # end for
+        self.__lock.acquire()
+        exports = self.__exports.values()
+        self.__exports.clear()
+        self.__exportIds.clear()
+        self.__pendingExports.clear()
+        self.__lock.release()
+        for proc in exports:
+            proc._removeLink(self.__watcher)
+        # end for
+        if self.__onClose is not None:
+            self.__onClose()
+        # end if
+
+    def exited(self, proc, reason):
+        """tell other side that exported process proc has terminated"""
+        self.__lock.acquire()
+        exportId = self.__exportIds.pop(id(proc), None)
+        if exportId is not None:
+            del self.__exports[exportId]
+        self.__lock.release()
+        if exportId is not None:
+            self.writeReason("exited", exportId, reason)
+        # end if
+
+    def writeReason(self, tag, exportId, reason, *rest):
+        """send frame that carries an exit reason, which may not be picklable"""
+        try:
+            self.write((tag, exportId, _portableReason(reason)) + rest)
+        except (cPickle.PicklingError, TypeError):
+            self.write((tag, exportId, repr(reason)) + rest)
+        # end try
+
+    def __closeOutput(self):
+        """close the connection to the other side"""
+        self.__writeLock.acquire()
+        try:
+            try:
+                if not self.__closed:
+                    self.__closed = True
+                    self.__output.close()
+                # end if
+            except (IOError, OSError):
+                pass
+            # end try
+        finally:
+            self.__writeLock.release()
+        # end try
+
+    def __getExport(self, exportId):
+        """return exported process, or None if it has terminated"""
+        self.__lock.acquire()
+        proc = self.__exports.get(exportId)
+        self.__lock.release()
+        return proc
+
+    def __persistentId(self, proc, newExports):
+        """return the persistent ID by which the other side knows proc"""
+        if isinstance(proc, RemoteProcess) and proc._channel is self:
+            return ("yours", proc._remoteId)
+        self.__lock.acquire()
+        try:
+            exportId = self.__exportIds.get(id(proc))
+            if exportId is None:
+                exportId = self.__nextId
+                self.__nextId += 1
+                self.__exports[exportId] = proc
+                self.__exportIds[id(proc)] = exportId
+                self.__pendingExports[id(proc)] = 0
+            # end if
+            if id(proc) in self.__pendingExports:
+                # Whichever write() gets to send proc first links it to the
+                # watcher, and the last one to fail to pickle it unexports it.
+                self.__pendingExports[id(proc)] += 1
+                newExports.append(proc)
+            # end if
+        finally:
+            self.__lock.release()
+        # end try
+        return ("mine", exportId)
+
+    def __dropExports(self, procs):
+        """unexport procs, which were exported while pickling a frame that
+        couldn't be pickled, unless another frame has been sent with them"""
+        self.__lock.acquire()
+        for proc in procs:
+            count = self.__pendingExports.get(id(proc))
+            if count is None:
+                continue
+            if count > 1:
+                self.__pendingExports[id(proc)] = count - 1
+                continue
+            del self.__pendingExports[id(proc)]
+            del self.__exports[self.__exportIds.pop(id(proc))]
+        # end for
+        self.__lock.release()
+
+    def __persistentLoad(self, persistentId):
+        """return process referred to by persistent ID of the other side"""
+        owner, exportId = persistentId
+        if owner == "yours":
+            proc = self.__getExport(exportId)
+            if proc is None:
+                # It has terminated since the other side heard of it.
+                proc = Process()
+                proc._exit(ExitError("noproc", proc))
+            return proc
+        self.__lock.acquire()
+        try:
+            proxy = self.__proxies.get(exportId)
+            if proxy is None:
+                proxy = self.__proxies[exportId] = RemoteProcess(self, exportId)
+            return proxy
+        finally:
+            self.__lock.release()
+        # end try
+
+
+def _portableReason(reason):
+    """return version of exit reason that can be pickled"""
+    if isinstance(reason, ExceptionReason):
+        return RemoteExceptionReason(reason)
+    return reason
@@ -30,66 +30,92 @@ didn't come in at the last moment.
 This Condition class fixes that problem by returning True if the wait() call
 was awakened by a notify() and False if it timed out. The class is also
 simplified by making the following assumptions:
- - There will only be one waiting thread at a time.
  - The lock need not be reentrant.
  - wait() and notify() will only be invoked by the thread that has established
    the lock.
+
+Unlike threading.Condition, a timed wait() does not poll. The waiting thread
+blocks on its waiter lock, and the backend's timer releases that lock if the
+timeout expires before a notify() comes in.
 """
 
 __revision__ = "$Id: condition.py,v 1.4 2004/08/19 23:18:02 hobb0001 Exp $"
 
 
-import time
-
-from candygram.threadimpl import allocateLock
+from candygram import threadimpl
 
 
 class Condition:
 
     """modified Condition class"""
 
-    def __init__(self):
-        self.__lock = allocateLock()
+    def __init__(self, lock=None):
+        # Several Conditions may share one lock (which may be another Condition).
+        if lock is None:
+            lock = threadimpl.allocateLock()
+        self.__lock = lock
         self.acquire = self.__lock.acquire
         self.release = self.__lock.release
         self.locked = self.__lock.locked
-        self.__waiter = None
+        # Waiters in the order that they started to wait
+        self.__waiters = []
 
     def wait(self, timeout=None):
         """wait for notify()"""
         assert self.locked()
-        waiter = allocateLock()
-        waiter.acquire()
-        self.__waiter = waiter
+        if timeout is not None and timeout <= 0:
+            # No notify() can come in while we hold the lock.
+            return False
+        waiter = _Waiter()
+        self.__waiters.append(waiter)
+        timer = None
         self.release()
         try:
-            return _acquire(waiter, timeout)
+            if timeout is not None:
+                timer = threadimpl.callLater(timeout, self.__expire, waiter)
+            waiter.lock.acquire()
         finally:
             self.acquire()
         # end try
+        if timer is not None:
+            timer.cancel()
+        return waiter.notified
 
-    def notify(self):
-        """wake up wait()ers"""
+    def notify(self, n=1):
+        """wake up the n longest waiting wait()ers"""
         assert self.locked()
-        if self.__waiter is not None:
-            self.__waiter.release()
-            self.__waiter = None
-        # end if
-
-
-def _acquire(lock, timeout):
-    """try to acquire a lock, with a timeout"""
-    if timeout is None:
-        lock.acquire()
-        return True
-    timeout = time.time() + timeout
-    delay = 0.0005  # 500 us -> initial delay of 1 ms
-    while True:
-        if lock.acquire(0):
-            return True
-        remaining = timeout - time.time()
-        if remaining <= 0:
-            break
-        delay = min(delay * 2, remaining, 0.05)
-        time.sleep(delay)
-    return False
+        if not self.__waiters:
+            return
+        waiters = self.__waiters[:n]
+        del self.__waiters[:n]
+        for waiter in waiters:
+            waiter.notified = True
+            waiter.lock.release()
+        # end for
+
+    def notifyAll(self):
+        """wake up all wait()ers"""
+        self.notify(len(self.__waiters))
+
+    def __expire(self, waiter):
+        """invoked by the timer thread when a wait() times out"""
+        self.acquire()
+        try:
+            # If a notify() beat us to it, the waiter has already been released.
+            if waiter in self.__waiters:
+                self.__waiters.remove(waiter)
+                waiter.lock.release()
+            # end if
+        finally:
+            self.release()
+        # end try
+
+
+class _Waiter:
+
+    """lock on which a single wait() call blocks"""
+
+    def __init__(self):
+        self.lock = threadimpl.allocateLock()
+        self.lock.acquire()
+        self.notified = False
@@ -0,0 +1,176 @@
+# dispatch.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""DispatchTable class
+
+A DispatchTable narrows down which of a Receiver's handlers could possibly
+match a message, so that only their filters need to be called. The candidates
+are found by switching on the message's type, then on its length (if it is a
+sequence), and then on its key: the first element of a sequence, or the
+message itself otherwise. The first two switches are memoized as nodes that
+are built the first time a message of a given type and length is seen. A node
+maps each key that any of its handlers requires to the list of handlers that
+might match a message with that key. Every list keeps the handlers in their
+original order, so the first handler whose filter matches still wins.
+"""
+
+__revision__ = "$Id$"
+
+
+from candygram.pattern import (
+    genGuard,
+    messageIndexKey,
+    Any,
+    Opaque,
+    IndexableTypes,
+)
+
+
+# Offset of the pattern in a handler tuple
+PATTERN = 1
+
+# Number of nodes that a table will memoize before starting over
+MAX_NODES = 1024
+
+
+class DispatchTable:
+
+    """Finds the handlers that may match a message"""
+
+    def __init__(self, handlers):
+        self.__handlers = handlers[:]
+        self.__guards = [genGuard(handler[PATTERN]) for handler in handlers]
+        self.__nodes = {}
+        self.indexKeys = _indexKeys(self.__guards)
+
+    def candidates(self, message):
+        """return the handlers that may match message, in order"""
+        t = type(message)
+        # (Old-style classes don't have a __class__ attribute.)
+        cls = getattr(message, "__class__", t)
+        if cls is not t:
+            # isinstance() checks both the type and the __class__ attribute.
+            t = (t, cls)
+        typeNode = self.__nodes.get(t)
+        if typeNode is None:
+            if len(self.__nodes) >= MAX_NODES:
+                self.__nodes.clear()
+            typeNode = _TypeNode(isinstance(message, (tuple, list)))
+            self.__nodes[t] = typeNode
+        if typeNode.isSeq:
+            length = len(message)
+            key = messageIndexKey(message)
+        else:
+            length = None
+            if type(message) in IndexableTypes:
+                key = message
+            else:
+                key = Opaque
+            # end if
+        lenNode = typeNode.lenNodes.get(length)
+        if lenNode is None:
+            if len(typeNode.lenNodes) >= MAX_NODES:
+                typeNode.lenNodes.clear()
+            lenNode = self.__buildNode(t, typeNode.isSeq, length)
+            typeNode.lenNodes[length] = lenNode
+        if key is Opaque:
+            return lenNode.all
+        return lenNode.byKey.get(key, lenNode.default)
+
+    def __buildNode(self, t, isSeq, length):
+        """build the node for messages of type t and length"""
+        if isinstance(t, tuple):
+            classes = t
+        else:
+            classes = (t,)
+        # (handler, key) pairs of all handlers that may match
+        applicable = []
+        for handler, guard in zip(self.__handlers, self.__guards):
+            if guard.cls is not None and not _isSubclass(classes, guard.cls):
+                continue
+            if guard.minLen is not None:
+                if not isSeq or length < guard.minLen:
+                    continue
+                if guard.maxLen is not None and length > guard.maxLen:
+                    continue
+                # end if
+            key = guard.key
+            if key is not Any and guard.isSeq != isSeq:
+                # A key of an indexable type is never equal to a sequence, and a
+                # non-sequence has no first element.
+                continue
+            applicable.append((handler, key))
+        # end for
+        return _LenNode(applicable)
+
+
+class _TypeNode:
+
+    """handlers for messages of a specific type"""
+
+    def __init__(self, isSeq):
+        self.isSeq = isSeq
+        # Maps length of message (or None for non-sequences) to a _LenNode
+        self.lenNodes = {}
+
+
+class _LenNode:
+
+    """handlers for messages of a specific type and length"""
+
+    def __init__(self, applicable):
+        # All of the handlers that may match
+        self.all = tuple([handler for handler, key in applicable])
+        # The handlers that may match a message whose key is not required by any
+        # handler
+        self.default = tuple([handler for handler, key in applicable if key is Any])
+        self.byKey = {}
+        for handler, key in applicable:
+            if key is not Any and key not in self.byKey:
+                self.byKey[key] = tuple(
+                    [
+                        handler
+                        for handler, otherKey in applicable
+                        if otherKey is Any or otherKey == key
+                    ]
+                )
+            # end if
+        # end for
+
+
+def _isSubclass(classes, cls):
+    """return True if any of classes is a subclass of cls"""
+    for c in classes:
+        if issubclass(c, cls):
+            return True
+        # end if
+    return False
+
+
+def _indexKeys(guards):
+    """return set of the mailbox index keys of all guards, or None if a guard
+    has no index key"""
+    keys = set()
+    for guard in guards:
+        if not guard.isSeq or guard.key is Any:
+            return None
+        keys.add(guard.key)
+    # end for
+    return keys
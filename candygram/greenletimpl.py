@@ -0,0 +1,193 @@
+# greenletimpl.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""A threadimpl backend that runs processes as greenlets.
+
+All processes run on the OS thread that selected this backend. A greenlet only
+needs a few kilobytes of memory, so hundreds of thousands of processes can
+exist at once. The processes are scheduled cooperatively: a process runs until
+it blocks on a lock (e.g., by waiting in Receiver.receive()), at which point
+control passes to a hub greenlet that resumes the next runnable process.
+Consequently, a process that never blocks keeps all others from running, and
+only Candygram processes on the same OS thread may send messages to each other.
+"""
+
+__revision__ = "$Id$"
+
+
+import sys
+import time
+import traceback
+import weakref
+from collections import deque
+
+import greenlet
+
+from candygram.timer import Timer, TimerWheel
+
+
+class DeadlockError(Exception):
+
+    """raised in the main process when no process can ever run again"""
+
+
+class GreenletBackend:
+
+    """runs every process as a greenlet on the current OS thread"""
+
+    name = "greenlet"
+
+    def __init__(self):
+        self.getCurrentThread = greenlet.getcurrent
+        self.__main = greenlet.getcurrent()
+        self.__hub = None
+        self.__ready = deque()
+        self.__timers = TimerWheel()
+
+    def startThread(self, func, args, reuse=False):
+        """run func(*args) as a new greenlet (greenlets are never reused)"""
+        self.__ready.append((greenlet.greenlet(func, self.__getHub()), args))
+
+    def allocateLock(self):
+        """return a new, non-reentrant lock"""
+        return Lock(self)
+
+    def allocateLocal(self):
+        """return a new greenlet-local object"""
+        return Local()
+
+    def callLater(self, delay, func, *args):
+        """invoke func(*args) on a new greenlet after delay seconds"""
+        timer = Timer(time.time() + delay, func, args, self.__timers.remove)
+        self.__timers.add(timer)
+        return timer
+
+    def _block(self):
+        """suspend current greenlet until another one calls _schedule() on it"""
+        self.__getHub().switch()
+
+    def _schedule(self, glet):
+        """mark a blocked greenlet as runnable"""
+        self.__ready.append((glet, ()))
+
+    def __getHub(self):
+        """return the hub greenlet, creating it if necessary"""
+        if self.__hub is None:
+            self.__hub = greenlet.greenlet(self.__run, self.__main)
+        return self.__hub
+
+    def __run(self):
+        """main function of hub greenlet"""
+        ready = self.__ready
+        while True:
+            self.__startTimers()
+            if ready:
+                glet, args = ready.popleft()
+                try:
+                    glet.switch(*args)
+                except:
+                    # Mimic what the thread module does with an unhandled exception.
+                    print >> sys.stderr, "Unhandled exception in greenlet started by",
+                    print >> sys.stderr, glet
+                    traceback.print_exc()
+                # end try
+            elif self.__timers:
+                time.sleep(max(0, self.__timers.nextExpire() - time.time()))
+            else:
+                self.__main.throw(
+                    DeadlockError("all processes are waiting for a message")
+                )
+            # end if
+        # end while
+
+    def __startTimers(self):
+        """schedule a new greenlet for each expired timer"""
+        for timer in self.__timers.popDue(time.time()):
+            # The callback may need to acquire a lock, so it can't run on the hub.
+            self.startThread(timer._fire, ())
+        # end for
+
+
+class Lock:
+
+    """A lock that switches to another greenlet when it blocks"""
+
+    def __init__(self, backend):
+        self.__backend = backend
+        self.__locked = False
+        self.__waiters = deque()
+
+    def acquire(self, blocking=1):
+        """acquire the lock"""
+        if not self.__locked:
+            self.__locked = True
+            return True
+        if not blocking:
+            return False
+        current = greenlet.getcurrent()
+        self.__waiters.append(current)
+        try:
+            self.__backend._block()
+        except:
+            # A DeadlockError was thrown in; we never got the lock.
+            self.__waiters.remove(current)
+            raise
+        # end try
+        # release() handed ownership of the lock directly to us.
+        return True
+
+    def release(self):
+        """release the lock"""
+        assert self.__locked, "release unlocked lock"
+        if self.__waiters:
+            self.__backend._schedule(self.__waiters.popleft())
+        else:
+            self.__locked = False
+        # end if
+
+    def locked(self):
+        """return True if the lock is held"""
+        return self.__locked
+
+
+class Local(object):
+
+    """An object whose attributes are only visible to the greenlet that set them"""
+
+    def __init__(self):
+        # Each greenlet's attributes go away along with the greenlet.
+        object.__setattr__(self, "_Local__dicts", weakref.WeakKeyDictionary())
+
+    def __getattr__(self, name):
+        try:
+            return self.__dicts[greenlet.getcurrent()][name]
+        except KeyError:
+            raise AttributeError(name)
+        # end try
+
+    def __setattr__(self, name, value):
+        self.__dicts.setdefault(greenlet.getcurrent(), {})[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self.__dicts[greenlet.getcurrent()][name]
+        except KeyError:
+            raise AttributeError(name)
+        # end try
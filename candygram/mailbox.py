@@ -0,0 +1,177 @@
+# mailbox.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Mailbox class
+
+A Mailbox holds a process's pending messages in the order that they were sent.
+Each message is stored in an entry along with a sequence number, which never
+changes for as long as the message is in the mailbox. A Receiver remembers how
+far it has scanned by sequence number, so removing a message never disturbs the
+position of any other Receiver.
+
+Messages are also indexed by their index key (see pattern.messageIndexKey()).
+When every handler of a Receiver has an index key, only the messages filed
+under those keys need to be inspected, no matter how many other messages are
+waiting in the mailbox.
+
+Entries are kept in queues that are sorted by sequence number. Removing an entry
+only marks it as removed; removed entries at the head of a queue are skipped
+over, and a queue is compacted once removed entries make up more than half of
+it. Appending and removing are therefore O(1) (amortized) anywhere in the
+queue, and finding the first entry at or after a sequence number is O(log n).
+"""
+
+__revision__ = "$Id$"
+
+
+import bisect
+import heapq
+
+from candygram.pattern import messageIndexKey, Opaque
+
+
+# Offsets of the fields in a mailbox entry
+SEQ = 0
+MESSAGE = 1
+KEY = 2
+
+# The MESSAGE field of a removed entry is set to this value.
+Removed = object()
+
+
+class Mailbox:
+
+    """A process's queue of pending messages"""
+
+    def __init__(self):
+        self.__entries = _EntryQueue()
+        self.__index = {}
+        self.__nextSeq = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __iter__(self):
+        return iter([entry[MESSAGE] for entry in self.__entries.entriesFrom(0)])
+
+    def nextSeq(self):
+        """return the sequence number that the next message will receive"""
+        return self.__nextSeq
+
+    def append(self, message):
+        """add message to end of mailbox"""
+        key = messageIndexKey(message)
+        entry = [self.__nextSeq, message, key]
+        self.__nextSeq += 1
+        self.__entries.append(entry)
+        bucket = self.__index.get(key)
+        if bucket is None:
+            bucket = self.__index[key] = _EntryQueue()
+        bucket.append(entry)
+
+    def first(self):
+        """return oldest entry in mailbox"""
+        for entry in self.__entries.entriesFrom(0):
+            return entry
+        raise IndexError("mailbox is empty")
+
+    def remove(self, entry):
+        """remove entry from mailbox"""
+        assert entry[MESSAGE] is not Removed
+        # Don't hold on to the message any longer than necessary.
+        entry[MESSAGE] = Removed
+        self.__entries.discard()
+        bucket = self.__index[entry[KEY]]
+        bucket.discard()
+        if not bucket:
+            del self.__index[entry[KEY]]
+        # end if
+
+    def entries(self, start, keys=None):
+        """iterate over the entries whose sequence number is at least start
+
+        If keys is not None, only the entries filed under one of the given index
+        keys (or under Opaque, which may match any of them) are included. Entries
+        may be removed while iterating, but messages must not be appended.
+        """
+        if keys is None:
+            return self.__entries.entriesFrom(start)
+        buckets = []
+        for key in keys:
+            bucket = self.__index.get(key)
+            if bucket is not None:
+                buckets.append(bucket.entriesFrom(start))
+            # end if
+        bucket = self.__index.get(Opaque)
+        if bucket is not None:
+            buckets.append(bucket.entriesFrom(start))
+        if len(buckets) == 1:
+            return buckets[0]
+        # Sequence numbers are unique, so the merge never compares the messages.
+        return heapq.merge(*buckets)
+
+
+class _EntryQueue:
+
+    """A list of entries, sorted by sequence number, that removes entries lazily"""
+
+    def __init__(self):
+        self.__entries = []
+        # Index of the first entry that hasn't been removed
+        self.__head = 0
+        # Number of removed entries after __head
+        self.__removed = 0
+
+    def __len__(self):
+        return len(self.__entries) - self.__head - self.__removed
+
+    def append(self, entry):
+        """add entry to end of queue"""
+        self.__entries.append(entry)
+
+    def discard(self):
+        """account for an entry of this queue having been marked as removed"""
+        entries = self.__entries
+        self.__removed += 1
+        head = self.__head
+        while self.__removed and entries[head][MESSAGE] is Removed:
+            head += 1
+            self.__removed -= 1
+        # end while
+        self.__head = head
+        waste = head + self.__removed
+        if waste > 16 and waste * 2 > len(entries):
+            self.__entries = [
+                entry for entry in entries[head:] if entry[MESSAGE] is not Removed
+            ]
+            self.__head = 0
+            self.__removed = 0
+        # end if
+
+    def entriesFrom(self, start):
+        """iterate over entries whose sequence number is at least start"""
+        entries = self.__entries
+        # [start] sorts just before any entry with a sequence number of start.
+        for i in xrange(bisect.bisect_left(entries, [start], self.__head), len(entries)):
+            entry = entries[i]
+            if entry[MESSAGE] is not Removed:
+                yield entry
+            # end if
+        # end for
@@ -23,7 +23,10 @@
 __revision__ = "$Id: main.py,v 1.4 2004/09/09 15:47:07 hobb0001 Exp $"
 
 
-from candygram.threadimpl import getCurrentThread
+import time
+
+from candygram import threadimpl
+from candygram.timer import Timer
 
 
 def spawn(func, *args, **kwargs):
@@ -45,26 +48,40 @@ def _doSpawn(func, args, kwargs, initialLink):
     if "_processClass" in kwargs:
         class_ = kwargs["_processClass"]
         del kwargs["_processClass"]
+    mailboxSize = kwargs.pop("_mailboxSize", None)
+    overflow = kwargs.pop("_overflow", "block")
+    if mailboxSize is not None and (
+        not isinstance(mailboxSize, (int, long)) or mailboxSize < 1
+    ):
+        raise ExitError("badarg")
+    if overflow not in OVERFLOW_POLICIES:
+        raise ExitError("badarg")
+    recordStats = kwargs.pop("_stats", False)
+    if not isinstance(recordStats, bool):
+        raise ExitError("badarg")
     proc = class_()
+    proc._setMailboxSize(mailboxSize, overflow)
+    if recordStats:
+        # Set before the process starts so that no message goes unrecorded
+        proc._processFlag("stats", True)
     proc._startThread(func, args, kwargs, initialLink)
     return proc
 
 
+def useBackend(backend):
+    """select what processes run on: "thread", "greenlet" or a backend object"""
+    assert not processMapCreated(), "useBackend() must be called before any process exists"
+    if isinstance(backend, str) and backend not in threadimpl.BACKENDS:
+        raise ExitError("badarg")
+    threadimpl.setBackend(backend)
+
+
 def self(noCheck=False):
     """return current process"""
-    # _checkSignal() needs to invoke self(). In order to avoid infinite recursion,
-    # don't call _checkSignal() if noCheck is set.
-    if not noCheck:
-        _checkSignal()
-    getProcessMapLock().acquire()
-    try:
-        currentThread = getCurrentThread()
-        assert (
-            currentThread in getProcessMap()
-        ), "Only the main thread or threads created by spawn*() may invoke self()"
-        result = getProcessMap()[currentThread]
-    finally:
-        getProcessMapLock().release()
+    # Don't check for a signal if noCheck is set.
+    result = getCurrentProcess()
+    if not noCheck and result._signalSet:
+        result._checkSignal()
     return result
 
 
@@ -111,6 +128,29 @@ def unlink(proc):
     return True
 
 
+def monitor(proc):
+    """monitor a process; return reference that identifies the monitor"""
+    _checkSignal()
+    if not isinstance(proc, Process):
+        raise ExitError("badarg")
+    ref = Reference(proc, self())
+    proc._addMonitor(ref)
+    return ref
+
+
+def demonitor(ref, flush=False):
+    """remove a monitor"""
+    _checkSignal()
+    if not isinstance(ref, Reference):
+        raise ExitError("badarg")
+    ref._proc._removeMonitor(ref)
+    if flush:
+        r = Receiver()
+        r.addHandler(("DOWN", ref, Any, Any))
+        r.receive(0)
+    return True
+
+
 def processFlag(flag, value):
     """set a process flag"""
     return self()._processFlag(flag, value)
@@ -121,12 +161,35 @@ def processes():
     _checkSignal()
     getProcessMapLock().acquire()
     try:
-        return getProcessMap().values()
+        return getProcessMap().values() + getHibernating()
     finally:
         getProcessMapLock().release()
     # end try
 
 
+def stats():
+    """return dictionary mapping each process that records statistics to its
+    Process.stats()"""
+    result = {}
+    for proc in processes():
+        snapshot = proc.stats()
+        if snapshot is not None:
+            result[proc] = snapshot
+        # end if
+    return result
+
+
+def hibernate(receiver):
+    """give up current process's thread until a message matches receiver"""
+    _checkSignal()
+    if not isinstance(receiver, Receiver):
+        raise ExitError("badarg")
+    if isinstance(getCurrentProcess(), RootProcess):
+        # The main thread can't be given up.
+        raise ExitError("badarg")
+    raise Hibernate(receiver, receiver._hibernate())
+
+
 def isProcessAlive(proc):
     """return True if process is active"""
     if not isinstance(proc, Process):
@@ -134,16 +197,105 @@ def isProcessAlive(proc):
     return proc.isAlive()
 
 
+def register(name, proc):
+    """register process under name"""
+    _checkSignal()
+    if not isinstance(name, str) or not isinstance(proc, Process):
+        raise ExitError("badarg")
+    if not proc._register(name):
+        raise ExitError("badarg")
+    return True
+
+
+def unregister(name):
+    """remove registered name"""
+    _checkSignal()
+    if not unregisterName(name):
+        raise ExitError("badarg")
+    return True
+
+
+def whereis(name):
+    """return process registered under name, or None"""
+    _checkSignal()
+    return whereisName(name)
+
+
+def registered():
+    """list all registered names"""
+    _checkSignal()
+    return registeredNames()
+
+
 def send(proc, msg):
-    """send a message to process"""
-    if not isinstance(proc, Process):
+    """send a message to process, or to the process registered under a name"""
+    return _resolve(proc).send(msg)
+
+
+def sendMany(proc, messages):
+    """send a sequence of messages to process, or to the process registered
+    under a name"""
+    return _resolve(proc).sendMany(messages)
+
+
+def _resolve(proc):
+    """return proc, or the process registered under it if it's a name"""
+    if isinstance(proc, str):
+        proc = whereisName(proc)
+        if proc is None:
+            raise ExitError("badarg")
+        # end if
+    elif not isinstance(proc, Process):
+        raise ExitError("badarg")
+    return proc
+
+
+def sendAfter(ms, proc, message):
+    """send a message to process, or to the process registered under a name,
+    after ms milliseconds; return timer that can be passed to cancelTimer()"""
+    _checkSignal()
+    if not isinstance(ms, (int, long, float)) or ms < 0:
+        raise ExitError("badarg")
+    if not isinstance(proc, (Process, str)):
+        raise ExitError("badarg")
+    return threadimpl.callLater(ms / 1000.0, _sendLater, proc, message)
+
+
+def _sendLater(proc, message):
+    """invoked by the timer service when a sendAfter() timer expires"""
+    if isinstance(proc, str):
+        proc = whereisName(proc)
+        if proc is None:
+            return
+        # end if
+    if getattr(proc.send, "im_func", None) is Process.send.im_func:
+        # Process.send() never waits for room in the mailbox when it's called from
+        # a thread that isn't a process, so it can't hold up other timers.
+        proc.send(message)
+    else:
+        # An overridden send(), e.g. that of a RemoteProcess, may block on I/O.
+        threadimpl.startThread(proc.send, (message,))
+    # end if
+
+
+def cancelTimer(timer):
+    """cancel a sendAfter() timer; return the number of milliseconds that were
+    left, or False if the timer had already expired"""
+    _checkSignal()
+    if not isinstance(timer, Timer):
         raise ExitError("badarg")
-    return proc.send(msg)
+    if not timer.cancel():
+        return False
+    return max(0, int((timer.expire - time.time()) * 1000))
 
 
 def _checkSignal():
     """check if a signal has been sent to current process"""
-    self(True)._checkSignal()
+    proc = lookupCurrentProcess()
+    # A thread that isn't a process (e.g., that of the timer service) never
+    # receives signals.
+    if proc is not None and proc._signalSet:
+        proc._checkSignal()
 
 
 class ExitError(Exception):
@@ -161,4 +313,21 @@ class ExitError(Exception):
 
 
 # We can't import these at the top, since the process module imports this one
-from candygram.process import Process, getProcessMap, getProcessMapLock
+from candygram.process import (
+    OVERFLOW_POLICIES,
+    Process,
+    RootProcess,
+    Hibernate,
+    Reference,
+    getCurrentProcess,
+    getHibernating,
+    getProcessMap,
+    getProcessMapLock,
+    lookupCurrentProcess,
+    processMapCreated,
+    registeredNames,
+    unregisterName,
+    whereisName,
+)
+from candygram.receiver import Receiver
+from candygram.pattern import Any
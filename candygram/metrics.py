@@ -0,0 +1,171 @@
+# metrics.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""ProcessStats and Histogram classes
+
+A process records statistics about its mailbox only while its 'stats' process
+flag is set. Otherwise, its ProcessStats attribute is None, and checking that
+is all the instrumentation costs.
+
+The recordSend(), recordScan() and recordRemove() methods of a ProcessStats
+are only called while the process's mailbox is locked, and recordHandler() only
+by the process itself.
+"""
+
+__revision__ = "$Id$"
+
+
+import time
+
+
+class ProcessStats:
+
+    """Statistics about the messages that a process has sent to it"""
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.highWater = 0
+        self.scans = 0
+        self.scanned = 0
+        self.maxScanned = 0
+        # Time from a message being sent until it is removed by a receive()
+        self.latency = Histogram()
+        # Time taken by handlers that receive() invokes
+        self.handlerTime = Histogram()
+        # Maps sequence numbers of messages in mailbox to when they were sent
+        self.__sendTimes = {}
+
+    def recordSend(self, firstSeq, lastSeq, mailboxLength):
+        """record that the messages numbered from firstSeq to lastSeq have been
+        appended to a mailbox that now holds mailboxLength messages"""
+        now = time.time()
+        sendTimes = self.__sendTimes
+        for seq in xrange(firstSeq, lastSeq + 1):
+            sendTimes[seq] = now
+        # end for
+        self.sent += lastSeq - firstSeq + 1
+        if mailboxLength > self.highWater:
+            self.highWater = mailboxLength
+
+    def recordScan(self, count):
+        """record that a receive() inspected count messages"""
+        self.scans += 1
+        self.scanned += count
+        if count > self.maxScanned:
+            self.maxScanned = count
+
+    def recordRemove(self, seq, received=True):
+        """record that message seq has been removed from mailbox, either by a
+        receive() or by a full mailbox's overflow policy"""
+        sendTime = self.__sendTimes.pop(seq, None)
+        if not received:
+            self.dropped += 1
+            return
+        self.received += 1
+        if sendTime is not None:
+            self.latency.record(time.time() - sendTime)
+        # end if
+
+    def recordHandler(self, handler, *args):
+        """call handler(*args), recording how long it takes; return its result"""
+        start = time.time()
+        try:
+            return handler(*args)
+        finally:
+            self.handlerTime.record(time.time() - start)
+        # end try
+
+    def snapshot(self, mailboxLength):
+        """return statistics as a dictionary"""
+        return {
+            "mailboxLength": mailboxLength,
+            "mailboxHighWater": self.highWater,
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+            "scans": self.scans,
+            "scanned": self.scanned,
+            "maxScanned": self.maxScanned,
+            "latency": self.latency.snapshot(),
+            "handlerTime": self.handlerTime.snapshot(),
+        }
+
+
+class Histogram:
+
+    """Counts durations in buckets whose bounds are powers of two microseconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Bucket n counts the durations of less than 2 ** n microseconds that
+        # didn't fit into bucket n - 1.
+        self.__buckets = []
+
+    def record(self, seconds):
+        """count a duration"""
+        bucket = int(seconds * 1e6).bit_length()
+        buckets = self.__buckets
+        if bucket >= len(buckets):
+            buckets.extend([0] * (bucket + 1 - len(buckets)))
+        buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """return upper bound, in seconds, of the bucket that holds the given
+        percentile of the durations, or None if there are none"""
+        if not self.count:
+            return None
+        # The rank of the duration that we are looking for, counting from 1
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for bucket, count in enumerate(self.__buckets):
+            seen += count
+            if seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+            # end if
+        # end for
+        return self.max
+
+    def snapshot(self):
+        """return the histogram as a dictionary"""
+        if self.count:
+            mean = self.total / self.count
+        else:
+            mean = None
+        return {
+            "count": self.count,
+            "mean": mean,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            # (upper bound in seconds, count) pairs of the non-empty buckets
+            "buckets": [
+                ((1 << bucket) / 1e6, count)
+                for bucket, count in enumerate(self.__buckets)
+                if count
+            ],
+        }
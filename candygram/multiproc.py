@@ -0,0 +1,151 @@
+# multiproc.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Processes that run in a separate operating system process
+
+Since all Candygram processes in an interpreter share its global interpreter
+lock, CPU-bound processes cannot make use of more than one processor. The
+spawn() and spawnLink() functions in this module run a process in a new child
+interpreter instead, and return a RemoteProcess that stands in for it. A
+RemoteProcess is a Process like any other: messages sent to it, exit signals,
+and links are forwarded to the child over a pipe.
+
+Messages are pickled, so they must consist of picklable values, and the
+function that the child runs must be importable by name. The child imports the
+parent's main script under a different name than __main__, so a script must
+guard its main code with "if __name__ == '__main__':". A Process that occurs
+in a message is sent as a reference to it; the other side receives a
+RemoteProcess for it, or the original Process if it is sent back again.
+
+The child interpreter runs for as long as the function that it was spawned
+with. If the pipe to the other side breaks, every RemoteProcess that refers to
+a process on the other side terminates with the reason 'noconnection'.
+
+The functions in this module only work with the "thread" backend, since a
+dedicated process reads from each pipe.
+"""
+
+__revision__ = "$Id$"
+
+
+import cPickle
+import imp
+import os
+import subprocess
+import sys
+import traceback
+
+from candygram.main import spawn as spawnLocal, link, ExitError, _checkSignal
+from candygram.channel import Channel, RemoteProcess, RemoteExceptionReason
+from candygram import threadimpl
+
+
+__all__ = ["spawn", "spawnLink", "RemoteProcess", "RemoteExceptionReason"]
+
+
+# Executed by the child interpreter. The child needs our sys.path before it can
+# even import candygram.
+_BOOTSTRAP = (
+    "import sys, cPickle; path, mainPath = cPickle.load(sys.stdin); "
+    "sys.path[:] = path; "
+    "from candygram.multiproc import _childMain; _childMain(mainPath)"
+)
+
+
+def spawn(func, *args, **kwargs):
+    """spawn new process in a child interpreter"""
+    return _doSpawn(func, args, kwargs, False)
+
+
+def spawnLink(func, *args, **kwargs):
+    """spawn and link to a new process in a child interpreter atomically"""
+    return _doSpawn(func, args, kwargs, True)
+
+
+def _doSpawn(func, args, kwargs, linkChild):
+    """start child interpreter and return RemoteProcess of its process"""
+    _checkSignal()
+    if not callable(func):
+        raise ExitError("badarg")
+    popen = subprocess.Popen(
+        [sys.executable, "-c", _BOOTSTRAP],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        # Otherwise, other children would keep our pipes open.
+        close_fds=(os.name == "posix"),
+    )
+    mainPath = getattr(sys.modules["__main__"], "__file__", None)
+    cPickle.dump((sys.path, mainPath), popen.stdin, 2)
+    channel = Channel(popen.stdout, popen.stdin, popen.wait)
+    try:
+        channel.write(("spawn", func, args, kwargs))
+    except (cPickle.PicklingError, TypeError):
+        channel.close()
+        raise ExitError("badarg")
+    # end try
+    frame = channel.read()
+    if frame is None or frame[0] != "started":
+        # The child couldn't unpickle func or its arguments.
+        channel.close()
+        raise ExitError("badarg")
+    proc = frame[1]
+    channel.setRoot(proc)
+    if linkChild:
+        link(proc)
+    # The reader isn't started until now, so that the child can't be reported
+    # to have exited before we've linked to it.
+    spawnLocal(channel.run)
+    return proc
+
+
+def _childMain(mainPath):
+    """main function of child interpreter"""
+    # From now on, the only thing written to stdout must be our frames.
+    output = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    channel = Channel(sys.stdin, output)
+    # The parent must hear of the process before it can terminate.
+    exported = threadimpl.allocateLock()
+    exported.acquire()
+    try:
+        if mainPath is not None:
+            # Functions defined in the parent's main script are pickled as
+            # belonging to __main__. (The script's own main code is skipped, since
+            # it doesn't run as __main__ here.)
+            sys.modules["__main__"] = imp.load_source("__parents_main__", mainPath)
+        tag, func, args, kwargs = channel.read()
+        proc = spawnLocal(_runWhenExported, exported, func, args, **kwargs)
+    except:
+        traceback.print_exc()
+        channel.write(("error",))
+    else:
+        channel.write(("started", proc))
+        exported.release()
+        channel.run()
+    # end try
+    # Don't wait for any other processes; the parent has hung up on us.
+    sys.stderr.flush()
+    os._exit(0)
+
+
+def _runWhenExported(exported, func, args, **kwargs):
+    """main function of child's initial process"""
+    exported.acquire()
+    func(*args, **kwargs)
@@ -0,0 +1,446 @@
+# node.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Node class
+
+A Node connects the processes of this interpreter with those of other
+interpreters, possibly on other hosts, over TCP. Each Node listens on a socket
+for connections from other Nodes. Once two Nodes are connected, their processes
+can refer to each other: a Process that is sent in a message to another node
+turns into a RemoteProcess there, which carries the name of its node and
+forwards messages, exit signals and links back over the connection. (See the
+channel module.) Only one connection is made to each other Node, no matter how
+many processes communicate over it.
+
+To get hold of a process on another Node in the first place, a process can be
+registered with its Node under a name and then looked up from another Node via
+the address of the first.
+
+If the connection between two Nodes is lost, every RemoteProcess of the other
+Node terminates with the reason 'noconnection', so processes that are linked to
+them receive an EXIT signal.
+
+Frames are unpickled, so a peer can make a Node run arbitrary code. Before
+anything is unpickled, both sides of a new connection therefore prove that they
+know a shared secret, the cookie, as Erlang nodes do: the accepting side sends
+a random challenge, the connecting side answers with an HMAC of it under the
+cookie along with a challenge of its own, and the accepting side answers that
+only once it has checked the first answer. A peer that fails the check is
+disconnected. The cookie doesn't encrypt the traffic, though, so a Node should
+only be exposed on networks whose hosts are trusted.
+
+If two Nodes connect to each other at the same time, the accepting side of
+each connection decides which one to keep before either carries a message: the
+connection that was made by the Node with the lower address. A Node also turns
+down a connection from a Node that it is already connected to.
+"""
+
+__revision__ = "$Id$"
+
+
+import hashlib
+import hmac
+import os
+import socket
+import time
+
+from candygram.main import spawn, exit, self_, ExitError, _checkSignal
+from candygram.channel import Channel
+from candygram.condition import Condition
+from candygram.process import Process
+from candygram.receiver import Receiver, Message
+from candygram.pattern import Any
+
+
+# File that holds the cookie of Nodes that aren't given one, like Erlang's
+# ~/.erlang.cookie
+COOKIE_FILE = "~/.candygram.cookie"
+
+# Length of the random challenges of the handshake, in bytes
+CHALLENGE_SIZE = 16
+
+# Seconds that a peer may take to complete the handshake
+HANDSHAKE_TIMEOUT = 10
+
+
+class Node:
+
+    """Connects local processes with processes of other interpreters"""
+
+    def __init__(self, name, host="127.0.0.1", port=0, cookie=None):
+        _checkSignal()
+        if not isinstance(name, str):
+            raise ExitError("badarg")
+        if cookie is None:
+            cookie = defaultCookie()
+        elif not isinstance(cookie, str) or not cookie:
+            raise ExitError("badarg")
+        self.name = name
+        self.__cookie = cookie
+        self.__listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__listener.bind((host, port))
+        self.__listener.listen(5)
+        self.address = self.__listener.getsockname()
+        # Lock for __names, __channels, __pending, and __stopped, which is
+        # notified when a handshake finishes
+        self.__lock = Condition()
+        # Maps registered names to processes
+        self.__names = {}
+        # Maps addresses of other nodes to (Channel, name server) tuples
+        self.__channels = {}
+        # Maps addresses of other nodes to (socket, True if we made the
+        # connection) tuples of the handshakes that are under way
+        self.__pending = {}
+        self.__stopped = False
+        self.__nameServer = spawn(self.__serveNames)
+        spawn(self.__accept)
+
+    def register(self, name, proc):
+        """make proc known to other nodes under name"""
+        _checkSignal()
+        if not isinstance(name, str) or not isinstance(proc, Process):
+            raise ExitError("badarg")
+        self.__lock.acquire()
+        self.__names[name] = proc
+        self.__lock.release()
+
+    def unregister(self, name):
+        """remove registered name"""
+        _checkSignal()
+        self.__lock.acquire()
+        try:
+            if name not in self.__names:
+                raise ExitError("badarg")
+            del self.__names[name]
+        finally:
+            self.__lock.release()
+        # end try
+
+    def whereis(self, address, name, timeout=5000):
+        """return process that is registered under name with node at address, or
+        None if there is none"""
+        _checkSignal()
+        nameServer = self.__connect(tuple(address))
+        nameServer.send(("whereis", name, self_()))
+        r = Receiver()
+        r.addHandler(("whereis", name, Any), lambda m: m[2], Message)
+        return r.receive(timeout)
+
+    def nodes(self):
+        """return names of connected nodes"""
+        self.__lock.acquire()
+        result = [channel.peer for channel, nameServer in self.__channels.values()]
+        self.__lock.release()
+        return result
+
+    def stop(self):
+        """stop listening and close all connections"""
+        self.__lock.acquire()
+        self.__stopped = True
+        channels = self.__channels.values()
+        self.__lock.notifyAll()
+        self.__lock.release()
+        _shutdown(self.__listener)
+        for channel, nameServer in channels:
+            channel.shutdown()
+        # end for
+        exit(self.__nameServer, "kill")
+
+    def __connect(self, address):
+        """return name server of node at address, connecting to it if necessary"""
+        deadline = time.time() + HANDSHAKE_TIMEOUT
+        self.__lock.acquire()
+        try:
+            while address in self.__pending:
+                # Another handshake with the node is under way, so wait for its
+                # connection rather than make a second one.
+                if not self.__lock.wait(deadline - time.time()):
+                    raise ExitError("noconnection")
+            # end while
+            if self.__stopped:
+                raise ExitError("noconnection")
+            if address in self.__channels:
+                return self.__channels[address][1]
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.__pending[address] = (sock, True)
+        finally:
+            self.__lock.release()
+        # end try
+        try:
+            sock.connect(address)
+        except socket.error:
+            sock.close()
+            self.__endHandshake(address, sock)
+            raise ExitError("noconnection")
+        # end try
+        nameServer = self.__handshake(sock, address)
+        if nameServer is not None:
+            return nameServer
+        # The node turned us down in favour of its own connection to us.
+        self.__lock.acquire()
+        try:
+            while address not in self.__channels:
+                if self.__stopped or not self.__lock.wait(deadline - time.time()):
+                    raise ExitError("noconnection")
+            # end while
+            return self.__channels[address][1]
+        finally:
+            self.__lock.release()
+        # end try
+
+    def __accept(self):
+        """main function of process that accepts connections from other nodes"""
+        while True:
+            try:
+                sock = self.__listener.accept()[0]
+            except socket.error:
+                # stop() has been called.
+                break
+            # end try
+            spawn(self.__handshake, sock, None)
+        # end while
+        self.__listener.close()
+
+    def __handshake(self, sock, address):
+        """introduce ourselves to the node on the other side of sock, which is
+        at address if we connected to it, or None if it connected to us; return
+        its name server, or None if the connection was turned down"""
+        outgoing = address is not None
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if not self.__authenticate(sock, outgoing):
+                _shutdown(sock)
+                sock.close()
+                raise ExitError("noconnection")
+            channel = _SocketChannel(sock)
+            try:
+                hello = ("hello", self.name, self.address, self.__nameServer)
+                if outgoing:
+                    # The accepting side decides whether to keep the connection,
+                    # and only answers our hello if it does.
+                    channel.write(hello)
+                frame = channel.read()
+                if outgoing and frame == ("nok",):
+                    channel.close()
+                    return None
+                if frame is None or frame[0] != "hello":
+                    raise ExitError("noconnection")
+                tag, peer, peerAddress, nameServer = frame
+                if not outgoing:
+                    address = tuple(peerAddress)
+                    if not self.__admit(sock, address):
+                        channel.write(("nok",))
+                        channel.close()
+                        return None
+                    # end if
+                # end if
+                channel.peer = peer
+                self.__lock.acquire()
+                try:
+                    if self.__stopped:
+                        raise ExitError("noconnection")
+                    self.__channels[address] = (channel, nameServer)
+                finally:
+                    self.__lock.release()
+                # end try
+                if not outgoing:
+                    channel.write(hello)
+                # end if
+            except:
+                self.__lock.acquire()
+                if self.__channels.get(address, (None,))[0] is channel:
+                    del self.__channels[address]
+                self.__lock.release()
+                channel.shutdown()
+                channel.close()
+                raise
+            # end try
+        finally:
+            if address is not None:
+                self.__endHandshake(address, sock)
+            # end if
+        # end try
+        spawn(self.__serve, channel, address)
+        return nameServer
+
+    def __admit(self, sock, address):
+        """decide whether to keep a connection that the node at address has made
+        to us, before either side sends anything over it; return True if we do
+
+        Both nodes must come to the same decision, so if we are connecting to the
+        node ourselves, the connection made by the node with the lower address is
+        kept.
+        """
+        self.__lock.acquire()
+        try:
+            if self.__stopped or address in self.__channels:
+                return False
+            pending = self.__pending.get(address)
+            if pending is not None and (not pending[1] or tuple(self.address) < address):
+                return False
+            # Anybody that waits for our own handshake with the node waits for
+            # this one instead.
+            self.__pending[address] = (sock, False)
+            return True
+        finally:
+            self.__lock.release()
+        # end try
+
+    def __endHandshake(self, address, sock):
+        """forget handshake over sock with the node at address"""
+        self.__lock.acquire()
+        pending = self.__pending.get(address)
+        if pending is not None and pending[0] is sock:
+            del self.__pending[address]
+        self.__lock.notifyAll()
+        self.__lock.release()
+
+    def __authenticate(self, sock, outgoing):
+        """prove to the node on the other side of sock that we know the cookie,
+        and check that it does, too; return True if it does"""
+        sock.settimeout(HANDSHAKE_TIMEOUT)
+        try:
+            try:
+                challenge = os.urandom(CHALLENGE_SIZE)
+                if outgoing:
+                    peerChallenge = _recvAll(sock, CHALLENGE_SIZE)
+                    sock.sendall(
+                        challenge + self.__digest("connect", peerChallenge, challenge)
+                    )
+                    expected = self.__digest("accept", challenge, peerChallenge)
+                    return _compareDigests(_recvAll(sock, len(expected)), expected)
+                # The connecting side answers first, so that we never answer a
+                # challenge for a peer that doesn't know the cookie.
+                sock.sendall(challenge)
+                peerChallenge = _recvAll(sock, CHALLENGE_SIZE)
+                expected = self.__digest("connect", challenge, peerChallenge)
+                if not _compareDigests(_recvAll(sock, len(expected)), expected):
+                    return False
+                sock.sendall(self.__digest("accept", peerChallenge, challenge))
+                return True
+            except (socket.error, EOFError):
+                return False
+            # end try
+        finally:
+            sock.settimeout(None)
+        # end try
+
+    def __digest(self, role, challenge, peerChallenge):
+        """return answer to challenge by the side that has the given role"""
+        return hmac.new(
+            self.__cookie, role + challenge + peerChallenge, hashlib.sha256
+        ).digest()
+
+    def __serve(self, channel, address):
+        """main function of process that reads from channel"""
+        channel.run()
+        self.__lock.acquire()
+        if address in self.__channels and self.__channels[address][0] is channel:
+            del self.__channels[address]
+        self.__lock.release()
+
+    def __serveNames(self):
+        """main function of name server process"""
+        r = Receiver()
+        r.addHandler(("whereis", Any, Process), self.__whereis, Message)
+        for _ in r:
+            pass
+        # end for
+
+    def __whereis(self, message):
+        """answer ('whereis', name, proc) message"""
+        tag, name, proc = message
+        self.__lock.acquire()
+        result = self.__names.get(name)
+        self.__lock.release()
+        proc.send(("whereis", name, result))
+
+
+def defaultCookie():
+    """return cookie from COOKIE_FILE, creating the file with a random cookie if
+    it doesn't exist"""
+    path = os.path.expanduser(COOKIE_FILE)
+    try:
+        # Only the owner may read the cookie.
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0600)
+    except OSError:
+        pass
+    else:
+        os.write(fd, os.urandom(20).encode("hex"))
+        os.close(fd)
+    # end try
+    f = open(path)
+    try:
+        cookie = f.read().strip()
+    finally:
+        f.close()
+    # end try
+    if not cookie:
+        raise ExitError("badarg")
+    return cookie
+
+
+def _recvAll(sock, size):
+    """return next size bytes from sock"""
+    data = ""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError()
+        data += chunk
+    # end while
+    return data
+
+
+def _compareDigests(a, b):
+    """return True if digests a and b are equal, taking as long either way"""
+    compare = getattr(hmac, "compare_digest", None)
+    if compare is not None:
+        return compare(a, b)
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    # end for
+    return result == 0
+
+
+class _SocketChannel(Channel):
+
+    """A Channel over a TCP connection"""
+
+    def __init__(self, sock):
+        Channel.__init__(self, sock.makefile("rb"), sock.makefile("wb"), sock.close)
+        self.__sock = sock
+
+    def shutdown(self):
+        """break off connection, which makes the reader see the end of it"""
+        _shutdown(self.__sock)
+
+
+def _shutdown(sock):
+    """shut down socket, ignoring errors if it isn't connected"""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except socket.error:
+        pass
+    # end try
@@ -18,7 +18,16 @@
 # along with Candygram; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
-"""Pattern filter generator"""
+"""Pattern filter generator
+
+There are two filter generators. genFilter() builds a filter out of nested
+closures, one for each element of the pattern. compileFilter() generates the
+source code of a single function that performs all of the checks inline, and is
+considerably faster for sequence and dictionary patterns. Both generators accept
+the same patterns and produce filters that behave identically, including the
+exception that a dictionary pattern raises when it is applied to a value that
+isn't a dictionary but supports the 'in' operator (e.g., a string).
+"""
 
 __revision__ = "$Id: pattern.py,v 1.9 2004/09/03 17:06:46 hobb0001 Exp $"
 
@@ -30,6 +39,19 @@ import types
 # other value.
 Any = object()
 
+# Index keys for messages that don't have an indexable first element. Opaque is
+# the key for a non-empty tuple or list whose first element can't be indexed,
+# and Unsequenced is the key for every other message.
+Opaque = object()
+Unsequenced = object()
+
+# Types whose instances may be used as index keys. Their hash values are
+# consistent with their == operator (even between types, e.g., 1 == 1.0 ==
+# True), so a dictionary lookup finds every value that a value filter would
+# match. Subclasses of these types are not included, since they may override
+# either method.
+IndexableTypes = frozenset([str, unicode, int, long, float, bool, type(None)])
+
 
 def genFilter(pattern):
     """generate a pattern filter"""
@@ -48,6 +70,70 @@ def genFilter(pattern):
     return result
 
 
+def indexKey(pattern):
+    """return the value that the first element of a message must be equal to
+    for pattern to match it, or Any if there is no such requirement"""
+    if isinstance(pattern, list):
+        # The last element of a list pattern may match zero elements.
+        pattern = pattern[:-1]
+    elif not isinstance(pattern, tuple):
+        return Any
+    if not pattern or type(pattern[0]) not in IndexableTypes:
+        return Any
+    return pattern[0]
+
+
+class Guard:
+
+    """A cheap test that a message must pass for a pattern to match it
+
+    A message can only match the pattern if all of the following are true:
+     - cls is None, or the message is an instance of cls.
+     - minLen is None, or the message is a sequence whose length is at least
+       minLen and (unless maxLen is None) at most maxLen.
+     - key is Any, or the message's key is equal to key. If isSeq is True, the
+       message's key is its first element (see messageIndexKey()); otherwise,
+       the key is the message itself. Either way, messages whose key is not of
+       one of the IndexableTypes must be treated as if they might match.
+    """
+
+    def __init__(self, cls=None, minLen=None, maxLen=None, key=Any, isSeq=False):
+        self.cls = cls
+        self.minLen = minLen
+        self.maxLen = maxLen
+        self.key = key
+        self.isSeq = isSeq
+
+
+def genGuard(pattern):
+    """generate the Guard for a pattern"""
+    if isinstance(pattern, tuple):
+        return Guard(type(pattern), len(pattern), len(pattern), indexKey(pattern), True)
+    elif isinstance(pattern, list):
+        if not pattern:
+            return Guard(type(pattern), 0, 0, Any, True)
+        return Guard(type(pattern), len(pattern) - 1, None, indexKey(pattern), True)
+    elif type(pattern) in IndexableTypes:
+        return Guard(key=pattern)
+    elif (type(pattern) is type and pattern is not object) or type(
+        pattern
+    ) is types.ClassType:
+        # Don't use a class whose metaclass might override isinstance(), or
+        # object, which even old-style instances are instances of.
+        return Guard(pattern)
+    return Guard()
+
+
+def messageIndexKey(message):
+    """return the key under which message is indexed in a Mailbox"""
+    # An empty sequence can't match a pattern that has an index key, either.
+    if not isinstance(message, (tuple, list)) or not message:
+        return Unsequenced
+    if type(message[0]) not in IndexableTypes:
+        return Opaque
+    return message[0]
+
+
 def genAnyFilter():
     """gen filter for Any"""
     return lambda x: True
@@ -118,3 +204,140 @@ def genDictFilter(dict_):
         return True
 
     return filt
+
+
+def compileFilter(pattern):
+    """generate a pattern filter as a single compiled function"""
+    if isinstance(pattern, (tuple, list, dict)):
+        return _FilterCompiler().compile(pattern)
+    # Closures are just as fast for any other kind of pattern.
+    return genFilter(pattern)
+
+
+# Patterns that differ only in their values, types and functions generate the
+# same source code, which is mapped to its compiled code object here. No lock is
+# needed: if two threads compile the same source at once, both results are
+# equally good.
+_CodeCache = {}
+
+
+class _FilterCompiler:
+
+    """generates the code of a filter function
+
+    Each check is a line of the form 'if not <check>: return false'. The values,
+    types and functions that occur in the pattern are referred to by name
+    (c0, c1, ...) instead of being written into the source code. They are passed
+    to the function as default argument values, as are the builtins that it
+    uses, so that the code only ever looks up local variables.
+    """
+
+    def __init__(self):
+        self.__lines = []
+        self.__constants = [isinstance, len, True, False]
+        self.__numVars = 0
+
+    def compile(self, pattern):
+        """return filter function for pattern"""
+        self.__genChecks(pattern, "x", "    ")
+        params = ["c%d" % i for i in xrange(len(self.__constants) - 4)]
+        source = "def filt(x, isinstance, len, true, false%s):\n%s\n    return true\n" % (
+            "".join([", " + param for param in params]),
+            "\n".join(self.__lines),
+        )
+        code = _CodeCache.get(source)
+        if code is None:
+            namespace = {}
+            exec compile(source, "<pattern>", "exec") in namespace
+            code = _CodeCache[source] = namespace["filt"].func_code
+        return types.FunctionType(code, {}, "filt", tuple(self.__constants))
+
+    def __genChecks(self, pattern, expr, indent):
+        """generate the checks that the value of expr matches pattern"""
+        if isinstance(pattern, tuple) or isinstance(pattern, list):
+            self.__genSeqChecks(pattern, self.__bind(expr, indent), indent)
+        elif isinstance(pattern, dict):
+            self.__genDictChecks(pattern, self.__bind(expr, indent), indent)
+        elif pattern is Any:
+            pass
+        elif isinstance(pattern, type) or type(pattern) is types.ClassType:
+            self.__lines.append(
+                "%sif not isinstance(%s, %s): return false"
+                % (indent, expr, self.__const(pattern))
+            )
+        elif callable(pattern):
+            self.__lines.append(
+                "%sif not %s(%s): return false" % (indent, self.__const(pattern), expr)
+            )
+        else:
+            self.__lines.append(
+                "%sif not %s == %s: return false" % (indent, expr, self.__const(pattern))
+            )
+        # end if
+
+    def __genSeqChecks(self, seq, var, indent):
+        """generate checks for a sequence pattern"""
+        # A list pattern's last element matches any number of excess values.
+        # (The last element may itself be None, so it needs a flag of its own.)
+        hasLast = isinstance(seq, list) and len(seq) > 0
+        if hasLast:
+            lastPattern = seq[-1]
+            seq = seq[:-1]
+        seqLen = len(seq)
+        lines = self.__lines
+        lines.append(
+            "%sif not isinstance(%s, %s): return false"
+            % (indent, var, self.__const(type(seq)))
+        )
+        if not hasLast:
+            # Don't allow any excess values if there is no last pattern.
+            lines.append("%sif len(%s) != %d: return false" % (indent, var, seqLen))
+        else:
+            lines.append("%sif len(%s) < %d: return false" % (indent, var, seqLen))
+        for i in xrange(seqLen):
+            self.__genChecks(seq[i], "%s[%d]" % (var, i), indent)
+        # end for
+        if hasLast and lastPattern is not Any:
+            item = self.__newVar()
+            lines.append("%sfor %s in %s[%d:]:" % (indent, item, var, seqLen))
+            numLines = len(lines)
+            self.__genChecks(lastPattern, item, indent + "    ")
+            if len(lines) == numLines:
+                # The last pattern (e.g., {}) matches anything, so the loop would
+                # have an empty body.
+                del lines[-1]
+            # end if
+        # end if
+
+    def __genDictChecks(self, dict_, var, indent):
+        """generate checks for a dictionary pattern"""
+        for key, pattern in dict_.items():
+            key = self.__const(key)
+            self.__lines.append("%sif %s not in %s: return false" % (indent, key, var))
+            if pattern is Any:
+                # genDictFilter() looks the value up even if it doesn't check it,
+                # which raises an exception if the value isn't a dictionary.
+                self.__lines.append("%s%s[%s]" % (indent, var, key))
+            else:
+                self.__genChecks(pattern, "%s[%s]" % (var, key), indent)
+            # end if
+        # end for
+
+    def __bind(self, expr, indent):
+        """return a variable that holds the value of expr"""
+        if expr.isalnum():
+            # expr is already a variable
+            return expr
+        var = self.__newVar()
+        self.__lines.append("%s%s = %s" % (indent, var, expr))
+        return var
+
+    def __newVar(self):
+        """return name of an unused local variable"""
+        self.__numVars += 1
+        return "v%d" % self.__numVars
+
+    def __const(self, value):
+        """return name by which the generated code can refer to value"""
+        self.__constants.append(value)
+        return "c%d" % (len(self.__constants) - 5)
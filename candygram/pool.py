@@ -0,0 +1,190 @@
+# pool.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Pool class
+
+A Pool keeps a fixed set of worker processes running, so that short tasks can
+be executed concurrently without starting a new thread for each one. A task is
+sent to a worker as a message. When the task finishes, the worker sends its
+result back to the process that submitted the task as a message of the form
+('result', taskId, value), or ('error', taskId, reason) if the task raised an
+exception, where reason is an ExceptionReason. A worker survives exceptions
+raised by its tasks, but not ExitErrors. A task cannot call hibernate(); doing
+so fails the task.
+
+The workers are linked to the process that creates the Pool, so a worker that
+is killed sends an EXIT signal to that process, and the workers go away if it
+terminates abnormally.
+"""
+
+__revision__ = "$Id$"
+
+
+import itertools
+
+from candygram.main import spawnLink, self_, ExitError
+from candygram.process import Process, ExceptionReason
+from candygram.receiver import Receiver, Message
+from candygram.pattern import Any
+from candygram import threadimpl
+
+
+# How a Pool picks the worker for a task
+STRATEGIES = ("round_robin", "least_loaded")
+
+# Source of the numbers shown by the reprs of task IDs
+_TaskNumbers = itertools.count()
+
+
+class Pool:
+
+    """A set of worker processes that execute tasks"""
+
+    def __init__(self, size, strategy="round_robin"):
+        if not isinstance(size, (int, long)) or size < 1:
+            raise ExitError("badarg")
+        if strategy not in STRATEGIES:
+            raise ExitError("badarg")
+        self.__strategy = strategy
+        self.__workers = [spawnLink(_work) for i in range(size)]
+        # Lock for __next
+        self.__lock = threadimpl.allocateLock()
+        self.__next = 0
+
+    def workers(self):
+        """return list of worker processes"""
+        return self.__workers[:]
+
+    def apply(self, func, *args, **kwargs):
+        """submit task that calls func with args; return task ID"""
+        if not callable(func):
+            raise ExitError("badarg")
+        taskId = _TaskId(_TaskNumbers.next())
+        self.__chooseWorker().send(("task", taskId, self_(), func, args, kwargs))
+        return taskId
+
+    def call(self, func, *args, **kwargs):
+        """call func with args on a worker and return the result"""
+        return self.__wait(self.apply(func, *args, **kwargs))
+
+    def map(self, func, sequence):
+        """call func on each item of sequence concurrently; return list of
+        results"""
+        taskIds = [self.apply(func, item) for item in sequence]
+        # Collect the results in the order that they arrive with a single Receiver,
+        # rather than creating one for each task.
+        pending = dict.fromkeys(taskIds)
+        r = Receiver()
+        r.addHandler(("result", pending.__contains__, Any), lambda m: m, Message)
+        r.addHandler(("error", pending.__contains__, Any), lambda m: m, Message)
+        results = {}
+        for i in xrange(len(taskIds)):
+            message = r.receive()
+            results[message[1]] = message
+        # end for
+        return [_unpackResult(results[taskId]) for taskId in taskIds]
+
+    def stop(self):
+        """let each worker exit normally once it has finished its pending tasks"""
+        for worker in self.__workers:
+            worker.send("stop")
+        # end for
+
+    def __chooseWorker(self):
+        """return worker that should execute the next task"""
+        workers = self.__workers
+        if self.__strategy == "least_loaded":
+            # The length is only a hint, so the mailbox doesn't need to be locked.
+            workers = [worker for worker in workers if worker.isAlive()]
+            if not workers:
+                raise ExitError("noproc")
+            return min(workers, key=lambda worker: len(worker._mailbox))
+        self.__lock.acquire()
+        try:
+            for i in xrange(len(workers)):
+                worker = workers[self.__next]
+                self.__next = (self.__next + 1) % len(workers)
+                if worker.isAlive():
+                    return worker
+                # end if
+            # end for
+        finally:
+            self.__lock.release()
+        # end try
+        raise ExitError("noproc")
+
+    def __wait(self, taskId):
+        """wait for result of task"""
+        r = Receiver()
+        r.addHandler(("result", taskId, Any), _unpackResult, Message)
+        r.addHandler(("error", taskId, Any), _unpackResult, Message)
+        return r.receive()
+
+
+class _TaskId:
+
+    """Identifies a task, as returned by Pool.apply()
+
+    A task ID is only equal to itself, so a pattern that contains one can't match
+    an unrelated message, as a pattern that contains a small integer could.
+    """
+
+    def __init__(self, number):
+        self.__number = number
+
+    def __repr__(self):
+        return "<TaskId %d>" % self.__number
+
+
+def _work():
+    """main function of worker processes"""
+    r = Receiver()
+    r.addHandler(("task", Any, Process, Any, tuple, dict), _runTask, Message)
+    r.addHandler("stop")
+    while r.receive():
+        pass
+    # end while
+
+
+def _runTask(message):
+    """run task and send its result to the process that submitted it"""
+    _, taskId, client, func, args, kwargs = message
+    try:
+        result = func(*args, **kwargs)
+    except ExitError:
+        raise
+    except:
+        # This also catches Hibernate: a worker must not hibernate with the
+        # task's client still waiting, so hibernate() fails the task instead.
+        client.send(("error", taskId, ExceptionReason()))
+    else:
+        client.send(("result", taskId, result))
+    # end try
+    return True
+
+
+def _unpackResult(message):
+    """return value of ('result', taskId, value) message, or raise exception of
+    ('error', taskId, reason) message in current process"""
+    tag, taskId, value = message
+    if tag == "error":
+        excInfo = value.excInfo
+        raise excInfo[0], excInfo[1], excInfo[2]
+    return value
@@ -28,8 +28,19 @@ import sys
 import weakref
 
 from candygram.main import ExitError, _checkSignal
-from candygram.threadimpl import allocateLock, startThread, getCurrentThread
+from candygram import threadimpl
 from candygram.condition import Condition
+from candygram.mailbox import Mailbox, SEQ
+from candygram.metrics import ProcessStats
+
+
+# What send() may do when a bounded mailbox is full
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_old", "error")
+
+# A process with more links and monitors than this hands the EXIT signals and
+# DOWN messages of its exit to the exit dispatcher, rather than delivering them
+# itself.
+MAX_SYNC_EXIT_SIGNALS = 64
 
 
 class Process:
@@ -38,69 +49,240 @@ class Process:
 
     def __init__(self):
         self.__alive = True
-        self._mailbox = []
+        self._mailbox = Mailbox()
         self._mailboxCondition = Condition()
+        # Notified when messages are removed from a bounded mailbox
+        self._spaceCondition = Condition(self._mailboxCondition)
+        self.__mailboxSize = None
+        self.__overflow = "block"
+        # Process whose full mailbox this process is blocked on in send()
+        self.__blockedOn = None
+        # Receiver that this process is hibernating on, and the timer for its
+        # after() timeout
+        self.__hibernating = None
+        self.__hibernateTimer = None
+        # Name that process is registered under, or None. Guarded by ProcessMapLock.
+        self._registeredName = None
+        # ProcessStats, or None if the 'stats' flag isn't set
+        self._stats = None
+        # Called, without any lock held, whenever a message has been added to
+        # the mailbox or a signal has been delivered, or None. This lets a process
+        # that waits for something other than its mailbox notice either.
+        self._wakeup = None
         self.__receiverRefs = []
         self.__signal = None
-        self.__signalSet = False
+        # Set whenever __signal is. Read without holding __signalLock, so that
+        # checking for a signal costs no more than reading an attribute.
+        self._signalSet = False
+        # Check for a signal every __signalCheckInterval calls to send(), or
+        # never if it is 0. __sendsUntilCheck counts down to the next check.
+        self.__signalCheckInterval = 0
+        self.__sendsUntilCheck = 0
         self.__trapExit = False
-        self.__signalLock = allocateLock()
+        self.__signalLock = threadimpl.allocateLock()
         self.__links = {}
-        self.__linksLock = allocateLock()
+        # Map id() of the References of the monitors on this process, and of the
+        # monitors that this process has set up, to the References. Like
+        # __links, they are guarded by __linksLock.
+        self.__monitors = {}
+        self.__monitoring = {}
+        self.__linksLock = threadimpl.allocateLock()
+
+    def _setMailboxSize(self, size, overflow):
+        """limit mailbox to size messages, handling overflow as given"""
+        assert overflow in OVERFLOW_POLICIES
+        self.__mailboxSize = size
+        self.__overflow = overflow
 
     def _startThread(self, func, args, kwargs, initialLink):
         """Start process running on new thread"""
         if initialLink is not None:
             self._addLink(initialLink)
             initialLink._addLink(self)
-        startThread(self.__run, (func, args, kwargs))
+        threadimpl.startThread(self.__run, (func, args, kwargs))
 
     def isAlive(self):
         """Return True if process is still running"""
-        _checkSignal()
         return self.__alive
 
     isProcessAlive = isAlive
 
     def send(self, message):
         """Send message to process"""
-        _checkSignal()
-        if not self.isAlive():
+        # Unlike most calls, send() doesn't check for a signal unless the
+        # sender has asked for periodic checks or has to wait for room in the
+        # mailbox.
+        if _PeriodicSignalChecks:
+            _countSend()
+        if not self.__alive:
             return message
         self._mailboxCondition.acquire()
-        self._mailbox.append(message)
-        self._mailboxCondition.notify()
-        self._mailboxCondition.release()
+        try:
+            if (
+                self.__mailboxSize is not None
+                and len(self._mailbox) >= self.__mailboxSize
+                and not self.__makeRoom()
+            ):
+                return message
+            self._mailbox.append(message)
+            if self._stats is not None:
+                seq = self._mailbox.nextSeq() - 1
+                self._stats.recordSend(seq, seq, len(self._mailbox))
+            self._mailboxCondition.notify()
+            self.__checkHibernating()
+        finally:
+            self._mailboxCondition.release()
+        # end try
+        if self._wakeup is not None:
+            self._wakeup()
         return message
 
     __or__ = send
 
+    def sendMany(self, messages):
+        """Send each of messages to process, all at once"""
+        if _PeriodicSignalChecks:
+            _countSend()
+        # Don't iterate over messages while holding the lock, since it may be a
+        # generator that does just about anything.
+        messages = list(messages)
+        if (
+            getattr(self.send, "im_func", None) is not Process.send.im_func
+            or self.__mailboxSize is not None
+        ):
+            # A subclass that overrides send() expects it to see every message, and a
+            # bounded mailbox may have to apply its overflow policy to each one.
+            for message in messages:
+                self.send(message)
+            # end for
+            return messages
+        if not self.__alive or not messages:
+            return messages
+        self._mailboxCondition.acquire()
+        firstSeq = self._mailbox.nextSeq()
+        append = self._mailbox.append
+        for message in messages:
+            append(message)
+        if self._stats is not None:
+            self._stats.recordSend(
+                firstSeq, self._mailbox.nextSeq() - 1, len(self._mailbox)
+            )
+        self._mailboxCondition.notify()
+        self.__checkHibernating()
+        self._mailboxCondition.release()
+        if self._wakeup is not None:
+            self._wakeup()
+        return messages
+
+    def __makeRoom(self):
+        """apply overflow policy to full mailbox; return False if the message
+        being sent should be dropped"""
+        assert self._mailboxCondition.locked()
+        sender = lookupCurrentProcess()
+        if sender is self or sender is None or getattr(
+            getProcessLocal(), "forceSend", False
+        ):
+            # A process can't wait for itself to make room, a thread that isn't a
+            # process can't be interrupted, and EXIT messages are never lost.
+            return True
+        overflow = self.__overflow
+        if overflow == "drop_new":
+            if self._stats is not None:
+                self._stats.dropped += 1
+            return False
+        elif overflow == "drop_old":
+            entry = self._mailbox.first()
+            self._mailbox.remove(entry)
+            if self._stats is not None:
+                self._stats.recordRemove(entry[SEQ], False)
+            return True
+        elif overflow == "error":
+            raise ExitError("mailbox_full")
+        # end if
+        # Block until a receiver makes room. _signal() wakes us up if the sender
+        # receives a signal in the meantime.
+        sender.__blockedOn = self
+        try:
+            while self.__alive and len(self._mailbox) >= self.__mailboxSize:
+                sender._checkSignal()
+                self._spaceCondition.wait()
+            # end while
+        finally:
+            sender.__blockedOn = None
+        # end try
+        return self.__alive
+
     def __repr__(self):
         return "<PID %d>" % id(self)
 
     def _signal(self, signal):
         """Send signal to process"""
-        assert isinstance(signal, ExitError)
-        assert signal.proc is not self
-        if not self.isAlive():
+        self.__deliverSignals([signal])
+
+    def _signalMany(self, signals):
+        """Send each of signals to process, in order"""
+        if getattr(self._signal, "im_func", None) is not Process._signal.im_func:
+            # A subclass that overrides _signal() expects it to see every signal.
+            for signal in signals:
+                self._signal(signal)
+            # end for
             return
+        self.__deliverSignals(signals)
+
+    def __deliverSignals(self, signals):
+        """deliver signals, taking signalLock and waking process up only once"""
+        if not self.__alive:
+            return
+        messages = []
+        wakeUp = False
         self.__signalLock.acquire()
         try:
-            if self.__trapExit and signal.reason != "kill":
-                self.send(("EXIT", signal.proc, signal.reason))
-                return
-            elif signal.reason == "normal":
-                return
-            elif self.__signal is None:
-                self.__signal = signal
-                self.__signalSet = True
-            # end if
+            for signal in signals:
+                assert isinstance(signal, ExitError)
+                assert signal.proc is not self
+                if self.__trapExit and signal.reason != "kill":
+                    messages.append(("EXIT", signal.proc, signal.reason))
+                elif signal.reason == "normal":
+                    continue
+                elif self.__signal is None:
+                    self.__signal = signal
+                    self._signalSet = True
+                    wakeUp = True
+                else:
+                    wakeUp = True
+                # end if
+            # end for
+            if messages:
+                local = getProcessLocal()
+                local.forceSend = True
+                try:
+                    if len(messages) == 1:
+                        self.send(messages[0])
+                    else:
+                        self.sendMany(messages)
+                finally:
+                    local.forceSend = False
+                # end try
         finally:
             self.__signalLock.release()
-        # Wake up process if it is waiting on a receive().
+        if not wakeUp:
+            return
+        # Wake up process if it is waiting on a receive() or a send(), or if it is
+        # hibernating.
         self._mailboxCondition.acquire()
         self._mailboxCondition.notify()
+        if self.__hibernating is not None:
+            self.__wakeUp(False)
         self._mailboxCondition.release()
+        blockedOn = self.__blockedOn
+        if blockedOn is not None:
+            blockedOn._spaceCondition.acquire()
+            blockedOn._spaceCondition.notifyAll()
+            blockedOn._spaceCondition.release()
+        # end if
+        if self._wakeup is not None:
+            self._wakeup()
+        # end if
 
     def _addLink(self, proc):
         """link a proc with this process"""
@@ -121,6 +303,37 @@ class Process:
             del self.__links[procId]
         self.__linksLock.release()
 
+    def _addMonitor(self, ref):
+        """start monitoring this process on behalf of ref's watcher"""
+        ref._watcher.__addMonitoring(ref)
+        self.__linksLock.acquire()
+        alive = self.__alive
+        if alive:
+            self.__monitors[id(ref)] = ref
+        self.__linksLock.release()
+        if not alive:
+            ref._watcher.send(("DOWN", ref, self, "noproc"))
+        # end if
+
+    def _removeMonitor(self, ref):
+        """stop monitoring this process on behalf of ref's watcher"""
+        self.__linksLock.acquire()
+        self.__monitors.pop(id(ref), None)
+        self.__linksLock.release()
+        ref._watcher.__removeMonitoring(ref)
+
+    def __addMonitoring(self, ref):
+        """record that this process monitors another"""
+        self.__linksLock.acquire()
+        self.__monitoring[id(ref)] = ref
+        self.__linksLock.release()
+
+    def __removeMonitoring(self, ref):
+        """record that this process no longer monitors another"""
+        self.__linksLock.acquire()
+        self.__monitoring.pop(id(ref), None)
+        self.__linksLock.release()
+
     def _addReceiver(self, receiver):
         """register a new receiver with this process"""
         self._mailboxCondition.acquire()
@@ -132,18 +345,24 @@ class Process:
     def _removeReceiver(self, receiver):
         """unregister receiver from this process"""
         self._mailboxCondition.acquire()
-        for i in xrange(len(self.__receiverRefs)):
-            if self.__receiverRefs[i]() is receiver:
-                del self.__receiverRefs[i]
+        # Iterate over a copy, since _removeReceiverRef() doesn't take the lock.
+        for ref in self.__receiverRefs[:]:
+            if ref() is receiver:
+                self.__receiverRefs.remove(ref)
                 break
             # end if
         self._mailboxCondition.release()
 
     def _removeReceiverRef(self, ref):
         """called when no more [strong] references to a registered receiver"""
-        self._mailboxCondition.acquire()
-        self.__receiverRefs.remove(ref)
-        self._mailboxCondition.release()
+        # The garbage collector can call us on a thread that already holds the
+        # mailbox lock, e.g., while a receive() scans the mailbox, so we must not
+        # acquire it. list.remove() is atomic.
+        try:
+            self.__receiverRefs.remove(ref)
+        except ValueError:
+            pass
+        # end try
 
     def _getReceivers(self):
         """return list of registered receivers"""
@@ -164,17 +383,80 @@ class Process:
         # Don't propagate a 'kill' signal; change the reason to 'killed' instead.
         if exitError.reason == "kill":
             exitError.reason = "killed"
+        global _PeriodicSignalChecks
         self.__alive = False
+        getProcessMapLock().acquire()
+        if self._registeredName is not None:
+            del _Registry[self._registeredName]
+            self._registeredName = None
+        if self.__signalCheckInterval:
+            _PeriodicSignalChecks -= 1
+            self.__signalCheckInterval = 0
+        getProcessMapLock().release()
+        # Nobody is going to make room in the mailbox anymore.
+        self._spaceCondition.acquire()
+        self._spaceCondition.notifyAll()
+        self._spaceCondition.release()
         self.__linksLock.acquire()
         links = self.__links.values()
+        monitors = self.__monitors.values()
+        self.__monitors = {}
+        monitoring = self.__monitoring.values()
+        self.__monitoring = {}
         self.__linksLock.release()
-        for proc in links:
-            proc._removeLink(self)
-            proc._signal(exitError)
+        for ref in monitoring:
+            ref._proc._removeMonitor(ref)
         # end for
+        if not links and not monitors:
+            return
+        exit_ = (self, links, monitors, exitError)
+        if len(links) + len(monitors) <= MAX_SYNC_EXIT_SIGNALS:
+            _propagateExits([exit_])
+            return
+        # Signalling thousands of processes takes a while, and the dying process
+        # shouldn't have to wait for it.
+        global _ExitDispatcherRunning
+        getProcessMapLock().acquire()
+        _ExitQueue.append(exit_)
+        startDispatcher = not _ExitDispatcherRunning
+        _ExitDispatcherRunning = True
+        getProcessMapLock().release()
+        if startDispatcher:
+            threadimpl.startThread(_dispatchExits, ())
+        # end if
+
+    def _register(self, name):
+        """register process under name; return False if name is taken, or if
+        process is dead or already registered"""
+        getProcessMapLock().acquire()
+        try:
+            if not self.__alive or self._registeredName is not None:
+                return False
+            if name in _Registry:
+                return False
+            _Registry[name] = self
+            self._registeredName = name
+            return True
+        finally:
+            getProcessMapLock().release()
+        # end try
+
+    def stats(self):
+        """Return dictionary of statistics about process's mailbox, or None if
+        process doesn't record any"""
+        _checkSignal()
+        self._mailboxCondition.acquire()
+        try:
+            if self._stats is None:
+                return None
+            return self._stats.snapshot(len(self._mailbox))
+        finally:
+            self._mailboxCondition.release()
+        # end try
 
     def _processFlag(self, flag, value):
         """set a process flag"""
+        global _PeriodicSignalChecks
         if flag == "trap_exit":
             if not isinstance(value, bool):
                 raise ExitError("badarg")
@@ -183,21 +465,53 @@ class Process:
             self.__trapExit = value
             self.__signalLock.release()
             return result
+        elif flag == "stats":
+            if not isinstance(value, bool):
+                raise ExitError("badarg")
+            self._mailboxCondition.acquire()
+            result = self._stats is not None
+            if not value:
+                self._stats = None
+            elif self._stats is None:
+                self._stats = ProcessStats()
+            self._mailboxCondition.release()
+            return result
+        elif flag == "signal_check_interval":
+            if not isinstance(value, (int, long)) or isinstance(value, bool) or value < 0:
+                raise ExitError("badarg")
+            getProcessMapLock().acquire()
+            result = self.__signalCheckInterval
+            if self.__alive:
+                _PeriodicSignalChecks += bool(value) - bool(result)
+                self.__signalCheckInterval = value
+                self.__sendsUntilCheck = value
+            getProcessMapLock().release()
+            return result
         else:
             raise ExitError("badarg")
         # end if
 
+    def _countSend(self):
+        """count a send() toward the next periodic check for a signal"""
+        if not self.__signalCheckInterval:
+            return
+        self.__sendsUntilCheck -= 1
+        if self.__sendsUntilCheck <= 0:
+            self.__sendsUntilCheck = self.__signalCheckInterval
+            self._checkSignal()
+        # end if
+
     def _checkSignal(self):
         """check if a signal has been received"""
-        # Since self.__signalSet is just a boolean value, we don't need to worry
+        # Since self._signalSet is just a boolean value, we don't need to worry
         # about acquiring a lock before inspecting its value. This way, we can check
         # if a signal has been set much more quickly.
-        if not self.__signalSet:
+        if not self._signalSet:
             return
         self.__signalLock.acquire()
         signal = self.__signal
         self.__signal = None
-        self.__signalSet = False
+        self._signalSet = False
         self.__signalLock.release()
         self._raise(signal)
 
@@ -212,21 +526,86 @@ class Process:
 
     def __run(self, func, args, kwargs):
         """main function of thread"""
-        currentThread = getCurrentThread()
+        currentThread = threadimpl.getCurrentThread()
         getProcessMapLock().acquire()
         getProcessMap()[currentThread] = self
         getProcessMapLock().release()
+        getProcessLocal().process = self
         exitError = ExitError("normal", self)
+        hibernation = None
         try:
             func(*args, **kwargs)
+        except Hibernate, ex:
+            hibernation = ex
         except ExitError, ex:
             exitError = ex
+            if ex.proc is not self:
+                # We were killed by exit(self, reason). Our links need to know that it
+                # was this process that terminated, not the one that called exit().
+                exitError = ExitError(ex.reason, self)
+            # end if
         except:
             exitError = ExitError(ExceptionReason(), self)
-        self._exit(exitError)
+        if hibernation is None:
+            self._exit(exitError)
         getProcessMapLock().acquire()
         del getProcessMap()[currentThread]
+        if hibernation is not None:
+            _Hibernating[id(self)] = self
+        getProcessMapLock().release()
+        getProcessLocal().process = None
+        if hibernation is not None:
+            self.__hibernate(hibernation.receiver, hibernation.timeout)
+        # end if
+
+    def __hibernate(self, receiver, timeout):
+        """give up thread until a message arrives that matches receiver"""
+        self._mailboxCondition.acquire()
+        try:
+            self.__hibernating = receiver
+            # A signal may have come in before __hibernating was set.
+            if receiver._hasMatch() or self._signalSet:
+                self.__wakeUp(False)
+            elif timeout is not None:
+                self.__hibernateTimer = threadimpl.callLater(
+                    timeout, self.__expireHibernation, receiver
+                )
+            # end if
+        finally:
+            self._mailboxCondition.release()
+        # end try
+
+    def __checkHibernating(self):
+        """wake up if hibernating and the mailbox has a matching message"""
+        assert self._mailboxCondition.locked()
+        if self.__hibernating is not None and self.__hibernating._hasMatch():
+            self.__wakeUp(False)
+        # end if
+
+    def __expireHibernation(self, receiver):
+        """invoked when after() timeout of hibernating receiver expires"""
+        self._mailboxCondition.acquire()
+        try:
+            if self.__hibernating is receiver:
+                self.__wakeUp(True)
+            # end if
+        finally:
+            self._mailboxCondition.release()
+        # end try
+
+    def __wakeUp(self, expired):
+        """resume hibernating process on a thread"""
+        assert self._mailboxCondition.locked()
+        receiver = self.__hibernating
+        self.__hibernating = None
+        if self.__hibernateTimer is not None:
+            self.__hibernateTimer.cancel()
+            self.__hibernateTimer = None
+        getProcessMapLock().acquire()
+        del _Hibernating[id(self)]
         getProcessMapLock().release()
+        threadimpl.startThread(self.__run, (receiver._resume, (expired,), {}),
+                               reuse=True)
 
 
 class RootProcess(Process):
@@ -255,6 +634,37 @@ class RootProcess(Process):
         if not self.__exceptionRaised:
             _checkSignal()
         self._exit(ExitError("normal", self))
+        # Nothing runs the exit dispatcher once we're gone.
+        _propagateExits(_takeExits())
+
+
+class Reference:
+
+    """Identifies a monitor, as returned by monitor()"""
+
+    def __init__(self, proc, watcher):
+        # The monitored process, and the process that monitors it
+        self._proc = proc
+        self._watcher = watcher
+
+    def __repr__(self):
+        return "<Reference %d>" % id(self)
+
+
+class Hibernate(BaseException):
+
+    """raised by hibernate() to unwind the stack of the current process
+
+    Like SystemExit, it does not derive from Exception, so that an
+    'except Exception' clause doesn't swallow it. A bare 'except' clause still
+    catches it, though.
+    """
+
+    def __init__(self, receiver, timeout):
+        BaseException.__init__(self)
+        self.receiver = receiver
+        # after() timeout of receiver in seconds, or None
+        self.timeout = timeout
 
 
 class ExceptionReason:
@@ -268,22 +678,191 @@ class ExceptionReason:
         return "<exception: %s>" % self.excInfo[1]
 
 
-# These values are singletons that are accessed only via getProcessMap*()
+# Maps id() of each hibernating process to the process. Like ProcessMap, it is
+# guarded by ProcessMapLock.
+_Hibernating = {}
+
+# Maps registered names to processes. It is only modified while ProcessMapLock
+# is held, but lookups don't need the lock, since dict.get() is atomic.
+_Registry = {}
+
+# (proc, links, monitors, exitError) of the exits that the exit dispatcher is to
+# propagate, and whether it is running. Both are guarded by ProcessMapLock.
+_ExitQueue = []
+_ExitDispatcherRunning = False
+
+# Number of live processes whose 'signal_check_interval' flag is set, so that
+# send() only looks up the sending process if there might be a count to keep.
+# It is only modified while ProcessMapLock is held.
+_PeriodicSignalChecks = 0
+
+# These values are singletons that are accessed only via getProcessMap*() and
+# getProcessLocal()
 _ProcessMap = None
 _ProcessMapLock = None
+_ProcessLocal = None
+
+
+def getCurrentProcess():
+    """return process of current thread"""
+    proc = lookupCurrentProcess()
+    assert (
+        proc is not None
+    ), "Only the main thread or threads created by spawn*() may invoke self()"
+    return proc
+
+
+def lookupCurrentProcess():
+    """return process of current thread, or None if thread isn't a process"""
+    # The process is looked up in thread-local storage, so that we don't need to
+    # acquire ProcessMapLock. The main thread isn't started by Process.__run(),
+    # so the first lookup from it has to go through ProcessMap.
+    local = _ProcessLocal
+    if local is not None:
+        proc = getattr(local, "process", None)
+        if proc is not None:
+            return proc
+        # end if
+    getProcessMapLock().acquire()
+    try:
+        proc = getProcessMap().get(threadimpl.getCurrentThread())
+    finally:
+        getProcessMapLock().release()
+    if proc is not None:
+        getProcessLocal().process = proc
+    return proc
+
+
+def _dispatchExits():
+    """main function of the exit dispatcher: propagate queued exits until there
+    are no more"""
+    global _ExitDispatcherRunning
+    while True:
+        getProcessMapLock().acquire()
+        exits = _ExitQueue[:]
+        del _ExitQueue[:]
+        if not exits:
+            _ExitDispatcherRunning = False
+        getProcessMapLock().release()
+        if not exits:
+            return
+        _propagateExits(exits)
+    # end while
+
+
+def _takeExits():
+    """remove and return the queued exits"""
+    getProcessMapLock().acquire()
+    exits = _ExitQueue[:]
+    del _ExitQueue[:]
+    getProcessMapLock().release()
+    return exits
+
+
+def _propagateExits(exits):
+    """send the EXIT signals and DOWN messages for exits, a list of (proc, links,
+    monitors, exitError), with a single call per target process"""
+    # Map id() of each target to the target and what it is to be sent, in order
+    signals = {}
+    downs = {}
+    for proc, links, monitors, exitError in exits:
+        for target in links:
+            target._removeLink(proc)
+            entry = signals.get(id(target))
+            if entry is None:
+                entry = signals[id(target)] = (target, [])
+            entry[1].append(exitError)
+        # end for
+        for ref in monitors:
+            watcher = ref._watcher
+            entry = downs.get(id(watcher))
+            if entry is None:
+                entry = downs[id(watcher)] = (watcher, [])
+            entry[1].append(("DOWN", ref, proc, exitError.reason))
+        # end for
+    # end for
+    for target, targetSignals in signals.itervalues():
+        target._signalMany(targetSignals)
+    # end for
+    if downs:
+        # Like EXIT messages, DOWN messages are never lost.
+        local = getProcessLocal()
+        local.forceSend = True
+        try:
+            for watcher, messages in downs.itervalues():
+                watcher.sendMany(messages)
+            # end for
+        finally:
+            local.forceSend = False
+        # end try
+
+
+def _countSend():
+    """count a send() by current process toward its periodic signal check"""
+    proc = lookupCurrentProcess()
+    if proc is not None:
+        proc._countSend()
 
 
 def getProcessMap():
     """return value of ProcessMap"""
     global _ProcessMap
     if _ProcessMap is None:
-        _ProcessMap = {getCurrentThread(): RootProcess()}
+        _ProcessMap = {threadimpl.getCurrentThread(): RootProcess()}
     return _ProcessMap
 
 
+def getProcessLocal():
+    """return value of ProcessLocal"""
+    global _ProcessLocal
+    if _ProcessLocal is None:
+        _ProcessLocal = threadimpl.allocateLocal()
+    return _ProcessLocal
+
+
+def getHibernating():
+    """return list of hibernating processes"""
+    assert getProcessMapLock().locked()
+    return _Hibernating.values()
+
+
+def unregisterName(name):
+    """remove registered name; return False if it isn't registered"""
+    getProcessMapLock().acquire()
+    try:
+        proc = _Registry.pop(name, None)
+        if proc is None:
+            return False
+        proc._registeredName = None
+        return True
+    finally:
+        getProcessMapLock().release()
+    # end try
+
+
+def whereisName(name):
+    """return process registered under name, or None"""
+    return _Registry.get(name)
+
+
+def registeredNames():
+    """return list of registered names"""
+    getProcessMapLock().acquire()
+    try:
+        return _Registry.keys()
+    finally:
+        getProcessMapLock().release()
+    # end try
+
+
+def processMapCreated():
+    """return True if ProcessMap has been initialized"""
+    return _ProcessMap is not None
+
+
 def getProcessMapLock():
     """return value of ProcessMapLock"""
     global _ProcessMapLock
     if _ProcessMapLock is None:
-        _ProcessMapLock = allocateLock()
+        _ProcessMapLock = threadimpl.allocateLock()
     return _ProcessMapLock
@@ -26,8 +26,10 @@ __revision__ = "$Id: receiver.py,v 1.13 2005/02/14 20:56:35 hobb0001 Exp $"
 import time
 
 from candygram.main import _checkSignal, self_, ExitError
-from candygram.pattern import genFilter
-from candygram.threadimpl import allocateLock
+from candygram.mailbox import SEQ, MESSAGE
+from candygram.dispatch import DispatchTable
+from candygram.pattern import compileFilter
+from candygram import threadimpl
 
 
 # Generate a unique value for 'Message' so that it won't ever be confused with
@@ -40,15 +42,25 @@ class Receiver:
     """Retrieves messages from process's mailbox"""
 
     def __init__(self):
-        _checkSignal()
-        # Lock for __handlers, __lastMessage,  and __timeout* attributes.
-        self.__lock = allocateLock()
+        # Lock for __handlers, __table, __lastMessage,  and __timeout* attributes.
+        self.__lock = threadimpl.allocateLock()
         self.__nextHandlerId = 0
         self.__handlers = []
+        # Maps IDs of handlers with a non-zero priority to their priorities
+        self.__priorities = {}
+        # DispatchTable for __handlers, or None if it needs to be rebuilt
+        self.__table = None
+        # Only used if any handler has a priority: a [priority, DispatchTable,
+        # sequence number of first message that hasn't been scanned] list for the
+        # handlers of each priority, highest priority first. Rebuilt along with
+        # __table.
+        self.__levels = []
+        # Sequence number of first message in mailbox that hasn't been scanned.
         self.__lastMessage = 0
         self.__currentProcess = None
         self.__mailbox = None
         self.__mailboxCondition = None
+        self.__spaceCondition = None
         self.__timeout = None
         self.__timeoutHandler = None
         self.__timeoutArgs = None
@@ -56,14 +68,19 @@ class Receiver:
 
     def addHandler(self, pattern, handler=None, *args, **kwargs):
         """add pattern handler to receiver"""
-        _checkSignal()
         if handler is not None and not callable(handler):
             raise ExitError("badarg")
-        filter_ = genFilter(pattern)
+        priority = kwargs.pop("_priority", 0)
+        if not isinstance(priority, (int, long)) or isinstance(priority, bool):
+            raise ExitError("badarg")
+        filter_ = compileFilter(pattern)
         self.__lock.acquire()
         handlerId = self.__nextHandlerId
         self.__nextHandlerId += 1
-        self.__handlers.append((handlerId, filter_, handler, args, kwargs))
+        self.__handlers.append((handlerId, pattern, filter_, handler, args, kwargs))
+        if priority:
+            self.__priorities[handlerId] = priority
+        self.__table = None
         # Clear all skipped messages, since the new handler might be able to handle
         # them.
         self.__lastMessage = 0
@@ -72,7 +89,6 @@ class Receiver:
 
     def after(self, timeout, handler=None, *args, **kwargs):
         """add timeout handler to receiver"""
-        _checkSignal()
         self.__setAfter(timeout, handler, args, kwargs)
 
     def __setitem__(self, key, value):
@@ -88,19 +104,22 @@ class Receiver:
 
     def addHandlers(self, receiver):
         """copy handlers from receiver to self"""
-        _checkSignal()
         if not isinstance(receiver, Receiver):
             raise ExitError("badarg")
         receiver.__lock.acquire()
         handlers = receiver.__handlers[:]
+        priorities = receiver.__priorities.copy()
         receiver.__lock.release()
         result = []
         self.__lock.acquire()
-        for id_, filter_, handler, args, kwargs in handlers:
+        for id_, pattern, filter_, handler, args, kwargs in handlers:
             handlerId = self.__nextHandlerId
             self.__nextHandlerId += 1
-            self.__handlers.append((handlerId, filter_, handler, args, kwargs))
+            self.__handlers.append((handlerId, pattern, filter_, handler, args, kwargs))
+            if id_ in priorities:
+                self.__priorities[handlerId] = priorities[id_]
             result.append(handlerId)
+        self.__table = None
         # Clear all skipped messages, since the new handlers might be able to handle
         # them.
         self.__lastMessage = 0
@@ -114,6 +133,8 @@ class Receiver:
             for i in xrange(len(self.__handlers)):
                 if self.__handlers[i][0] == handlerReference:
                     del self.__handlers[i]
+                    self.__priorities.pop(handlerReference, None)
+                    self.__table = None
                     return
                 # end if
             # end for
@@ -124,35 +145,121 @@ class Receiver:
     def receive(self, timeout=None, handler=None, *args, **kwargs):
         """retrieve one message from mailbox"""
         _checkSignal()
+        message, handler, args, kwargs = self.__receive(1, timeout, handler, args, kwargs)[0]
+        stats = self.__currentProcess._stats
+        if stats is not None:
+            return stats.recordHandler(_invoke, message, handler, args, kwargs)
+        return _invoke(message, handler, args, kwargs)
+
+    def receiveMany(self, max, timeout=None, handler=None, *args, **kwargs):
+        """retrieve up to max messages from mailbox"""
+        _checkSignal()
+        if not isinstance(max, (int, long)) or max < 1:
+            raise ExitError("badarg")
+        handlerInfos = self.__receive(max, timeout, handler, args, kwargs)
+        stats = self.__currentProcess._stats
+        if stats is not None:
+            return [
+                stats.recordHandler(_invoke, message, func, fargs, fkwargs)
+                for message, func, fargs, fkwargs in handlerInfos
+            ]
+        return [
+            _invoke(message, func, fargs, fkwargs)
+            for message, func, fargs, fkwargs in handlerInfos
+        ]
+
+    def __receive(self, limit, timeout, handler, args, kwargs, expired=False):
+        """wait for matching messages; return list of up to limit handler infos
+
+        If expired is True, the after() timeout is taken to have elapsed already.
+        """
         self.__checkCurrentProcess()
         if timeout is not None:
             self.__setAfter(timeout, handler, args, kwargs)
         expire = None
         self.__lock.acquire()
         if self.__timeout is not None:
-            expire = time.time() + self.__timeout
+            expire = time.time()
+            if not expired:
+                expire += self.__timeout
+            # end if
         self.__lock.release()
-        handlerInfo = None
+        handlerInfos = []
         self.__mailboxCondition.acquire()
         # self.__wait() may raise an exception if this process has received a signal
         try:
-            while handlerInfo is None:
-                handlerInfo = self.__scanMailbox()
+            while not handlerInfos:
+                handlerInfos = self.__scanMailbox(limit)
+                # Let senders that are blocked on a full mailbox know.
+                self.__spaceCondition.notify(len(handlerInfos))
                 # If none of the filters picked up a message from the mailbox, wait
                 # until a new message is sent and then try again.
-                if handlerInfo is None:
+                if not handlerInfos:
                     handlerInfo = self.__wait(expire)
+                    if handlerInfo is not None:
+                        handlerInfos = [handlerInfo]
+                    # end if
                 # end if
         finally:
             self.__mailboxCondition.release()
         if timeout is not None:
             self.__removeAfter()
-        message, handler, args, kwargs = handlerInfo
-        if handler is None:
+        return handlerInfos
+
+    def _hibernate(self):
+        """prepare for current process to hibernate on this receiver; return the
+        after() timeout in seconds, or None"""
+        self.__checkCurrentProcess()
+        self.__lock.acquire()
+        timeout = self.__timeout
+        self.__lock.release()
+        return timeout
+
+    def _hasMatch(self):
+        """return True if any message in mailbox matches a registered pattern"""
+        assert self.__mailboxCondition.locked()
+        self.__lock.acquire()
+        try:
+            table = self.__getTable()
+            for entry in self.__mailbox.entries(self.__lastMessage, table.indexKeys):
+                message = entry[MESSAGE]
+                for id_, pattern, filter_, handler, args, kwargs in table.candidates(
+                    message
+                ):
+                    if filter_(message):
+                        return True
+                    # end if
+                self.__lastMessage = entry[SEQ] + 1
+            self.__lastMessage = self.__mailbox.nextSeq()
+            return False
+        finally:
+            self.__lock.release()
+        # end try
+
+    def _poll(self, proc):
+        """remove first message in proc's mailbox that matches a registered
+        pattern, without waiting; return its handler info, or None"""
+        self.__bind(proc)
+        self.__mailboxCondition.acquire()
+        try:
+            handlerInfos = self.__scanMailbox(1)
+            self.__spaceCondition.notify(len(handlerInfos))
+        finally:
+            self.__mailboxCondition.release()
+        # end try
+        if not handlerInfos:
             return None
-        args = _replaceMessageArgs(args, message)
-        kwargs = _replaceMessageKWArgs(kwargs, message)
-        return handler(*args, **kwargs)
+        return handlerInfos[0]
+
+    def _resume(self, expired):
+        """receive message for a process that wakes up from hibernation"""
+        _checkSignal()
+        handlerInfos = self.__receive(1, None, None, (), {}, expired)
+        message, handler, args, kwargs = handlerInfos[0]
+        stats = self.__currentProcess._stats
+        if stats is not None:
+            return stats.recordHandler(_invoke, message, handler, args, kwargs)
+        return _invoke(message, handler, args, kwargs)
 
     __call__ = receive
     next = receive
@@ -193,40 +300,101 @@ class Receiver:
             self.__lock.release()
         # end try
 
-    def __scanMailbox(self):
-        """see if any message in mailbox matches a registered pattern"""
+    def __scanMailbox(self, limit):
+        """remove up to limit messages from mailbox that match a registered
+        pattern; return list of their handler infos"""
         assert self.__mailboxCondition.locked()
         # Prevent anyone from adding a new handler while we're scanning the mailbox:
         self.__lock.acquire()
         try:
-            for i in xrange(self.__lastMessage, len(self.__mailbox)):
-                message = self.__mailbox[i]
-                for id_, filter_, handler, args, kwargs in self.__handlers:
+            mailbox = self.__mailbox
+            stats = self.__currentProcess._stats
+            table = self.__getTable()
+            result = []
+            scanned = 0
+            if self.__priorities:
+                result, scanned = self.__scanByPriority(limit, stats)
+                return result
+            for entry in mailbox.entries(self.__lastMessage, table.indexKeys):
+                scanned += 1
+                message = entry[MESSAGE]
+                for id_, pattern, filter_, handler, args, kwargs in table.candidates(
+                    message
+                ):
                     if filter_(message):
-                        self.__deleteMessage(i)
-                        return message, handler, args, kwargs
+                        # Since Receivers keep track of their position by sequence
+                        # number, no other Receiver needs to be adjusted.
+                        mailbox.remove(entry)
+                        if stats is not None:
+                            stats.recordRemove(entry[SEQ])
+                        result.append((message, handler, args, kwargs))
+                        break
                     # end if
-                self.__lastMessage = i + 1
-            return None
+                # Either the message didn't match or it's gone now.
+                self.__lastMessage = entry[SEQ] + 1
+                if len(result) == limit:
+                    return result
+                # end if
+            # Messages that weren't inspected can't match any handler, either.
+            self.__lastMessage = mailbox.nextSeq()
+            return result
         finally:
+            if stats is not None:
+                stats.recordScan(scanned)
             self.__lock.release()
         # end try
 
-    def __deleteMessage(self, i):
-        """remove i'th message from mailbox, notifying any other receivers"""
-        assert self.__mailboxCondition.locked()
-        receivers = self.__currentProcess._getReceivers()
-        del self.__mailbox[i]
-        for receiver in receivers:
-            if receiver is not self:
-                # Acquire lock to prevent a remote process from calling addHandler and
-                # resetting __lastMessage:
-                receiver.__lock.acquire()
-                if receiver.__lastMessage > i:
-                    receiver.__lastMessage -= 1
-                receiver.__lock.release()
-            # end if
+    def __scanByPriority(self, limit, stats):
+        """remove up to limit messages from mailbox that match a registered
+        pattern, those that match a handler of higher priority first; return list
+        of their handler infos and number of messages inspected"""
+        mailbox = self.__mailbox
+        result = []
+        scanned = 0
+        # Each priority level remembers how far it has scanned, just as the
+        # Receiver does when there are no priorities, so a message is inspected
+        # at most once per level, and only if the level's index keys allow it to
+        # match.
+        for level in self.__levels:
+            priority, table, lastMessage = level
+            for entry in mailbox.entries(lastMessage, table.indexKeys):
+                scanned += 1
+                message = entry[MESSAGE]
+                for id_, pattern, filter_, handler, args, kwargs in table.candidates(
+                    message
+                ):
+                    if filter_(message):
+                        mailbox.remove(entry)
+                        if stats is not None:
+                            stats.recordRemove(entry[SEQ])
+                        result.append((message, handler, args, kwargs))
+                        break
+                    # end if
+                level[2] = entry[SEQ] + 1
+                if len(result) == limit:
+                    return result, scanned
+                # end if
+            level[2] = mailbox.nextSeq()
         # end for
+        return result, scanned
+
+    def __getTable(self):
+        """return DispatchTable for handlers, rebuilding it if necessary"""
+        assert self.__lock.locked()
+        if self.__table is None:
+            self.__table = DispatchTable(self.__handlers)
+            self.__levels = []
+            priorities = self.__priorities
+            if priorities:
+                levels = {}
+                for handler in self.__handlers:
+                    levels.setdefault(priorities.get(handler[0], 0), []).append(handler)
+                # end for
+                for priority in sorted(levels, reverse=True):
+                    self.__levels.append([priority, DispatchTable(levels[priority]), 0])
+                # end for
+            # end if
+        return self.__table
 
     def __wait(self, expire):
         """wait expire milliseconds for a new message"""
@@ -251,7 +419,11 @@ class Receiver:
 
     def __checkCurrentProcess(self):
         """check that self.__currentProcess is still current process"""
-        currentProcess = self_()
+        # Our callers have just checked for a signal.
+        self.__bind(self_(True))
+
+    def __bind(self, currentProcess):
+        """make receiver retrieve messages from currentProcess's mailbox"""
         if self.__currentProcess is currentProcess:
             return
         if self.__currentProcess is not None:
@@ -259,12 +431,24 @@ class Receiver:
         self.__currentProcess = currentProcess
         self.__mailbox = currentProcess._mailbox
         self.__mailboxCondition = currentProcess._mailboxCondition
+        self.__spaceCondition = currentProcess._spaceCondition
         self.__lock.acquire()
         self.__lastMessage = 0
+        # Rebuild the priority levels, too, which have scanned the old mailbox.
+        self.__table = None
         self.__lock.release()
         currentProcess._addReceiver(self)
 
 
+def _invoke(message, handler, args, kwargs):
+    """invoke handler for message, if any"""
+    if handler is None:
+        return None
+    args = _replaceMessageArgs(args, message)
+    kwargs = _replaceMessageKWArgs(kwargs, message)
+    return handler(*args, **kwargs)
+
+
 def _replaceMessageArgs(args, message):
     """replace any instance of Message with message"""
 
@@ -0,0 +1,355 @@
+# supervisor.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Supervisor and ChildSpec classes
+
+A supervisor is a process that starts a list of child processes, each described
+by a ChildSpec, and restarts them when they terminate. The supervisor traps
+exits and is linked to each of its children. What happens when a child
+terminates depends on the supervisor's strategy:
+
+  one_for_one   Only the child that terminated is restarted.
+  one_for_all   All other children are terminated, then all are restarted.
+  rest_for_one  The children that were started after the one that terminated
+                are terminated, then all of them are restarted.
+
+Whether a child is restarted at all depends on its restart type: a 'permanent'
+child is always restarted, a 'transient' child only if it terminated with a
+reason other than 'normal' or 'shutdown', and a 'temporary' child never. A
+temporary child is forgotten once it terminates; a transient child that isn't
+restarted remains listed without a process.
+
+If more than maxRestarts restarts occur within maxSeconds, the supervisor
+concludes that restarting doesn't help, terminates all of its children and
+exits with the reason 'shutdown'. The same happens when a linked process that is
+not one of its children (e.g., its own supervisor) sends it an EXIT signal,
+except that the supervisor then exits with that signal's reason. Since
+supervise() runs a supervisor in the calling process, a supervisor can be the
+child of another one, which makes a supervision tree.
+
+Children are terminated in the reverse order that they were started, by sending
+them a 'shutdown' EXIT signal. A child that traps exits is killed if it doesn't
+terminate within its ChildSpec's shutdown time.
+"""
+
+__revision__ = "$Id$"
+
+
+import itertools
+import time
+
+from candygram.main import (
+    spawnLink,
+    self_,
+    exit,
+    processFlag,
+    monitor,
+    demonitor,
+    ExitError,
+)
+from candygram.process import Process
+from candygram.receiver import Receiver, Message
+from candygram.pattern import Any
+
+
+# How a supervisor restarts its children
+STRATEGIES = ("one_for_one", "one_for_all", "rest_for_one")
+
+# When a child is restarted
+RESTART_TYPES = ("permanent", "transient", "temporary")
+
+# Source of unique request IDs
+_RequestIds = itertools.count()
+
+
+class ChildSpec:
+
+    """Describes how a supervisor starts, restarts and terminates a child"""
+
+    def __init__(
+        self, name, func, args=(), kwargs=None, restart="permanent", shutdown=5000
+    ):
+        if not callable(func) or restart not in RESTART_TYPES:
+            raise ExitError("badarg")
+        if shutdown != "brutal_kill" and shutdown is not None:
+            if not isinstance(shutdown, (int, long)) or shutdown < 0:
+                raise ExitError("badarg")
+            # end if
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        if kwargs is None:
+            kwargs = {}
+        self.kwargs = kwargs
+        self.restart = restart
+        # Milliseconds to wait for the child to terminate before killing it, None
+        # to wait indefinitely (e.g., for a child that is a supervisor itself), or
+        # 'brutal_kill' to kill it right away
+        self.shutdown = shutdown
+
+    def __repr__(self):
+        return "<ChildSpec %r>" % (self.name,)
+
+
+class Supervisor:
+
+    """A handle on a supervisor process that is linked to its creator"""
+
+    def __init__(self, specs, strategy="one_for_one", maxRestarts=1, maxSeconds=5):
+        _checkArgs(specs, strategy, maxRestarts, maxSeconds)
+        self.process = spawnLink(supervise, specs, strategy, maxRestarts, maxSeconds)
+
+    def children(self):
+        """return list of (name, process) pairs, in the order that the children
+        were started"""
+        return self.__call("which_children")
+
+    def startChild(self, spec):
+        """start a new child; return its process"""
+        if not isinstance(spec, ChildSpec):
+            raise ExitError("badarg")
+        return self.__call("start_child", spec)
+
+    def terminateChild(self, name):
+        """terminate child and forget its ChildSpec"""
+        return self.__call("terminate_child", name)
+
+    def stop(self):
+        """terminate all children and let supervisor exit normally"""
+        return self.__call("stop")
+
+    def __call(self, request, *args):
+        """send request to supervisor process and wait for its reply"""
+        requestId = _RequestIds.next()
+        ref = monitor(self.process)
+        self.process.send((request, requestId, self_()) + args)
+        r = Receiver()
+        r.addHandler(("reply", requestId, Any), lambda m: m[2], Message)
+        r.addHandler(("error", requestId, Any), _raise, Message)
+        r.addHandler(("DOWN", ref, Any, Any), _noproc)
+        try:
+            return r.receive()
+        finally:
+            demonitor(ref, True)
+        # end try
+
+
+def supervise(specs, strategy="one_for_one", maxRestarts=1, maxSeconds=5):
+    """run current process as a supervisor of the children described by specs"""
+    _checkArgs(specs, strategy, maxRestarts, maxSeconds)
+    _Supervisor(specs, strategy, maxRestarts, maxSeconds).run()
+
+
+def _checkArgs(specs, strategy, maxRestarts, maxSeconds):
+    """raise a 'badarg' ExitError if a supervisor can't be started with args"""
+    for spec in specs:
+        if not isinstance(spec, ChildSpec):
+            raise ExitError("badarg")
+        # end if
+    names = [spec.name for spec in specs]
+    if len(dict.fromkeys(names)) != len(names):
+        raise ExitError("badarg")
+    if strategy not in STRATEGIES:
+        raise ExitError("badarg")
+    if not isinstance(maxRestarts, (int, long)) or maxRestarts < 0:
+        raise ExitError("badarg")
+    if not isinstance(maxSeconds, (int, long, float)) or maxSeconds <= 0:
+        raise ExitError("badarg")
+
+
+def _raise(message):
+    """raise ExitError for an ('error', requestId, reason) reply"""
+    raise ExitError(message[2])
+
+
+def _noproc():
+    """raise ExitError for a supervisor that has gone away"""
+    raise ExitError("noproc")
+
+
+class _Child:
+
+    """A child of a supervisor"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.proc = None
+
+
+class _Supervisor:
+
+    """The state of a supervisor process"""
+
+    def __init__(self, specs, strategy, maxRestarts, maxSeconds):
+        self.__children = [_Child(spec) for spec in specs]
+        # Maps id() of each running child's process to the child
+        self.__byProc = {}
+        self.__strategy = strategy
+        self.__maxRestarts = maxRestarts
+        self.__maxSeconds = maxSeconds
+        # Times of recent restarts, oldest first
+        self.__restarts = []
+        self.__running = True
+
+    def run(self):
+        """start children and supervise them until told to stop"""
+        processFlag("trap_exit", True)
+        for child in self.__children:
+            self.__start(child)
+        # end for
+        r = Receiver()
+        r.addHandler(("EXIT", Process, Any), self.__handleExit, Message)
+        r.addHandler(("which_children", int, Process), self.__whichChildren, Message)
+        r.addHandler(
+            ("start_child", int, Process, ChildSpec), self.__startChild, Message
+        )
+        r.addHandler(
+            ("terminate_child", int, Process, Any), self.__terminateChild, Message
+        )
+        r.addHandler(("stop", int, Process), self.__stop, Message)
+        while self.__running:
+            r.receive()
+        # end while
+
+    def __handleExit(self, message):
+        """handle ('EXIT', proc, reason) message"""
+        tag, proc, reason = message
+        child = self.__byProc.pop(id(proc), None)
+        if child is None:
+            # Our parent is going away, so we must do the same.
+            self.__terminateAll()
+            raise ExitError(reason)
+        child.proc = None
+        restart = child.spec.restart
+        if restart == "temporary":
+            self.__children.remove(child)
+            return
+        if restart == "transient" and reason in ("normal", "shutdown"):
+            return
+        if not self.__allowRestart():
+            self.__terminateAll()
+            raise ExitError("shutdown")
+        if self.__strategy == "one_for_one":
+            self.__start(child)
+            return
+        if self.__strategy == "one_for_all":
+            group = self.__children[:]
+        else:
+            group = self.__children[self.__children.index(child) :]
+        # Children that aren't running stay that way.
+        group = [other for other in group if other is child or other.proc is not None]
+        for other in reversed(group):
+            if other is not child:
+                self.__terminate(other)
+            # end if
+        # end for
+        for other in group:
+            if other.spec.restart == "temporary":
+                self.__children.remove(other)
+            else:
+                self.__start(other)
+            # end if
+        # end for
+
+    def __allowRestart(self):
+        """record a restart; return False if the restart intensity is exceeded"""
+        now = time.time()
+        restarts = self.__restarts
+        while restarts and restarts[0] <= now - self.__maxSeconds:
+            del restarts[0]
+        # end while
+        restarts.append(now)
+        return len(restarts) <= self.__maxRestarts
+
+    def __whichChildren(self, message):
+        """handle ('which_children', requestId, proc) request"""
+        tag, requestId, proc = message
+        result = [(child.spec.name, child.proc) for child in self.__children]
+        proc.send(("reply", requestId, result))
+
+    def __startChild(self, message):
+        """handle ('start_child', requestId, proc, spec) request"""
+        tag, requestId, proc, spec = message
+        if self.__findName(spec.name) is not None:
+            proc.send(("error", requestId, "badarg"))
+            return
+        child = _Child(spec)
+        self.__children.append(child)
+        self.__start(child)
+        proc.send(("reply", requestId, child.proc))
+
+    def __terminateChild(self, message):
+        """handle ('terminate_child', requestId, proc, name) request"""
+        tag, requestId, proc, name = message
+        index = self.__findName(name)
+        if index is None:
+            proc.send(("error", requestId, "badarg"))
+            return
+        self.__terminate(self.__children.pop(index))
+        proc.send(("reply", requestId, True))
+
+    def __stop(self, message):
+        """handle ('stop', requestId, proc) request"""
+        tag, requestId, proc = message
+        self.__terminateAll()
+        self.__running = False
+        proc.send(("reply", requestId, True))
+
+    def __start(self, child):
+        """start child process"""
+        spec = child.spec
+        child.proc = spawnLink(spec.func, *spec.args, **spec.kwargs)
+        self.__byProc[id(child.proc)] = child
+
+    def __terminate(self, child):
+        """terminate child process and wait for it to exit"""
+        proc = child.proc
+        if proc is None:
+            return
+        child.proc = None
+        del self.__byProc[id(proc)]
+        r = Receiver()
+        r.addHandler(("EXIT", proc, Any), lambda: True)
+        if child.spec.shutdown == "brutal_kill":
+            exit(proc, "kill")
+            r.receive()
+            return
+        exit(proc, "shutdown")
+        if child.spec.shutdown is None:
+            r.receive()
+        elif not r.receive(child.spec.shutdown, lambda: False):
+            exit(proc, "kill")
+            r.receive()
+        # end if
+
+    def __terminateAll(self):
+        """terminate all children, in the reverse order that they were started"""
+        for child in reversed(self.__children):
+            self.__terminate(child)
+        # end for
+
+    def __findName(self, name):
+        """return index of child named name, or None"""
+        for i, child in enumerate(self.__children):
+            if child.spec.name == name:
+                return i
+            # end if
+        # end for
+        return None
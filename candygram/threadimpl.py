@@ -18,20 +18,163 @@
 # along with Candygram; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
-"""provides threading primitives"""
+"""provides threading primitives
+
+All Candygram modules access their threading primitives through this module's
+functions. The functions are bound to a backend object, which determines what
+a Candygram process actually runs on:
+  "thread"   -- each process runs on its own OS thread (the default)
+  "greenlet" -- every process runs as a greenlet on a single OS thread, and
+                processes switch cooperatively whenever they block. This
+                requires the greenlet package.
+
+A backend object provides the following methods:
+  getCurrentThread()           -- return a hashable ID of the running process
+  startThread(func, args, reuse=False)
+                               -- run func(*args) as a new process. If reuse
+                                  is true, the process may run on a thread
+                                  that has run another such process before,
+                                  and must not rely on thread-local state.
+  allocateLock()               -- return a new, non-reentrant lock
+  allocateLocal()              -- return a new object whose attributes are
+                                  visible only to the process that set them
+  callLater(delay, func, *args) -- invoke func(*args) after delay seconds. The
+                                  callback may acquire locks, but must not
+                                  block for long. Returns an object with a
+                                  cancel() method.
+"""
 
 __revision__ = "$Id: threadimpl.py,v 1.1 2004/08/19 23:14:50 hobb0001 Exp $"
 
 
+import sys
 import thread
+import traceback
 
+from candygram import timer
 
-# If we ever use a different implementation (like, say, stackless) use an
-# environment variable to specify which implementation, a la pychecker.
-#
-# I strongly disagree :-) We should instead use a parameter passed to a
-# (e.g., in a constructor or function) that takes a sensible defualt but offers
-# the library user with the option of providing other supported "backends."
-getCurrentThread = thread.get_ident
-startThread = thread.start_new_thread
-allocateLock = thread.allocate_lock
+
+# Number of idle threads that ThreadBackend keeps around for reuse
+MAX_IDLE_THREADS = 32
+
+
+class ThreadBackend:
+
+    """runs each process on its own OS thread
+
+    A thread that was started with reuse set waits for the next such process
+    to start once its process has finished, rather than exit, so that processes
+    that resume frequently from hibernate() don't each pay for creating a
+    thread. Other processes always get a fresh thread, since user code may leave
+    threading.local state behind on it.
+    """
+
+    name = "thread"
+
+    def __init__(self):
+        self.getCurrentThread = thread.get_ident
+        self.allocateLock = thread.allocate_lock
+        self.allocateLocal = thread._local
+        self.callLater = timer.callLater
+        # Lock for __idle
+        self.__lock = thread.allocate_lock()
+        # _IdleThreads that are waiting for a function to run
+        self.__idle = []
+
+    def startThread(self, func, args, reuse=False):
+        """run func(*args) on a new thread, or on an idle pooled one if reuse is
+        true"""
+        if not reuse:
+            thread.start_new_thread(func, args)
+            return
+        # end if
+        self.__lock.acquire()
+        if self.__idle:
+            idle = self.__idle.pop()
+            self.__lock.release()
+            idle.job = (func, args)
+            idle.lock.release()
+        else:
+            self.__lock.release()
+            thread.start_new_thread(self.__work, (func, args))
+        # end if
+
+    def __work(self, func, args):
+        """main function of pooled threads"""
+        idle = _IdleThread()
+        while True:
+            try:
+                func(*args)
+            except:
+                # Mimic what the thread module does with an unhandled exception.
+                print >> sys.stderr, "Unhandled exception in thread started by", func
+                traceback.print_exc()
+            # end try
+            # Don't keep the arguments alive while idle.
+            func = args = None
+            self.__lock.acquire()
+            if len(self.__idle) >= MAX_IDLE_THREADS:
+                self.__lock.release()
+                return
+            self.__idle.append(idle)
+            self.__lock.release()
+            idle.lock.acquire()
+            func, args = idle.job
+            idle.job = None
+        # end while
+
+
+class _IdleThread:
+
+    """a pooled thread's means of receiving its next function to run"""
+
+    def __init__(self):
+        # Released when job has been set
+        self.lock = thread.allocate_lock()
+        self.lock.acquire()
+        self.job = None
+
+
+def _greenletBackend():
+    """create a GreenletBackend"""
+    # Don't import greenletimpl unless requested, since it requires the greenlet
+    # package.
+    from candygram.greenletimpl import GreenletBackend
+
+    return GreenletBackend()
+
+
+# Factory functions for the backends that can be selected by name.
+BACKENDS = {
+    "thread": ThreadBackend,
+    "greenlet": _greenletBackend,
+}
+
+
+def setBackend(backend):
+    """bind this module's functions to backend, which may be either a backend
+    object or the name of one"""
+    global _Backend, getCurrentThread, startThread, allocateLock, allocateLocal
+    global callLater
+    if isinstance(backend, str):
+        backend = BACKENDS[backend]()
+    _Backend = backend
+    getCurrentThread = backend.getCurrentThread
+    startThread = backend.startThread
+    allocateLock = backend.allocateLock
+    allocateLocal = backend.allocateLocal
+    callLater = backend.callLater
+
+
+def getBackend():
+    """return the current backend object"""
+    return _Backend
+
+
+_Backend = None
+getCurrentThread = None
+startThread = None
+allocateLock = None
+allocateLocal = None
+callLater = None
+setBackend(ThreadBackend())
@@ -0,0 +1,390 @@
+# timer.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""A single thread that invokes callbacks at scheduled times.
+
+The thread module does not offer a lock acquire() with a timeout, so a waiting
+thread cannot simply block until either it is notified or its timeout expires.
+Instead of having every waiting thread poll its lock, all timeouts are handed
+to one service thread. That thread blocks in select() on a loopback socket
+until the earliest timeout is due, and is woken early through the socket
+whenever a new timeout is scheduled ahead of all others. Idle waiters therefore
+consume no CPU at all.
+
+Pending timers are kept in a hierarchical timing wheel, with a resolution of a
+millisecond. The wheel has four levels of 256 slots each. A slot of the first
+level holds the timers that expire during one tick, a slot of the second level
+those that expire during 256 ticks, and so on. As time advances past the end of
+the first level, the next slot of the second level is emptied and its timers
+are redistributed into the first level, and likewise for the higher levels.
+Scheduling and cancelling a timer are therefore O(1), and since most timeouts
+are cancelled long before they expire (e.g., whenever a receive() gets its
+message in time), few timers ever need to be redistributed at all.
+"""
+
+__revision__ = "$Id$"
+
+
+import select
+import socket
+import sys
+import thread
+import time
+import traceback
+
+
+# Seconds per tick of the TimerWheel
+TICK = 0.001
+
+# Each level of the TimerWheel has 2 ** LEVEL_BITS slots.
+LEVEL_BITS = 8
+LEVEL_SIZE = 1 << LEVEL_BITS
+LEVEL_MASK = LEVEL_SIZE - 1
+NUM_LEVELS = 4
+
+# Timers that expire further in the future are filed under this many ticks, and
+# are filed again once that has passed.
+MAX_TICKS = (1 << (LEVEL_BITS * NUM_LEVELS)) - 1
+
+
+class Timer:
+
+    """A scheduled callback, as returned by callLater()"""
+
+    def __init__(self, expire, func, args, onCancel=None):
+        self.expire = expire
+        self.__func = func
+        self.__args = args
+        self.__onCancel = onCancel
+        self.cancelled = False
+        # Whichever of cancel() and _fire() pops this first gets to decide
+        # whether the callback is invoked. (list.pop() is atomic.)
+        self.__pending = [True]
+        # The TimerWheel slot that the timer is filed under, the slot's level, and
+        # the tick that the timer expires on
+        self._slot = None
+        self._level = None
+        self._tick = None
+
+    def cancel(self):
+        """prevent the callback from being invoked; return True if it hadn't
+        been invoked yet"""
+        self.cancelled = True
+        try:
+            self.__pending.pop()
+        except IndexError:
+            return False
+        # end try
+        if self.__onCancel is not None:
+            self.__onCancel(self)
+        return True
+
+    def _fire(self):
+        """invoke the callback"""
+        try:
+            self.__pending.pop()
+        except IndexError:
+            return
+        # end try
+        self.__func(*self.__args)
+
+
+class TimerWheel:
+
+    """The pending Timers of a timer service
+
+    A TimerWheel does no locking of its own.
+    """
+
+    def __init__(self, start=None):
+        if start is None:
+            start = time.time()
+        self.__start = start
+        # Each level is a list of slots, and each slot maps id() of its Timers to
+        # the Timers. (Old-style instances are slow to hash.)
+        self.__levels = [
+            [{} for i in xrange(LEVEL_SIZE)] for level in xrange(NUM_LEVELS)
+        ]
+        # Number of timers on each level
+        self.__counts = [0] * NUM_LEVELS
+        # Every tick before this one has been processed.
+        self.__tick = 0
+
+    def __len__(self):
+        return sum(self.__counts)
+
+    def add(self, timer):
+        """file timer according to its expiration time"""
+        # Round up, so that a timer never fires early.
+        timer._tick = int((timer.expire - self.__start) / TICK) + 1
+        self.__file(timer)
+
+    def remove(self, timer):
+        """remove timer from wheel"""
+        if timer._slot is not None:
+            del timer._slot[id(timer)]
+            self.__counts[timer._level] -= 1
+            timer._slot = None
+        # end if
+
+    def popDue(self, now):
+        """remove and return the timers that have expired by time now"""
+        due = []
+        nowTick = int((now - self.__start) / TICK)
+        first = self.__levels[0]
+        counts = self.__counts
+        while self.__tick <= nowTick:
+            tick = self.__tick
+            index = tick & LEVEL_MASK
+            if index and not first[index]:
+                # Skip ahead to the next tick on which anything happens.
+                nextTick = self.__nextTick()
+                if nextTick is None or nextTick > nowTick:
+                    self.__tick = nowTick + 1
+                    break
+                self.__tick = tick = nextTick
+                index = tick & LEVEL_MASK
+            if not index:
+                self.__cascade()
+            self.__tick += 1
+            slot = first[index]
+            if slot:
+                timers = slot.values()
+                slot.clear()
+                for timer in timers:
+                    timer._slot = None
+                # end for
+                counts[0] -= len(timers)
+                due.extend(timers)
+            # end if
+        # end while
+        return due
+
+    def nextExpire(self):
+        """return time by which popDue() should be called again, or None if the
+        wheel is empty"""
+        tick = self.__nextTick()
+        if tick is None:
+            return None
+        return self.__start + tick * TICK
+
+    def __nextTick(self):
+        """return first tick, from the current one on, on which a timer expires
+        or has to be redistributed, or None if the wheel is empty"""
+        result = None
+        tick = self.__tick
+        for level in xrange(NUM_LEVELS):
+            if not self.__counts[level]:
+                continue
+            slots = self.__levels[level]
+            shift = LEVEL_BITS * level
+            # The slots of a level come up on successive multiples of its span.
+            first = (tick + (1 << shift) - 1) >> shift
+            for n in xrange(first, first + LEVEL_SIZE):
+                candidate = n << shift
+                if result is not None and candidate >= result:
+                    break
+                if slots[n & LEVEL_MASK]:
+                    result = candidate
+                    break
+                # end if
+            # end for
+        # end for
+        return result
+
+    def __file(self, timer):
+        """put timer into the slot that it belongs in"""
+        tick = timer._tick
+        delta = tick - self.__tick
+        if delta < 0:
+            # The timer is overdue; it fires on the next tick.
+            tick = self.__tick
+            delta = 0
+        elif delta > MAX_TICKS:
+            # __cascade() files the timer again when it comes up.
+            tick = self.__tick + MAX_TICKS
+            delta = MAX_TICKS
+        level = 0
+        while delta >= LEVEL_SIZE:
+            delta >>= LEVEL_BITS
+            level += 1
+        # end while
+        slot = self.__levels[level][(tick >> (LEVEL_BITS * level)) & LEVEL_MASK]
+        slot[id(timer)] = timer
+        timer._slot = slot
+        timer._level = level
+        self.__counts[level] += 1
+
+    def __cascade(self):
+        """redistribute the timers of the higher levels' current slots"""
+        tick = self.__tick
+        for level in xrange(1, NUM_LEVELS):
+            index = (tick >> (LEVEL_BITS * level)) & LEVEL_MASK
+            slot = self.__levels[level][index]
+            timers = slot.values()
+            slot.clear()
+            self.__counts[level] -= len(timers)
+            for timer in timers:
+                self.__file(timer)
+            # end for
+            if index:
+                break
+            # end if
+        # end for
+
+
+class TimerService:
+
+    """Runs scheduled callbacks on a dedicated thread"""
+
+    def __init__(self):
+        self.__lock = thread.allocate_lock()
+        self.__wheel = TimerWheel()
+        self.__started = False
+        # Time until which the service thread is sleeping, or None if it's
+        # sleeping until woken up
+        self.__wakeTime = None
+        self.__wakeupRecv, self.__wakeupSend = socketpair()
+        self.__wakeupRecv.setblocking(False)
+        self.__wakeupSend.setblocking(False)
+
+    def callLater(self, delay, func, *args):
+        """invoke func(*args) after delay seconds"""
+        timer = Timer(time.time() + delay, func, args, self.__cancel)
+        self.__lock.acquire()
+        try:
+            if not self.__started:
+                thread.start_new_thread(self.__run, ())
+                self.__started = True
+            # end if
+            self.__wheel.add(timer)
+            wakeTime = self.__wakeTime
+            # The service thread only needs to be woken up if it is currently
+            # sleeping until a later time than the new timer's.
+            wakeup = wakeTime is None or timer.expire < wakeTime
+            if wakeup:
+                self.__wakeTime = timer.expire
+        finally:
+            self.__lock.release()
+        if wakeup:
+            self.__wakeup()
+        return timer
+
+    def __cancel(self, timer):
+        """remove cancelled timer from wheel"""
+        self.__lock.acquire()
+        self.__wheel.remove(timer)
+        self.__lock.release()
+
+    def __wakeup(self):
+        """wake up the service thread"""
+        try:
+            self.__wakeupSend.send("x")
+        except socket.error:
+            # The socket buffer is full, so the thread is going to wake up anyway.
+            pass
+        # end try
+
+    def __run(self):
+        """main function of service thread"""
+        while True:
+            due, timeout = self.__popDue()
+            for timer in due:
+                try:
+                    timer._fire()
+                except:
+                    # Mimic what the thread module does with an unhandled exception,
+                    # but keep the service running.
+                    print >> sys.stderr, "Unhandled exception in timer callback"
+                    traceback.print_exc()
+                # end try
+            # end for
+            if due:
+                # Callbacks may have taken a while; re-check the clock before sleeping.
+                continue
+            readable = select.select([self.__wakeupRecv], [], [], timeout)[0]
+            if readable:
+                self.__drainWakeup()
+            # end if
+        # end while
+
+    def __popDue(self):
+        """remove expired timers; return them with the time until the next one"""
+        self.__lock.acquire()
+        try:
+            now = time.time()
+            due = self.__wheel.popDue(now)
+            wakeTime = self.__wheel.nextExpire()
+            if wakeTime is None and self.__wakeTime > now:
+                # The timers that we were going to wake up for have been cancelled.
+                # Don't sleep indefinitely, or the next callLater() (typically a
+                # receive() timeout just like those) would have to wake us up.
+                wakeTime = self.__wakeTime
+            self.__wakeTime = wakeTime
+            if wakeTime is None:
+                return due, None
+            return due, max(0, wakeTime - now)
+        finally:
+            self.__lock.release()
+        # end try
+
+    def __drainWakeup(self):
+        """discard any pending wake-up bytes"""
+        try:
+            while self.__wakeupRecv.recv(4096):
+                pass
+            # end while
+        except socket.error:
+            pass
+        # end try
+
+
+def socketpair():
+    """return a pair of connected sockets, even where socket.socketpair() is
+    not available (e.g. Windows)"""
+    if hasattr(socket, "socketpair"):
+        return socket.socketpair()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client.connect(listener.getsockname())
+        server = listener.accept()[0]
+    finally:
+        listener.close()
+    return server, client
+
+
+# This value is a singleton that is accessed only via getTimerService()
+_TimerService = None
+
+
+def getTimerService():
+    """return value of TimerService"""
+    global _TimerService
+    if _TimerService is None:
+        _TimerService = TimerService()
+    return _TimerService
+
+
+def callLater(delay, func, *args):
+    """invoke func(*args) on the timer thread after delay seconds"""
+    return getTimerService().callLater(delay, func, *args)
@@ -0,0 +1,113 @@
+# wakeup.py
+#
+# Copyright (c) 2004 Michael Hobbs
+#
+# This file is part of Candygram.
+#
+# Candygram is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation; either version 2.1 of the License, or
+# (at your option) any later version.
+#
+# Candygram is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Candygram; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""WakeupProcess class
+
+A process that runs an event loop, e.g. one built on select() or the
+selectors of a networking framework, cannot block in Receiver.receive(), and
+polling its mailbox at an interval either delays messages or wastes time. A
+WakeupProcess instead has a file descriptor that becomes readable when a
+message arrives in its mailbox or an exit signal is sent to it, so the loop can
+wait on its mailbox and its sockets at the same time:
+
+    proc = candygram.self()
+    empty = object()
+    while True:
+        readable = select.select([proc, sock], [], [])[0]
+        if proc in readable:
+            proc.clear()
+            while receiver.receive(0, lambda: empty) is not empty:
+                pass
+        ...
+
+Calling clear() before receiving makes sure that a message that arrives while
+the loop is receiving makes the descriptor readable again. The descriptor is
+only written to once between calls to clear(), however many messages arrive,
+so a busy sender doesn't pay for a system call per message.
+
+To use this class, invoke spawn() or spawnLink() with the `_processClass=
+WakeupProcess' keyword argument. The descriptor is closed when the process
+terminates.
+"""
+
+__revision__ = "$Id$"
+
+
+import socket
+
+from candygram.process import Process
+from candygram.timer import socketpair
+
+
+class WakeupProcess(Process):
+
+    """A Process whose fileno() is readable when it has something to receive"""
+
+    def __init__(self):
+        Process.__init__(self)
+        self.__wakeupRecv, self.__wakeupSend = socketpair()
+        self.__wakeupRecv.setblocking(False)
+        self.__wakeupSend.setblocking(False)
+        # True if __wakeupSend has been written to since the last clear()
+        self.__pending = False
+        self._wakeup = self.__notify
+
+    def fileno(self):
+        """return file descriptor that is readable when a message or signal has
+        arrived since the last clear()"""
+        return self.__wakeupRecv.fileno()
+
+    def clear(self):
+        """make fileno() unreadable until the next message or signal arrives"""
+        # Drain the socket before resetting the flag. A message that arrives
+        # while we drain then either finds the flag still set, and is received
+        # by the caller after clear() returns, or finds it reset, and writes to
+        # the socket again. Resetting the flag first would let us drain that
+        # write while the flag stays set, so that no later message would make
+        # fileno() readable.
+        try:
+            while self.__wakeupRecv.recv(4096):
+                pass
+            # end while
+        except socket.error:
+            pass
+        # end try
+        self.__pending = False
+
+    def _exit(self, exitError):
+        try:
+            Process._exit(self, exitError)
+        finally:
+            self.__wakeupRecv.close()
+            self.__wakeupSend.close()
+        # end try
+
+    def __notify(self):
+        """make fileno() readable"""
+        if self.__pending:
+            return
+        self.__pending = True
+        try:
+            self.__wakeupSend.send("x")
+        except socket.error:
+            # Either the socket's buffer is full, in which case fileno() is
+            # readable anyway, or the process has terminated.
+            pass
+        # end try
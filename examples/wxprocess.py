@@ -25,9 +25,9 @@ the process's mailbox. With this approach, the wx.App knows that it needs to
 check for new Candygram messages only when it receives a notification event.
 
 [NB: This same technique can also be used with a process that checks for network
-activity by looping on select.select(), a la Twisted. In that scenario, we can
-notify the process of a new message by sending an empty UDP packet across a
-loopback socket.]
+activity by looping on select.select(), a la Twisted. The WakeupProcess class in
+the candygram.wakeup module does just that: its fileno() becomes readable when a
+new message arrives.]
 
 To use this module, invoke spawn() or spawnLink() with the `_processClass=
 wxProcess' keyword argument. The spawned function should create an instance of
@@ -0,0 +1,146 @@
+"""Tests for processes that run as asyncio tasks"""
+
+
+import unittest
+
+import pytest
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = pytest.importorskip("trollius")
+# end try
+
+import candygram as cg
+from candygram import aio
+
+
+From = getattr(asyncio, "From", lambda future: future)
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testReceive(self):
+        proc = aio.spawn(pong, _loop=self.loop)
+        assert isinstance(proc, cg.Process)
+        cg.spawn(ping, proc, cg.self())
+        self.loop.run_until_complete(proc.task)
+        r = cg.Receiver()
+        r.addHandler(("pong", aio.AsyncProcess), lambda m: m[1], cg.Message)
+        assert r.receive(1000) is proc
+        assert not proc.isAlive()
+
+    def testTimeout(self):
+        proc = aio.spawn(waitFor, "never", 10, _loop=self.loop)
+        assert self.loop.run_until_complete(proc.task) == "timeout"
+
+    def testSignal(self):
+        proc = aio.spawn(waitFor, "never", None, _loop=self.loop)
+        ref = cg.monitor(proc)
+        cg.exit(proc, "stop")
+        with pytest.raises(cg.ExitError):
+            self.loop.run_until_complete(proc.task)
+        r = cg.Receiver()
+        r.addHandler(("DOWN", ref, proc, cg.Any), lambda m: m[3], cg.Message)
+        assert r.receive(1000) == "stop"
+
+    def testLink(self):
+        proc = aio.spawn(waitFor, "crash", None, _loop=self.loop)
+        cg.processFlag("trap_exit", True)
+        try:
+            cg.link(proc)
+            proc.send("crash")
+            with pytest.raises(ZeroDivisionError):
+                self.loop.run_until_complete(proc.task)
+            r = cg.Receiver()
+            r.addHandler(("EXIT", proc, cg.Any), lambda m: m[2], cg.Message)
+            assert isinstance(r.receive(1000), cg.process.ExceptionReason)
+        finally:
+            cg.processFlag("trap_exit", False)
+        # end try
+
+    def testSignalWhileSleeping(self):
+        # A task that isn't awaiting areceive() is cancelled by a signal.
+        for reason, expected in [("stop", "stop"), ("kill", "killed")]:
+            proc = aio.spawn(sleep, _loop=self.loop)
+            ref = cg.monitor(proc)
+            self.loop.run_until_complete(asyncio.sleep(0.01))
+            cg.exit(proc, reason)
+            with pytest.raises(asyncio.CancelledError):
+                self.loop.run_until_complete(proc.task)
+            r = cg.Receiver()
+            r.addHandler(("DOWN", ref, proc, cg.Any), lambda m: m[3], cg.Message)
+            assert r.receive(1000) == expected
+        # end for
+
+    def testClosedLoop(self):
+        # A task whose loop is closed before it runs doesn't leave its process
+        # alive.
+        loop = asyncio.new_event_loop()
+        proc = aio.spawn(sleep, _loop=loop)
+        ref = cg.monitor(proc)
+        loop.close()
+        proc.send("hello")
+        assert proc.task not in aio._Processes
+        assert not proc.isAlive()
+        r = cg.Receiver()
+        r.addHandler(("DOWN", ref, proc, cg.Any), lambda m: m[3], cg.Message)
+        assert r.receive(1000) == "killed"
+        proc = aio.spawn(sleep, _loop=self.loop)
+        self.loop.close()
+        assert not proc.isAlive()
+        assert proc.task not in aio._Processes
+
+    def testBadArgs(self):
+        self.assertRaises(cg.ExitError, aio.spawn, None, _loop=self.loop)
+        proc = aio.spawn(badTimeout, _loop=self.loop)
+        with pytest.raises(cg.ExitError):
+            self.loop.run_until_complete(proc.task)
+
+
+@asyncio.coroutine
+def pong():
+    r = aio.AsyncReceiver()
+    r.addHandler(("ping", cg.Process), lambda m: m[1], cg.Message)
+    proc = yield From(r.areceive())
+    proc.send(("pong", aio.self()))
+
+
+def ping(proc, parent):
+    proc.send(("ping", cg.self()))
+    r = cg.Receiver()
+    r.addHandler(("pong", cg.Any), parent.send, cg.Message)
+    r.receive()
+
+
+@asyncio.coroutine
+def waitFor(message, timeout):
+    r = aio.AsyncReceiver()
+    r.addHandler("crash", lambda: 1 / 0)
+    r.addHandler(message)
+    result = yield From(r.areceive(timeout, lambda: "timeout"))
+    raise getattr(asyncio, "Return", StopIteration)(result)
+
+
+@asyncio.coroutine
+def sleep():
+    yield From(asyncio.sleep(10))
+
+
+@asyncio.coroutine
+def badTimeout():
+    yield From(aio.AsyncReceiver().areceive(-1))
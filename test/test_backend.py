@@ -0,0 +1,72 @@
+"""Tests that processes work on each threadimpl backend"""
+
+
+import unittest
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+# A backend can only be selected before the first process exists, so each
+# backend is tested in a fresh interpreter.
+SCRIPT = """
+import candygram as cg
+cg.useBackend(%r)
+
+def echo():
+    r = cg.Receiver()
+    r.addHandler((cg.Process, cg.Any), lambda m: m[0].send((cg.self(), m[1])), cg.Message)
+    r.receive()
+
+procs = [cg.spawn(echo) for i in range(1000)]
+for i, proc in enumerate(procs):
+    proc.send((cg.self(), i))
+r = cg.Receiver()
+r.addHandler((cg.Process, int), lambda m: m[1], cg.Message)
+assert sum([r.receive() for proc in procs]) == sum(range(1000))
+assert r.receive(50, lambda: "timeout") == "timeout"
+print "ok"
+"""
+
+
+class TestBackend(unittest.TestCase):
+    def run_(self, script):
+        pwd = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.dirname(pwd)
+        proc = subprocess.Popen(
+            [sys.executable, "-c", script],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env,
+        )
+        return proc.communicate()[0]
+
+    def testThread(self):
+        assert self.run_(SCRIPT % "thread") == "ok\n"
+
+    def testGreenlet(self):
+        pytest.importorskip("greenlet")
+        assert self.run_(SCRIPT % "greenlet") == "ok\n"
+
+    def testDeadlock(self):
+        pytest.importorskip("greenlet")
+        script = (
+            "import candygram as cg\n"
+            "cg.useBackend('greenlet')\n"
+            "from candygram.greenletimpl import DeadlockError\n"
+            "try:\n"
+            "    cg.Receiver().receive()\n"
+            "except DeadlockError:\n"
+            "    print 'ok'\n"
+        )
+        assert self.run_(script) == "ok\n"
+
+    def testTooLate(self):
+        import candygram as cg
+
+        cg.self()
+        with pytest.raises(AssertionError):
+            cg.useBackend("thread")
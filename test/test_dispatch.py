@@ -0,0 +1,120 @@
+"""Tests that DispatchTable picks the same handler as trying every handler"""
+
+
+import unittest
+from collections import namedtuple
+
+import candygram as cg
+from candygram.dispatch import DispatchTable
+from candygram.pattern import compileFilter
+
+
+Point = namedtuple("Point", "x y")
+
+
+class OldStyle:
+    pass
+
+
+class NewStyle(object):
+    pass
+
+
+PATTERNS = [
+    ("tag", int),
+    ("tag", str),
+    ("other", cg.Any),
+    (1, cg.Any),
+    (True, str),
+    ["list", int],
+    [],
+    (),
+    (str, int),
+    Point,
+    (cg.Any, cg.Any),
+    "text",
+    42,
+    1.0,
+    None,
+    int,
+    str,
+    OldStyle,
+    NewStyle,
+    lambda x: x == "lambda",
+]
+
+MESSAGES = [
+    ("tag", 1),
+    ("tag", "a"),
+    ("tag", 1, 2),
+    (u"tag", 1),
+    ("other", None),
+    (1, "a"),
+    (1.0, "a"),
+    (True, 2),
+    ["list", 1, 2],
+    ["list"],
+    ["list", "a"],
+    [],
+    (),
+    ("a", 1),
+    ((1,), 2),
+    Point(1, 2),
+    Point("tag", 1),
+    "text",
+    u"text",
+    42,
+    42.0,
+    1,
+    True,
+    None,
+    "lambda",
+    OldStyle(),
+    OldStyle,
+    NewStyle(),
+    NewStyle,
+    {"key": 1},
+    object(),
+]
+
+
+def firstMatch(handlers, message):
+    """return the first handler whose filter matches message"""
+    for handler in handlers:
+        if handler[2](message):
+            return handler
+        # end if
+    return None
+
+
+class TestDispatchTable(unittest.TestCase):
+    def testFirstMatch(self):
+        # Try each pattern at every priority, so that every pair of patterns has
+        # to be told apart.
+        for i in range(len(PATTERNS)):
+            patterns = PATTERNS[i:] + PATTERNS[:i]
+            handlers = [
+                (id_, pattern, compileFilter(pattern), None, (), {})
+                for id_, pattern in enumerate(patterns)
+            ]
+            table = DispatchTable(handlers)
+            for message in MESSAGES:
+                expected = firstMatch(handlers, message)
+                # Check twice, so that memoized nodes are tested as well.
+                for j in range(2):
+                    actual = firstMatch(table.candidates(message), message)
+                    assert actual is expected, (patterns[0], message)
+                # end for
+            # end for
+        # end for
+
+    def testNarrowing(self):
+        handlers = [
+            (id_, ("tag%d" % id_, int), compileFilter(("tag%d" % id_, int)), None, (), {})
+            for id_ in range(50)
+        ]
+        table = DispatchTable(handlers)
+        assert [h[0] for h in table.candidates(("tag7", 1))] == [7]
+        assert table.candidates(("tag7", 1, 2)) == ()
+        assert table.candidates("tag7") == ()
+        assert table.indexKeys == set(["tag%d" % i for i in range(50)])
@@ -1,9 +1,13 @@
 """Tests that patterns in documentation work as advertised"""
 
 
+import threading
+import time
 import unittest
+from cStringIO import StringIO
 
 import candygram as cg
+from candygram.channel import Channel, RemoteProcess
 
 
 class TestFunctions(unittest.TestCase):
@@ -25,13 +29,192 @@ class TestFunctions(unittest.TestCase):
         assert r.receive() == ("MyProcess", "test")
         cg.exit(proc, "kill")
 
+    def testSelf(self):
+        root = cg.self()
+        procs = [cg.spawn(reportSelf, root) for i in range(20)]
+        r = cg.Receiver()
+        r.addHandler(cg.Process, lambda m: m, cg.Message)
+        reported = [r.receive(1000) for proc in procs]
+        assert sorted(map(id, reported)) == sorted(map(id, procs))
+        assert cg.self() is root
+
+    def testSendMany(self):
+        proc = cg.spawn(collect, cg.self(), 5)
+        assert cg.sendMany(proc, iter(range(3))) == [0, 1, 2]
+        proc.sendMany([3, 4])
+        r = cg.Receiver()
+        r.addHandler(list, lambda m: m, cg.Message)
+        assert r.receive(1000) == [0, 1, 2, 3, 4]
+
+    def testSendManyMyProcess(self):
+        # sendMany() must go through an overridden send().
+        proc = cg.spawn(collect, cg.self(), 2, _processClass=MyProcess)
+        proc.sendMany(["a", "b"])
+        r = cg.Receiver()
+        r.addHandler(list, lambda m: m, cg.Message)
+        assert r.receive(1000) == [("MyProcess", "a"), ("MyProcess", "b")]
+
+    def testRegister(self):
+        proc = cg.spawn(collect, cg.self(), 2)
+        assert cg.register("collector", proc)
+        assert cg.whereis("collector") is proc
+        assert "collector" in cg.registered()
+        # A name can only be taken once, and a process only has one name.
+        self.assertRaises(cg.ExitError, cg.register, "collector", cg.self())
+        self.assertRaises(cg.ExitError, cg.register, "other", proc)
+        cg.send("collector", "a")
+        cg.sendMany("collector", ["b"])
+        r = cg.Receiver()
+        r.addHandler(list, lambda m: m, cg.Message)
+        assert r.receive(1000) == ["a", "b"]
+        # The name is removed when the process exits.
+        for i in range(100):
+            if cg.whereis("collector") is None:
+                break
+            time.sleep(0.01)
+        # end for
+        assert cg.whereis("collector") is None
+        self.assertRaises(cg.ExitError, cg.send, "collector", "c")
+        self.assertRaises(cg.ExitError, cg.register, "collector", proc)
+
+    def testUnregister(self):
+        proc = cg.spawn(echo, cg.self())
+        cg.register("echo", proc)
+        assert cg.unregister("echo")
+        assert cg.whereis("echo") is None
+        self.assertRaises(cg.ExitError, cg.unregister, "echo")
+        # The process may be registered again, under any name.
+        cg.register("echo2", proc)
+        assert cg.whereis("echo2") is proc
+        cg.exit(proc, "kill")
+        self.assertRaises(cg.ExitError, cg.register, 1, cg.self())
+        self.assertRaises(cg.ExitError, cg.register, "name", None)
+
+    def testSendAfter(self):
+        start = time.time()
+        cg.sendAfter(100, cg.self(), "later")
+        cg.sendAfter(50, cg.self(), "sooner")
+        r = cg.Receiver()
+        r.addHandler(str, lambda m: m, cg.Message)
+        assert r.receive(1000) == "sooner"
+        assert r.receive(1000) == "later"
+        assert time.time() - start >= 0.1
+        proc = cg.spawn(echo, cg.self())
+        cg.register("echoLater", proc)
+        cg.sendAfter(0, "echoLater", "by name")
+        r = cg.Receiver()
+        r.addHandler("by name", lambda: True)
+        assert r.receive(1000)
+        cg.exit(proc, "kill")
+        # Unregistered names are ignored.
+        cg.sendAfter(0, "nobody", "lost")
+        self.assertRaises(cg.ExitError, cg.sendAfter, -1, cg.self(), "x")
+        self.assertRaises(cg.ExitError, cg.sendAfter, 10, None, "x")
+
+    def testSendAfterBlocked(self):
+        # A remote send that blocks on its connection doesn't hold up other
+        # timers.
+        output = BlockingOutput()
+        remote = RemoteProcess(Channel(StringIO(""), output), 0)
+        try:
+            cg.sendAfter(0, remote, "stuck")
+            assert output.writing.wait(1)
+            cg.sendAfter(10, cg.self(), "on time")
+            r = cg.Receiver()
+            r.addHandler("on time", lambda: True)
+            # Poll, since a timed receive() would wait on the timers, too.
+            for i in range(100):
+                if r.receive(0, lambda: False):
+                    break
+                time.sleep(0.01)
+            else:
+                self.fail("timer was held up")
+            # end for
+        finally:
+            output.unblock.set()
+        # end try
+
+    def testCancelTimer(self):
+        timer = cg.sendAfter(1000, cg.self(), "cancelled")
+        left = cg.cancelTimer(timer)
+        assert 0 < left <= 1000
+        assert cg.cancelTimer(timer) is False
+        timer = cg.sendAfter(0, cg.self(), "expired")
+        r = cg.Receiver()
+        r.addHandler("expired", lambda: True)
+        assert r.receive(1000)
+        assert cg.cancelTimer(timer) is False
+        r = cg.Receiver()
+        r.addHandler("cancelled", lambda: True)
+        assert r.receive(100, lambda: False) is False
+        self.assertRaises(cg.ExitError, cg.cancelTimer, None)
+
+    def testSignalCheckInterval(self):
+        sink = cg.spawn(idle)
+        proc = cg.spawn(flood, cg.self(), sink, 100)
+        ref = cg.monitor(proc)
+        # Wait until proc has set its flag and started sending.
+        r = cg.Receiver()
+        r.addHandler("flooding")
+        r.receive(1000)
+        cg.exit(proc, "stopped")
+        r = cg.Receiver()
+        r.addHandler(("DOWN", ref, proc, cg.Any), lambda m: m[3], cg.Message)
+        assert r.receive(1000) == "stopped"
+        assert cg.process._PeriodicSignalChecks == 0
+        cg.exit(sink, "kill")
+        assert cg.processFlag("signal_check_interval", 10) == 0
+        assert cg.processFlag("signal_check_interval", 0) == 10
+        self.assertRaises(cg.ExitError, cg.processFlag, "signal_check_interval", -1)
+        self.assertRaises(cg.ExitError, cg.processFlag, "signal_check_interval", True)
+
 
 class MyProcess(cg.Process):
     def send(self, message):
         return cg.Process.send(self, ("MyProcess", message))
 
 
+class BlockingOutput:
+    def __init__(self):
+        self.writing = threading.Event()
+        self.unblock = threading.Event()
+
+    def write(self, data):
+        self.writing.set()
+        self.unblock.wait()
+
+    def flush(self):
+        pass
+
+
 def echo(proc):
     r = cg.Receiver()
     r.addHandler(cg.Any, proc.send, cg.Message)
     r.receive()
+
+
+def reportSelf(proc):
+    proc.send(cg.self())
+
+
+def collect(proc, count):
+    r = cg.Receiver()
+    r.addHandler(cg.Any, lambda m: m, cg.Message)
+    proc.send([r.receive() for i in range(count)])
+
+
+def idle():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def flood(proc, sink, interval):
+    """send to sink until a signal arrives"""
+    cg.processFlag("signal_check_interval", interval)
+    proc.send("flooding")
+    i = 0
+    while True:
+        sink.send(i)
+        i += 1
+    # end while
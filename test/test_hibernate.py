@@ -0,0 +1,171 @@
+"""Tests for hibernate()"""
+
+
+import threading
+import time
+import unittest
+
+import candygram as cg
+from candygram.process import getHibernating, getProcessMapLock
+
+
+class TestHibernate(unittest.TestCase):
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testResume(self):
+        proc = cg.spawn(echo, cg.self())
+        assert waitFor(hibernating, proc)
+        assert proc in cg.processes()
+        # A message that doesn't match leaves the process hibernating.
+        proc.send("ignored")
+        time.sleep(0.1)
+        assert hibernating(proc)
+        proc.send(("echo", "hello"))
+        assert self.reply() == ("hello", 1)
+        # The process hibernated again.
+        assert waitFor(hibernating, proc)
+        proc.send(("echo", "again"))
+        assert self.reply() == ("again", 2)
+        proc.send("stop")
+        assert waitFor(lambda: not proc.isAlive())
+
+    def testPendingMessage(self):
+        proc = cg.spawn(pendingEcho, cg.self())
+        assert self.reply() == ("early", 1)
+        proc.send("stop")
+
+    def testNormalExit(self):
+        proc = cg.spawnLink(hibernateOnce)
+        cg.processFlag("trap_exit", True)
+        try:
+            proc.send("go")
+            r = cg.Receiver()
+            r.addHandler(("EXIT", proc, cg.Any), lambda m: m[2], cg.Message)
+            assert r.receive(1000) == "normal"
+        finally:
+            cg.processFlag("trap_exit", False)
+        # end try
+
+    def testAfter(self):
+        proc = cg.spawn(hibernateAfter, cg.self())
+        r = cg.Receiver()
+        r.addHandler("timeout", lambda: "timeout")
+        assert r.receive(1000) == "timeout"
+        assert waitFor(lambda: not proc.isAlive())
+
+    def testKill(self):
+        proc = cg.spawnLink(echo, cg.self())
+        assert waitFor(hibernating, proc)
+        cg.processFlag("trap_exit", True)
+        try:
+            cg.exit(proc, "kill")
+            r = cg.Receiver()
+            r.addHandler(("EXIT", proc, cg.Any), lambda m: m[2], cg.Message)
+            assert r.receive(1000) == "killed"
+        finally:
+            cg.processFlag("trap_exit", False)
+        # end try
+        assert not hibernating(proc)
+
+    def testExceptException(self):
+        proc = cg.spawn(guardedEcho, cg.self())
+        assert waitFor(hibernating, proc)
+        proc.send(("echo", "hello"))
+        assert self.reply() == ("hello", 1)
+        proc.send("stop")
+
+    def testThreadLocal(self):
+        # Only resumed processes reuse threads, so a spawned process never sees
+        # the thread-local state of a process that has finished.
+        proc = cg.spawn(setLocal)
+        assert waitFor(lambda: not proc.isAlive())
+        cg.spawn(getLocal, cg.self())
+        assert self.reply() == ("local", 0)
+
+    def testBadArgs(self):
+        self.assertRaises(cg.ExitError, cg.hibernate, None)
+        r = cg.Receiver()
+        r.addHandler(cg.Any)
+        # The root process can't hibernate.
+        self.assertRaises(cg.ExitError, cg.hibernate, r)
+
+    def reply(self):
+        r = cg.Receiver()
+        r.addHandler((str, int), lambda m: m, cg.Message)
+        return r.receive(1000)
+
+
+def hibernating(proc):
+    getProcessMapLock().acquire()
+    try:
+        return proc in getHibernating()
+    finally:
+        getProcessMapLock().release()
+    # end try
+
+
+def waitFor(predicate, *args):
+    """return True once predicate(*args) is true, or False after a second"""
+    for i in range(100):
+        if predicate(*args):
+            return True
+        time.sleep(0.01)
+    # end for
+    return False
+
+
+def echo(proc, count=0):
+    count += 1
+    r = cg.Receiver()
+    r.addHandler(("echo", str), reply, proc, cg.Message, count)
+    r.addHandler("stop", lambda: None)
+    cg.hibernate(r)
+
+
+def reply(proc, message, count):
+    proc.send((message[1], count))
+    echo(proc, count)
+
+
+def guardedEcho(proc):
+    try:
+        echo(proc)
+    except Exception:
+        proc.send(("caught", 0))
+    # end try
+
+
+_Local = threading.local()
+
+
+def setLocal():
+    _Local.value = "leaked"
+
+
+def getLocal(proc):
+    proc.send((getattr(_Local, "value", "local"), 0))
+
+
+def pendingEcho(proc):
+    cg.self().send(("echo", "early"))
+    echo(proc)
+
+
+def hibernateOnce():
+    r = cg.Receiver()
+    r.addHandler("go", lambda: None)
+    cg.hibernate(r)
+
+
+def hibernateAfter(proc):
+    r = cg.Receiver()
+    r.addHandler("never", lambda: None)
+    r.after(50, proc.send, "timeout")
+    cg.hibernate(r)
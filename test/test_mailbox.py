@@ -0,0 +1,237 @@
+"""Tests the Mailbox class and its index"""
+
+
+import unittest
+
+import candygram as cg
+from candygram.mailbox import Mailbox, MESSAGE
+from candygram.pattern import indexKey, messageIndexKey, Opaque, Unsequenced
+
+
+class TestIndexKeys(unittest.TestCase):
+    def testPatternKeys(self):
+        assert indexKey(("tag", int)) == "tag"
+        assert indexKey((1,)) == 1
+        assert indexKey(["tag", cg.Any]) == "tag"
+        assert indexKey(["tag"]) is cg.Any
+        assert indexKey((str, int)) is cg.Any
+        assert indexKey(()) is cg.Any
+        assert indexKey("tag") is cg.Any
+        assert indexKey({"tag": 1}) is cg.Any
+
+    def testMessageKeys(self):
+        assert messageIndexKey(("tag", 1)) == "tag"
+        assert messageIndexKey(["tag"]) == "tag"
+        assert messageIndexKey(((1, 2), 3)) is Opaque
+        assert messageIndexKey(()) is Unsequenced
+        assert messageIndexKey("tag") is Unsequenced
+        assert messageIndexKey({"tag": 1}) is Unsequenced
+
+
+class TestMailbox(unittest.TestCase):
+    def testEntries(self):
+        mailbox = Mailbox()
+        for message in [("a", 1), ("b", 2), "c", (("d",), 4), ("a", 5)]:
+            mailbox.append(message)
+        assert len(mailbox) == 5
+        messages = [entry[MESSAGE] for entry in mailbox.entries(0, set(["a"]))]
+        assert messages == [("a", 1), (("d",), 4), ("a", 5)]
+        messages = [entry[MESSAGE] for entry in mailbox.entries(2, set(["a", "b"]))]
+        assert messages == [(("d",), 4), ("a", 5)]
+        entry = list(mailbox.entries(0, set(["b"])))[0]
+        mailbox.remove(entry)
+        assert list(mailbox) == [("a", 1), "c", (("d",), 4), ("a", 5)]
+        assert list(mailbox.entries(0, set(["b"])))[0][MESSAGE] == (("d",), 4)
+
+    def testRemove(self):
+        mailbox = Mailbox()
+        for i in range(100):
+            mailbox.append(("tag", i))
+        # Remove from the head, the middle and the tail, enough to trigger
+        # compaction.
+        entries = list(mailbox.entries(0))
+        for i in range(30) + range(50, 70) + range(90, 100):
+            mailbox.remove(entries[i])
+        assert len(mailbox) == 40
+        assert list(mailbox) == [("tag", i) for i in range(30, 50) + range(70, 90)]
+        messages = [entry[MESSAGE] for entry in mailbox.entries(45, set(["tag"]))]
+        assert messages == [("tag", i) for i in range(45, 50) + range(70, 90)]
+        for entry in list(mailbox.entries(0)):
+            mailbox.remove(entry)
+        assert len(mailbox) == 0
+        assert list(mailbox.entries(0, set(["tag"]))) == []
+        mailbox.append(("tag", 100))
+        assert list(mailbox) == [("tag", 100)]
+
+
+class TestIndexedReceive(unittest.TestCase):
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testSelective(self):
+        proc = cg.self()
+        for i in range(100):
+            proc.send(("noise", i))
+        proc.send(("wanted", 1))
+        proc.send(("wanted", 2))
+        r = cg.Receiver()
+        r.addHandler(("wanted", int), lambda m: m[1], cg.Message)
+        assert r.receive(0) == 1
+        assert r.receive(0) == 2
+        assert r.receive(0, lambda: "to") == "to"
+        assert len(proc._mailbox) == 100
+
+    def testOrder(self):
+        # Messages must be received in the order that they were sent, even if
+        # they are filed under different keys.
+        proc = cg.self()
+        proc.send(("b", 1))
+        proc.send([[1], 2])
+        proc.send(("a", 3))
+        proc.send((True, 4))
+        r = cg.Receiver()
+        r.addHandler(("a", int), lambda m: m[1], cg.Message)
+        r.addHandler((1, int), lambda m: m[1], cg.Message)
+        assert r.receive(0) == 3
+        assert r.receive(0) == 4
+        assert r.receive(0, lambda: "to") == "to"
+        r.addHandler([lambda x: x == [1], int], lambda m: m[1], cg.Message)
+        assert r.receive(0) == 2
+        r.addHandler(cg.Any, lambda m: m[1], cg.Message)
+        assert r.receive(0) == 1
+
+    def testMultipleReceivers(self):
+        # Removing a message with one Receiver must not make another Receiver
+        # skip or rescan messages.
+        proc = cg.self()
+        r1 = cg.Receiver()
+        r1.addHandler(("one", int), lambda m: m[1], cg.Message)
+        r2 = cg.Receiver()
+        r2.addHandler(("two", int), lambda m: m[1], cg.Message)
+        proc.send(("two", 1))
+        proc.send(("other", 2))
+        assert r1.receive(0, lambda: "to") == "to"
+        proc.send(("one", 3))
+        assert r2.receive(0) == 1
+        assert r1.receive(0) == 3
+        proc.send(("two", 4))
+        proc.send(("one", 5))
+        assert r1.receive(0) == 5
+        assert r2.receive(0) == 4
+        assert list(proc._mailbox) == [("other", 2)]
+
+
+class TestBoundedMailbox(unittest.TestCase):
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def fill(self, overflow):
+        proc = cg.spawn(drainLater, cg.self(), _mailboxSize=3, _overflow=overflow)
+        for i in range(5):
+            proc.send(i)
+        return proc
+
+    def result(self):
+        r = cg.Receiver()
+        r.addHandler(list, lambda m: m, cg.Message)
+        return r.receive(2000)
+
+    def testDropNew(self):
+        self.fill("drop_new")
+        assert self.result() == [0, 1, 2]
+
+    def testDropOld(self):
+        self.fill("drop_old")
+        assert self.result() == [2, 3, 4]
+
+    def testError(self):
+        proc = cg.spawn(drainLater, cg.self(), _mailboxSize=3, _overflow="error")
+        for i in range(3):
+            proc.send(i)
+        try:
+            proc.send(3)
+        except cg.ExitError, ex:
+            assert ex.reason == "mailbox_full"
+        else:
+            self.fail("ExitError not raised")
+        # end try
+        assert self.result() == [0, 1, 2]
+
+    def testBlock(self):
+        proc = cg.spawn(consumeSlowly, cg.self(), 10, _mailboxSize=3)
+        for i in range(10):
+            proc.send(i)
+        batches = self.result()
+        assert max(map(len, batches)) <= 3
+        assert sum(batches, []) == range(10)
+
+    def testBlockedSenderSignal(self):
+        # A process that is blocked on a full mailbox must still respond to signals.
+        target = cg.spawn(drainLater, cg.self(), _mailboxSize=1)
+        target.send(0)
+        sender = cg.spawn(target.send, 1)
+        r = cg.Receiver()
+        r.after(100)
+        r.receive()
+        assert sender.isAlive()
+        cg.exit(sender, "kill")
+        assert self.result() == [0]
+        assert not sender.isAlive()
+
+    def testExitMessage(self):
+        # EXIT messages are never dropped.
+        root = cg.self()
+        proc = cg.spawn(trapExits, root, _mailboxSize=1, _overflow="drop_new")
+        r = cg.Receiver()
+        r.addHandler("ready")
+        r.receive(1000)
+        proc.send(0)
+        proc.send(1)
+        cg.exit(proc, "shutdown")
+        assert self.result() == [0, ("EXIT", root, "shutdown")]
+
+    def testBadArgs(self):
+        self.assertRaises(cg.ExitError, cg.spawn, drainLater, None, _mailboxSize=0)
+        self.assertRaises(cg.ExitError, cg.spawn, drainLater, None, _overflow="x")
+
+
+def wait(timeout):
+    r = cg.Receiver()
+    r.after(timeout)
+    r.receive()
+
+
+def drainLater(proc):
+    wait(200)
+    r = cg.Receiver()
+    r.addHandler(cg.Any, lambda m: m, cg.Message)
+    proc.send(r.receiveMany(100))
+
+
+def consumeSlowly(proc, count):
+    r = cg.Receiver()
+    r.addHandler(int, lambda m: m, cg.Message)
+    batches = []
+    while sum(map(len, batches)) < count:
+        wait(20)
+        batches.append(r.receiveMany(count))
+    # end while
+    proc.send(batches)
+
+
+def trapExits(proc):
+    cg.processFlag("trap_exit", True)
+    proc.send("ready")
+    drainLater(proc)
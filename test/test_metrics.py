@@ -0,0 +1,122 @@
+"""Tests for mailbox statistics"""
+
+
+import time
+import unittest
+
+import candygram as cg
+from candygram.metrics import Histogram
+
+
+class TestStats(unittest.TestCase):
+    def tearDown(self):
+        cg.processFlag("stats", False)
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testDisabled(self):
+        assert cg.self().stats() is None
+        assert cg.self() not in cg.stats()
+        assert cg.processFlag("stats", True) is False
+        assert cg.processFlag("stats", True) is True
+        assert cg.processFlag("stats", False) is True
+        assert cg.self().stats() is None
+        self.assertRaises(cg.ExitError, cg.processFlag, "stats", 1)
+
+    def testCounts(self):
+        cg.processFlag("stats", True)
+        me = cg.self()
+        me.send(1)
+        me.sendMany(["a", "b", 2])
+        r = cg.Receiver()
+        r.addHandler(int, lambda m: m, cg.Message)
+        assert r.receive() == 1
+        assert r.receive() == 2
+        stats = me.stats()
+        assert stats["sent"] == 4
+        assert stats["received"] == 2
+        assert stats["dropped"] == 0
+        assert stats["mailboxLength"] == 2
+        assert stats["mailboxHighWater"] == 4
+        assert stats["scans"] == 2
+        # The second receive() resumes scanning after the first message.
+        assert stats["scanned"] == 4
+        assert stats["maxScanned"] == 3
+        assert stats["latency"]["count"] == 2
+        assert cg.stats()[me] == me.stats()
+
+    def testHandlerTime(self):
+        cg.processFlag("stats", True)
+        me = cg.self()
+        me.sendMany(range(3))
+        r = cg.Receiver()
+        r.addHandler(0, time.sleep, 0.05)
+        r.addHandler(int)
+        r.receive()
+        r.receiveMany(2)
+        handlerTime = me.stats()["handlerTime"]
+        assert handlerTime["count"] == 3
+        assert handlerTime["max"] >= 0.05
+        assert handlerTime["p99"] >= 0.05
+        assert handlerTime["p50"] < 0.05
+
+    def testLatency(self):
+        cg.processFlag("stats", True)
+        me = cg.self()
+        me.send("late")
+        time.sleep(0.05)
+        r = cg.Receiver()
+        r.addHandler("late")
+        r.receive()
+        latency = me.stats()["latency"]
+        assert latency["count"] == 1
+        assert latency["mean"] >= 0.05
+
+    def testDropped(self):
+        proc = cg.spawn(waitForStop, _mailboxSize=2, _overflow="drop_old", _stats=True)
+        proc.sendMany(["a", "b", "c"])
+        proc.send("d")
+        stats = proc.stats()
+        assert stats["sent"] == 4
+        assert stats["dropped"] == 2
+        assert stats["mailboxLength"] == 2
+        # A process isn't listed until its thread has started.
+        for i in range(100):
+            if proc in cg.processes():
+                break
+            time.sleep(0.01)
+        # end for
+        assert cg.stats()[proc]["sent"] == 4
+        proc.send("stop")
+        self.assertRaises(cg.ExitError, cg.spawn, waitForStop, _stats="yes")
+
+
+class TestHistogram(unittest.TestCase):
+    def testEmpty(self):
+        snapshot = Histogram().snapshot()
+        assert snapshot["count"] == 0
+        assert snapshot["mean"] is None
+        assert snapshot["p50"] is None
+        assert snapshot["buckets"] == []
+
+    def testPercentiles(self):
+        histogram = Histogram()
+        for i in range(99):
+            histogram.record(0.000003)
+        # end for
+        histogram.record(0.5)
+        assert histogram.percentile(50) == 4e-6
+        assert histogram.percentile(99) == 4e-6
+        assert histogram.percentile(100) == 0.5
+        assert histogram.snapshot()["buckets"] == [(4e-6, 99), ((1 << 19) / 1e6, 1)]
+
+
+def waitForStop():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
@@ -0,0 +1,135 @@
+"""Tests for monitor() and demonitor()"""
+
+
+import time
+import unittest
+
+import candygram as cg
+
+
+class TestMonitor(unittest.TestCase):
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testDown(self):
+        proc = cg.spawn(waitForStop)
+        ref = cg.monitor(proc)
+        assert isinstance(ref, cg.Reference)
+        proc.send("stop")
+        assert self.down(ref) == (proc, "normal")
+
+    def testReason(self):
+        proc = cg.spawn(waitForStop)
+        ref = cg.monitor(proc)
+        cg.exit(proc, "kill")
+        assert self.down(ref) == (proc, "killed")
+        proc = cg.spawn(divideOnStop, 1, 0)
+        ref = cg.monitor(proc)
+        proc.send("stop")
+        reason = self.down(ref)[1]
+        assert isinstance(reason, cg.process.ExceptionReason)
+
+    def testNoProc(self):
+        proc = cg.spawn(lambda: None)
+        while proc.isAlive():
+            time.sleep(0.01)
+        # end while
+        ref = cg.monitor(proc)
+        assert self.down(ref) == (proc, "noproc")
+
+    def testOneWay(self):
+        # The monitored process is not affected when the monitoring one exits.
+        proc = cg.spawn(waitForStop)
+        watcher = cg.spawn(monitorAndDie, proc, cg.self())
+        r = cg.Receiver()
+        r.addHandler("monitoring")
+        r.receive(1000)
+        time.sleep(0.1)
+        assert not watcher.isAlive()
+        assert proc.isAlive()
+        cg.exit(proc, "kill")
+
+    def testMultiple(self):
+        proc = cg.spawn(waitForStop)
+        refs = [cg.monitor(proc) for i in range(3)]
+        proc.send("stop")
+        for ref in refs:
+            assert self.down(ref) == (proc, "normal")
+        # end for
+
+    def testDemonitor(self):
+        proc = cg.spawn(waitForStop)
+        ref = cg.monitor(proc)
+        assert cg.demonitor(ref)
+        proc.send("stop")
+        assert self.down(ref, 200) is None
+        self.assertRaises(cg.ExitError, cg.demonitor, proc)
+        self.assertRaises(cg.ExitError, cg.monitor, None)
+
+    def testDemonitorFlush(self):
+        proc = cg.spawn(waitForStop)
+        ref = cg.monitor(proc)
+        proc.send("stop")
+        while proc.isAlive():
+            time.sleep(0.01)
+        # end while
+        time.sleep(0.05)
+        cg.demonitor(ref, True)
+        assert self.down(ref, 0) is None
+
+    def testDispatchedExit(self):
+        # A process with this many links and monitors leaves propagating its exit
+        # to the exit dispatcher.
+        count = cg.process.MAX_SYNC_EXIT_SIGNALS
+        cg.processFlag("trap_exit", True)
+        try:
+            hub = cg.spawnLink(spawnWorkers, cg.self(), count)
+            r = cg.Receiver()
+            r.addHandler(list, lambda m: m, cg.Message)
+            workers = r.receive(1000)
+            refs = [cg.monitor(worker) for worker in workers]
+            hubRef = cg.monitor(hub)
+            cg.exit(hub, "kill")
+            r = cg.Receiver()
+            r.addHandler(("EXIT", hub, cg.Any), lambda m: m[2], cg.Message)
+            assert r.receive(1000) == "killed"
+            assert self.down(hubRef) == (hub, "killed")
+            for worker, ref in zip(workers, refs):
+                assert self.down(ref) == (worker, "killed")
+            # end for
+        finally:
+            cg.processFlag("trap_exit", False)
+        # end try
+
+    def down(self, ref, timeout=1000):
+        r = cg.Receiver()
+        r.addHandler(("DOWN", ref, cg.Process, cg.Any), lambda m: m[2:], cg.Message)
+        return r.receive(timeout, lambda: None)
+
+
+def waitForStop():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def divideOnStop(a, b):
+    waitForStop()
+    return a / b
+
+
+def monitorAndDie(proc, parent):
+    cg.monitor(proc)
+    parent.send("monitoring")
+    raise cg.ExitError("crashed")
+
+
+def spawnWorkers(proc, count):
+    proc.send([cg.spawnLink(waitForStop) for i in range(count)])
+    waitForStop()
@@ -0,0 +1,177 @@
+"""Tests for the multiproc module"""
+
+
+import cPickle
+import os
+import threading
+import unittest
+from cStringIO import StringIO
+
+import candygram as cg
+from candygram import multiproc
+from candygram.channel import Channel, RemoteProcess
+
+
+class TestMultiproc(unittest.TestCase):
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def receive(self, pattern):
+        r = cg.Receiver()
+        r.addHandler(pattern, lambda m: m, cg.Message)
+        return r.receive(5000)
+
+    def testSend(self):
+        proc = multiproc.spawn(echo)
+        assert isinstance(proc, cg.Process)
+        proc.send((cg.self(), "hello"))
+        sender, pid, message = self.receive((cg.Process, int, str))
+        assert sender is proc
+        assert pid != os.getpid()
+        assert message == "hello"
+        proc.send("stop")
+
+    def testProcessReferences(self):
+        # A Process that goes to the other side and back again is the original.
+        root = cg.self()
+        proc = multiproc.spawn(echo)
+        proc.send((root, root))
+        assert self.receive((cg.Process, int, cg.Process))[2] is root
+        proc.send((root, proc))
+        assert self.receive((cg.Process, int, cg.Process))[2] is proc
+        proc.send("stop")
+
+    def testExit(self):
+        proc = multiproc.spawn(echo)
+        assert proc.isAlive()
+        cg.exit(proc, "kill")
+        self.receiveExit(proc)
+
+    def testLink(self):
+        cg.spawn(trapChild, cg.self(), divide, 1, 0)
+        reason = self.receive(("reason", cg.Any))[1]
+        assert isinstance(reason, multiproc.RemoteExceptionReason)
+        assert reason.excType == "exceptions.ZeroDivisionError"
+        assert "ZeroDivisionError" in reason.traceback
+
+    def testLinkNormal(self):
+        cg.spawn(trapChild, cg.self(), divide, 4, 2)
+        assert self.receive(("reason", cg.Any))[1] == "normal"
+
+    def testKillLinked(self):
+        # Killing a process that the child is linked to must kill the child.
+        victim = cg.spawn(idle)
+        proc = multiproc.spawn(linkAndIdle, victim)
+        r = cg.Receiver()
+        r.after(500)
+        r.receive()
+        assert proc.isAlive()
+        cg.exit(victim, "kill")
+        self.receiveExit(proc)
+
+    def testBadArgs(self):
+        self.assertRaises(cg.ExitError, multiproc.spawn, None)
+        self.assertRaises(cg.ExitError, multiproc.spawn, lambda: None)
+
+    def receiveExit(self, proc):
+        for i in range(50):
+            if not proc.isAlive():
+                return
+            r = cg.Receiver()
+            r.after(100)
+            r.receive()
+        # end for
+        self.fail("process did not terminate")
+
+
+def echo():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.addHandler(
+        (cg.Process, cg.Any),
+        lambda m: m[0].send((cg.self(), os.getpid(), m[1])) or True,
+        cg.Message,
+    )
+    while r.receive():
+        pass
+    # end while
+
+
+class TestChannel(unittest.TestCase):
+    def testWriteError(self):
+        # An unexpected error from the output doesn't leave the channel locked.
+        channel = Channel(StringIO(""), BrokenOutput())
+        self.assertRaises(RuntimeError, channel.write, ("send", 0, "a"))
+        self.assertRaises(RuntimeError, channel.write, ("send", 0, "b"))
+        self.assertRaises(RuntimeError, channel.close)
+        channel.close()
+
+    def testPicklingError(self):
+        # Processes in a frame that can't be pickled aren't left exported.
+        channel = Channel(StringIO(""), StringIO())
+        proc = cg.spawn(idle)
+        self.assertRaises(
+            cPickle.PicklingError, channel.write, ("send", 0, (proc, lambda: None))
+        )
+        channel.writeReason("exited", 0, (proc, lambda: None))
+        assert channel._Channel__exports == {}
+        channel.write(("send", 0, proc))
+        assert channel._Channel__exports.values() == [proc]
+        proc.send("stop")
+
+    def testSendIgnoresSignal(self):
+        # Like a local send(), sending to a RemoteProcess doesn't check for a
+        # pending signal.
+        output = StringIO()
+        remote = RemoteProcess(Channel(StringIO(""), output), 0)
+        ready = threading.Event()
+        proc = cg.spawn(sendWhenReady, ready, remote, cg.self())
+        cg.exit(proc, "stopped")
+        ready.set()
+        r = cg.Receiver()
+        r.addHandler("sent", lambda: True)
+        assert r.receive(1000, lambda: False)
+        assert output.getvalue()
+
+
+class BrokenOutput:
+    def write(self, data):
+        raise RuntimeError("broken")
+
+    def close(self):
+        raise RuntimeError("broken")
+
+
+def idle():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.receive()
+
+
+def sendWhenReady(ready, remote, proc):
+    ready.wait()
+    remote.send("hello")
+    proc.send("sent")
+
+
+def linkAndIdle(proc):
+    cg.link(proc)
+    idle()
+
+
+def divide(a, b):
+    return a / b
+
+
+def trapChild(proc, func, *args):
+    cg.processFlag("trap_exit", True)
+    child = multiproc.spawnLink(func, *args)
+    r = cg.Receiver()
+    r.addHandler(("EXIT", child, cg.Any), lambda m: proc.send(("reason", m[2])), cg.Message)
+    r.receive()
@@ -0,0 +1,220 @@
+"""Tests for the node module"""
+
+
+import cPickle
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import unittest
+
+import candygram as cg
+from candygram import node
+from candygram.node import Node
+from candygram.channel import RemoteProcess
+
+
+COOKIE = "test cookie"
+
+
+class TestNode(unittest.TestCase):
+    def setUp(self):
+        self.a = Node("a", cookie=COOKIE)
+        self.b = Node("b", cookie=COOKIE)
+
+    def tearDown(self):
+        self.a.stop()
+        self.b.stop()
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def receive(self, pattern):
+        r = cg.Receiver()
+        r.addHandler(pattern, lambda m: m, cg.Message)
+        return r.receive(5000)
+
+    def testSend(self):
+        echoProc = cg.spawn(echo)
+        self.b.register("echo", echoProc)
+        proc = self.a.whereis(self.b.address, "echo")
+        assert isinstance(proc, RemoteProcess)
+        assert proc.node() == "b"
+        assert self.a.whereis(self.b.address, "echo") is proc
+        assert self.a.nodes() == ["b"]
+        proc.send((cg.self(), "hello"))
+        # Our own process comes back as itself, and the echo process as proc.
+        assert self.receive((cg.Process, "hello"))[0] is proc
+        proc.send((cg.self(), cg.self()))
+        assert self.receive((cg.Process, cg.Process))[1] is cg.self()
+        echoProc.send("stop")
+
+    def testWhereisUnknown(self):
+        assert self.a.whereis(self.b.address, "nobody") is None
+        self.b.register("nobody", cg.self())
+        self.b.unregister("nobody")
+        assert self.a.whereis(self.b.address, "nobody") is None
+        self.assertRaises(cg.ExitError, self.b.unregister, "nobody")
+
+    def testExit(self):
+        echoProc = cg.spawn(echo)
+        self.b.register("echo", echoProc)
+        proc = self.a.whereis(self.b.address, "echo")
+        cg.exit(proc, "kill")
+        self.waitForExit(echoProc)
+        self.waitForExit(proc)
+
+    def testLink(self):
+        echoProc = cg.spawn(echo)
+        self.b.register("echo", echoProc)
+        cg.spawn(trapRemote, cg.self(), self.a, self.b.address)
+        self.receive("linked")
+        cg.exit(echoProc, "shutdown")
+        assert self.receive(("reason", cg.Any))[1] == "shutdown"
+
+    def testDisconnect(self):
+        self.b.register("echo", cg.spawn(echo))
+        cg.spawn(trapRemote, cg.self(), self.a, self.b.address)
+        self.receive("linked")
+        self.b.stop()
+        assert self.receive(("reason", cg.Any))[1] == "noconnection"
+
+    def testNoConnection(self):
+        address = self.b.address
+        self.b.stop()
+        self.assertRaises(cg.ExitError, self.a.whereis, address, "echo")
+
+    def testWrongCookie(self):
+        c = Node("c", cookie="other cookie")
+        try:
+            self.assertRaises(cg.ExitError, self.a.whereis, c.address, "echo")
+            self.assertRaises(cg.ExitError, c.whereis, self.a.address, "echo")
+            assert self.a.nodes() == []
+            assert c.nodes() == []
+        finally:
+            c.stop()
+        # end try
+
+    def testUnpickleBeforeHandshake(self):
+        # A peer that doesn't know the cookie can't get a frame unpickled.
+        global Exploited
+        Exploited = False
+        sock = socket.create_connection(self.b.address)
+        try:
+            sock.recv(node.CHALLENGE_SIZE)
+            sock.sendall(cPickle.dumps(Exploit(), 2) * 4)
+            # The node hangs up.
+            sock.settimeout(5)
+            assert sock.recv(1) == ""
+        finally:
+            sock.close()
+        # end try
+        assert not Exploited
+        assert self.b.nodes() == []
+
+    def testDuplicateConnection(self):
+        self.b.register("echo", cg.spawn(echo))
+        proc = self.a.whereis(self.b.address, "echo")
+        ref = cg.monitor(proc)
+        # A second connection from either side is turned down before it carries
+        # anything, and the first one is left alone.
+        for x, y in [(self.a, self.b), (self.b, self.a)]:
+            sock = socket.create_connection(y.address)
+            assert x._Node__handshake(sock, y.address) is None
+        # end for
+        assert self.a.nodes() == ["b"]
+        assert self.b.nodes() == ["a"]
+        assert self.a.whereis(self.b.address, "echo") is proc
+        proc.send((cg.self(), "hello"))
+        assert self.receive((cg.Process, "hello"))[0] is proc
+        r = cg.Receiver()
+        r.addHandler(("DOWN", ref, proc, cg.Any), lambda: "down")
+        assert r.receive(0) is None
+
+    def testSimultaneousConnections(self):
+        # Each side is in the middle of connecting to the other. Both keep the
+        # connection made by the node with the lower address.
+        low, high = sorted([self.a, self.b], key=lambda n: n.address)
+        low._Node__pending[high.address] = (None, True)
+        high._Node__pending[low.address] = (None, True)
+        sock = socket.create_connection(low.address)
+        assert high._Node__handshake(sock, low.address) is None
+        del low._Node__pending[high.address]
+        sock = socket.create_connection(high.address)
+        assert low._Node__handshake(sock, high.address) is not None
+        assert low.nodes() == [high.name]
+        assert high.nodes() == [low.name]
+        self.b.register("echo", cg.spawn(echo))
+        proc = self.a.whereis(self.b.address, "echo")
+        proc.send((cg.self(), "hello"))
+        assert self.receive((cg.Process, "hello"))[0] is proc
+
+    def testDefaultCookie(self):
+        home = os.environ.get("HOME")
+        os.environ["HOME"] = tempfile.mkdtemp()
+        try:
+            cookie = node.defaultCookie()
+            assert cookie and node.defaultCookie() == cookie
+            path = os.path.expanduser(node.COOKIE_FILE)
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0600
+            c = Node("c")
+            c.stop()
+        finally:
+            shutil.rmtree(os.environ["HOME"])
+            if home is None:
+                del os.environ["HOME"]
+            else:
+                os.environ["HOME"] = home
+            # end if
+        # end try
+        self.assertRaises(cg.ExitError, Node, "c", cookie="")
+
+    def waitForExit(self, proc):
+        for i in range(50):
+            if not proc.isAlive():
+                return
+            r = cg.Receiver()
+            r.after(100)
+            r.receive()
+        # end for
+        self.fail("process did not terminate")
+
+
+def echo():
+    r = cg.Receiver()
+    r.addHandler("stop")
+    r.addHandler(
+        (cg.Process, cg.Any), lambda m: m[0].send((cg.self(), m[1])) or True, cg.Message
+    )
+    while r.receive():
+        pass
+    # end while
+
+
+def trapRemote(proc, node, address):
+    cg.processFlag("trap_exit", True)
+    remote = node.whereis(address, "echo")
+    cg.link(remote)
+    proc.send("linked")
+    r = cg.Receiver()
+    r.addHandler(("EXIT", remote, cg.Any), lambda m: proc.send(("reason", m[2])), cg.Message)
+    r.receive()
+
+
+# Set if an Exploit is ever unpickled
+Exploited = False
+
+
+def exploit():
+    global Exploited
+    Exploited = True
+
+
+class Exploit(object):
+    def __reduce__(self):
+        return (exploit, ())
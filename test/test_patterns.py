@@ -4,6 +4,7 @@
 import unittest
 
 import candygram as cg
+from candygram.pattern import genFilter, compileFilter
 
 
 class TestPatterns(unittest.TestCase):
@@ -110,3 +111,67 @@ class TestPatterns(unittest.TestCase):
         self.assertMatch({"S": -65, 19: "bar", "T": "me"})
         self.assertNonMatch({"S": "Charlie", 19: "foo"})
         self.assertNonMatch({"S": 3})
+
+
+# (pattern, values) pairs that exercise every kind of pattern
+FILTER_CASES = [
+    (cg.Any, ["text", 13.7, None]),
+    ("land shark", ["land shark", "dolphin", 42, []]),
+    (int, [13, 0, "text", 13.7]),
+    (lambda x: x > 20, [42, 13]),
+    ((), [(), [], (1,)]),
+    ((str, int), [("shark", 42), ["shark", 42], ("dolphin", 42, 0), ("a",)]),
+    ((str, 20, lambda x: x < 0), [("shark", 20, -1), ("shark", 21, -6)]),
+    ([], [[], [1], ()]),
+    (["A", str, str], [["A", "B", "C", "D"], ["A", "B"], ["A"], ["C", "B"]]),
+    ([str, int], [["dolphin", 42, 0], ["shark"], [42, 0], ["a", 1, "b"]]),
+    ([cg.Any], [["dolphin", 42], [], ("dolphin",), "shark"]),
+    ([int, None], [[1], [1, None], [1, None, None], [1, 2], [None]]),
+    ([None], [[], [None], [None, None], [0]]),
+    ({"S": int, 19: str}, [{"S": 3, 19: "foo"}, {"S": "C", 19: "foo"}, {"S": 3}]),
+    (["x", {}], [["x"], ["x", {}, {1: 2}], ["x", 1], ["y", {}]]),
+    (("x", {}), [("x", {}), ("x", {1: 2}), ("x", 1), ("x",)]),
+    (
+        ("tag", [int, (str, cg.Any)], {"k": [int]}),
+        [
+            ("tag", [1, ("a", None), ("b", 2)], {"k": [1, 2]}),
+            ("tag", [1, ("a", None), (2, 2)], {"k": [1, 2]}),
+            ("tag", [1], {"k": [1, "x"]}),
+            ("tag", [], {"k": []}),
+        ],
+    ),
+]
+
+
+class TestCompiledFilters(unittest.TestCase):
+    def testSameResults(self):
+        for pattern, values in FILTER_CASES:
+            closureFilter = genFilter(pattern)
+            compiledFilter = compileFilter(pattern)
+            for value in values:
+                assert bool(closureFilter(value)) == bool(compiledFilter(value)), (
+                    pattern,
+                    value,
+                )
+            # end for
+        # end for
+
+    def testDictOnNonDict(self):
+        # A dictionary pattern looks up its keys in whatever value it gets.
+        for pattern in [{"a": cg.Any}, {"a": int}, {"a": {}}]:
+            for value in ["abc", ["a"], 5]:
+                self.assertRaises(TypeError, genFilter(pattern), value)
+                self.assertRaises(TypeError, compileFilter(pattern), value)
+            # end for
+        # end for
+        assert not genFilter({"d": cg.Any})("abc")
+        assert not compileFilter({"d": cg.Any})("abc")
+
+    def testCodeCache(self):
+        # Patterns with the same shape share their compiled code.
+        filter1 = compileFilter(("tag1", int, lambda x: x > 1))
+        filter2 = compileFilter(("tag2", str, lambda x: x < 1))
+        assert filter1.func_code is filter2.func_code
+        assert filter1(("tag1", 2, 2))
+        assert not filter1(("tag2", "a", 0))
+        assert filter2(("tag2", "a", 0))
@@ -0,0 +1,111 @@
+"""Tests for the pool module"""
+
+
+import unittest
+
+import candygram as cg
+from candygram.pool import Pool
+
+
+class TestPool(unittest.TestCase):
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testCall(self):
+        pool = Pool(2)
+        assert pool.call(pow, 2, 10) == 1024
+        assert pool.call(dict, a=1) == {"a": 1}
+        self.assertRaises(ZeroDivisionError, pool.call, divide, 1, 0)
+        # The worker survives the exception.
+        assert pool.call(divide, 4, 2) == 2
+        pool.stop()
+
+    def testRoundRobin(self):
+        pool = Pool(3)
+        workers = pool.map(worker, range(6))
+        assert workers == pool.workers() * 2
+        assert pool.map(inverse, [1, 2]) == [1, 0]
+        self.assertRaises(ZeroDivisionError, pool.map, inverse, [1, 0, 2])
+        pool.stop()
+
+    def testLeastLoaded(self):
+        pool = Pool(2, "least_loaded")
+        busy, idle = pool.workers()
+        busy.send("filler")
+        assert [pool.call(worker, i) for i in range(3)] == [idle] * 3
+        pool.stop()
+
+    def testResultMessages(self):
+        pool = Pool(1)
+        taskId = pool.apply(divide, 1, 0)
+        r = cg.Receiver()
+        r.addHandler(("error", taskId, cg.Any), lambda m: m[2], cg.Message)
+        assert r.receive(1000).excInfo[0] is ZeroDivisionError
+        taskId = pool.apply(divide, 6, 3)
+        r = cg.Receiver()
+        r.addHandler(("result", taskId, cg.Any), lambda m: m[2], cg.Message)
+        assert r.receive(1000) == 2
+        pool.stop()
+
+    def testUnrelatedMessages(self):
+        # Messages that merely look like results are left alone.
+        pool = Pool(2)
+        unrelated = [("info", True, "x")]
+        unrelated.extend([("result", i, "y") for i in range(1000)])
+        cg.self().sendMany(unrelated)
+        assert pool.call(divide, 6, 3) == 2
+        assert pool.map(lambda x: x * 2, range(3)) == [0, 2, 4]
+        r = cg.Receiver()
+        r.addHandler((str, cg.Any, str), lambda m: m, cg.Message)
+        assert r.receiveMany(2000, 0) == unrelated
+        pool.stop()
+
+    def testStop(self):
+        pool = Pool(2)
+        pool.stop()
+        r = cg.Receiver()
+        r.after(200)
+        r.receive()
+        for proc in pool.workers():
+            assert not proc.isAlive()
+        self.assertRaises(cg.ExitError, pool.apply, divide, 1, 1)
+
+    def testLinked(self):
+        cg.spawn(killWorker, cg.self())
+        r = cg.Receiver()
+        r.addHandler(("EXIT", cg.Process, "killed"), lambda: "killed")
+        assert r.receive(1000) == "killed"
+
+    def testBadArgs(self):
+        self.assertRaises(cg.ExitError, Pool, 0)
+        self.assertRaises(cg.ExitError, Pool, 1, "random")
+        pool = Pool(1)
+        self.assertRaises(cg.ExitError, pool.apply, None)
+        pool.stop()
+
+
+def divide(a, b):
+    return a / b
+
+
+def inverse(x):
+    return 1 / x
+
+
+def worker(arg):
+    return cg.self()
+
+
+def killWorker(proc):
+    cg.processFlag("trap_exit", True)
+    pool = Pool(1)
+    cg.exit(pool.workers()[0], "kill")
+    r = cg.Receiver()
+    r.addHandler(("EXIT", cg.Process, cg.Any), proc.send, cg.Message)
+    r.receive()
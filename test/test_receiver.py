@@ -99,3 +99,66 @@ class TestReceiver(unittest.TestCase):
         assert r2.receive(0, lambda: "to") == "to"
         with pytest.raises(cg.ExitError):
             r2.removeHandler(refs[1])
+
+    def testReceiveMany(self):
+        r = cg.Receiver()
+        r.addHandler((int, cg.Any), lambda m: m[1], cg.Message)
+        r.addHandler(("odd", cg.Any), lambda m: m, cg.Message)
+        for i in range(5):
+            cg.self().send((i, i * 10))
+            cg.self().send("skipped")
+        assert r.receiveMany(3) == [0, 10, 20]
+        cg.self().send(("odd", 1))
+        assert r.receiveMany(10) == [30, 40, ("odd", 1)]
+        assert r.receiveMany(10, 0, lambda: "to") == ["to"]
+        cg.self().send((5, 50))
+        assert r.receiveMany(10, 0, lambda: "to") == [50]
+        r = cg.Receiver()
+        r.addHandler("skipped")
+        assert r.receiveMany(10) == [None] * 5
+        with pytest.raises(cg.ExitError):
+            r.receiveMany(0)
+
+    def testPriority(self):
+        me = cg.self()
+        r = cg.Receiver()
+        r.addHandler(("low", int), lambda m: m, cg.Message)
+        r.addHandler(("high", int), lambda m: m, cg.Message, _priority=10)
+        r.addHandler(("mid", int), lambda m: m, cg.Message, _priority=5)
+        me.sendMany([("low", 1), ("mid", 1), ("low", 2), ("high", 1), "skipped"])
+        assert r.receive(0) == ("high", 1)
+        me.sendMany([("mid", 2), ("high", 2)])
+        assert r.receive(0) == ("high", 2)
+        assert r.receiveMany(3) == [("mid", 1), ("mid", 2), ("low", 1)]
+        # A message that has been skipped is received first once a handler of
+        # higher priority is added for it.
+        ref = r.addHandler("skipped", lambda: "first", _priority=20)
+        assert r.receive(0) == "first"
+        r.removeHandler(ref)
+        assert r.receive(0) == ("low", 2)
+        assert r.receive(0, lambda: "to") == "to"
+        # Handlers of equal priority are tried in order, and copies keep their
+        # priorities.
+        r2 = cg.Receiver()
+        r2.addHandler(int, lambda: "int")
+        r2.addHandlers(r)
+        r2.addHandler(cg.Any, lambda: "any", _priority=10)
+        me.sendMany([("low", 3), ("high", 5)])
+        assert r2.receive(0) == "any"
+        assert r2.receive(0) == ("high", 5)
+        with pytest.raises(cg.ExitError):
+            r.addHandler(1, _priority="high")
+
+    def testPriorityOtherReceiver(self):
+        # Messages that one Receiver has scanned may be taken by another.
+        me = cg.self()
+        r1 = cg.Receiver()
+        r1.addHandler(("low", int), lambda m: m[1], cg.Message)
+        r1.addHandler(("high", int), lambda m: m[1], cg.Message, _priority=1)
+        me.sendMany([("low", 1), ("low", 2), ("high", 1)])
+        assert r1.receive(0) == 1
+        r2 = cg.Receiver()
+        r2.addHandler(("low", int), lambda m: m[1], cg.Message)
+        assert r2.receive(0) == 1
+        assert r1.receive(0) == 2
+        assert r1.receive(0, lambda: "to") == "to"
@@ -0,0 +1,184 @@
+"""Tests for the supervisor module"""
+
+
+import time
+import unittest
+
+import candygram as cg
+from candygram.supervisor import Supervisor, ChildSpec, supervise
+
+
+class TestSupervisor(unittest.TestCase):
+    def setUp(self):
+        _Generations.clear()
+
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testOneForOne(self):
+        sup = Supervisor(self.specs("a", "b", "c"), "one_for_one", 10)
+        self.started(3)
+        a, b, c = pids(sup)
+        crash(b)
+        assert self.started(1) == [("b", 1)]
+        assert [name for name, proc in sup.children()] == ["a", "b", "c"]
+        assert pids(sup)[0] is a and pids(sup)[2] is c
+        sup.stop()
+
+    def testOneForAll(self):
+        sup = Supervisor(self.specs("a", "b", "c"), "one_for_all", 10)
+        self.started(3)
+        crash(pids(sup)[1])
+        assert sorted(self.started(3)) == [("a", 1), ("b", 1), ("c", 1)]
+        sup.stop()
+
+    def testRestForOne(self):
+        sup = Supervisor(self.specs("a", "b", "c"), "rest_for_one", 10)
+        self.started(3)
+        a = pids(sup)[0]
+        crash(pids(sup)[1])
+        assert sorted(self.started(2)) == [("b", 1), ("c", 1)]
+        assert pids(sup)[0] is a
+        sup.stop()
+
+    def testRestartTypes(self):
+        specs = [
+            ChildSpec("perm", child, ("perm", cg.self())),
+            ChildSpec("trans", child, ("trans", cg.self()), restart="transient"),
+            ChildSpec("temp", child, ("temp", cg.self()), restart="temporary"),
+        ]
+        sup = Supervisor(specs, maxRestarts=10)
+        self.started(3)
+        for proc in pids(sup):
+            proc.send("stop")
+        # end for
+        assert self.started(1) == [("perm", 1)]
+        assert waitFor(lambda: len(sup.children()) == 2)
+        assert [name for name, proc in sup.children()] == ["perm", "trans"]
+        assert sup.children()[1][1] is None
+        sup.stop()
+
+    def testIntensity(self):
+        cg.processFlag("trap_exit", True)
+        try:
+            sup = Supervisor(self.specs("a", "b"), maxRestarts=2, maxSeconds=5)
+            self.started(2)
+            for i in range(2):
+                crash(pids(sup)[0])
+                self.started(1)
+            # end for
+            b = pids(sup)[1]
+            crash(pids(sup)[0])
+            r = cg.Receiver()
+            r.addHandler(("EXIT", sup.process, cg.Any), lambda m: m[2], cg.Message)
+            assert r.receive(1000) == "shutdown"
+            assert not b.isAlive()
+        finally:
+            cg.processFlag("trap_exit", False)
+        # end try
+
+    def testShutdown(self):
+        specs = [
+            ChildSpec("stubborn", stubborn, (cg.self(),), shutdown=100),
+            ChildSpec("killed", stubborn, (cg.self(),), shutdown="brutal_kill"),
+        ]
+        sup = Supervisor(specs)
+        r = cg.Receiver()
+        r.addHandler("trapping")
+        r.receive(1000)
+        r.receive(1000)
+        stubbornProc, killedProc = pids(sup)
+        start = time.time()
+        sup.stop()
+        assert time.time() - start >= 0.1
+        assert not stubbornProc.isAlive() and not killedProc.isAlive()
+        assert waitFor(lambda: not sup.process.isAlive())
+
+    def testStartTerminateChild(self):
+        sup = Supervisor([])
+        proc = sup.startChild(ChildSpec("x", child, ("x", cg.self())))
+        assert self.started(1) == [("x", 0)]
+        assert sup.children() == [("x", proc)]
+        self.assertRaises(cg.ExitError, sup.startChild, ChildSpec("x", child))
+        assert sup.terminateChild("x")
+        assert not proc.isAlive()
+        assert sup.children() == []
+        self.assertRaises(cg.ExitError, sup.terminateChild, "x")
+        sup.stop()
+        self.assertRaises(cg.ExitError, sup.children)
+
+    def testTree(self):
+        inner = [ChildSpec("leaf", child, ("leaf", cg.self()))]
+        specs = [
+            ChildSpec("inner", supervise, (inner, "one_for_one", 10), shutdown=None)
+        ]
+        sup = Supervisor(specs)
+        self.started(1)
+        innerProc = pids(sup)[0]
+        sup.stop()
+        assert not innerProc.isAlive()
+
+    def testBadArgs(self):
+        self.assertRaises(cg.ExitError, ChildSpec, "a", None)
+        self.assertRaises(cg.ExitError, ChildSpec, "a", child, restart="always")
+        self.assertRaises(cg.ExitError, ChildSpec, "a", child, shutdown=-1)
+        self.assertRaises(cg.ExitError, Supervisor, [None])
+        self.assertRaises(cg.ExitError, Supervisor, [], "one_for_some")
+        self.assertRaises(
+            cg.ExitError, Supervisor, [ChildSpec("a", child), ChildSpec("a", child)]
+        )
+
+    def specs(self, *names):
+        return [ChildSpec(name, child, (name, cg.self())) for name in names]
+
+    def started(self, count):
+        """return list of (name, generation) of count children that started"""
+        r = cg.Receiver()
+        r.addHandler(("started", str, int), lambda m: m[1:], cg.Message)
+        return [r.receive(1000) for i in range(count)]
+
+
+# Number of times that each named child has started
+_Generations = {}
+
+
+def child(name, proc):
+    generation = _Generations.get((name, proc), -1) + 1
+    _Generations[(name, proc)] = generation
+    proc.send(("started", name, generation))
+    r = cg.Receiver()
+    r.addHandler("crash", cg.exit, "crashed")
+    r.addHandler("stop")
+    r.receive()
+
+
+def stubborn(proc):
+    cg.processFlag("trap_exit", True)
+    proc.send("trapping")
+    r = cg.Receiver()
+    r.addHandler("never")
+    r.receive()
+
+
+def crash(proc):
+    proc.send("crash")
+
+
+def pids(sup):
+    return [proc for name, proc in sup.children()]
+
+
+def waitFor(predicate):
+    """return True once predicate() is true, or False after a second"""
+    for i in range(100):
+        if predicate():
+            return True
+        time.sleep(0.01)
+    # end for
+    return False
@@ -0,0 +1,68 @@
+"""Tests for the timer module"""
+
+
+import random
+import unittest
+
+from candygram.timer import Timer, TimerWheel, TICK
+
+
+class TestTimerWheel(unittest.TestCase):
+    def testExpire(self):
+        rand = random.Random(42)
+        wheel = TimerWheel(0)
+        # Cover every level, including timers beyond the range of the wheel.
+        delays = [rand.uniform(0, 1) for i in range(200)]
+        delays += [rand.uniform(0, 300) for i in range(200)]
+        delays += [rand.uniform(0, 100000) for i in range(200)]
+        delays += [5e6, 1e7]
+        timers = [Timer(delay, None, ()) for delay in delays]
+        for timer in timers:
+            wheel.add(timer)
+        # end for
+        assert len(wheel) == len(timers)
+        pending = set(timers)
+        now = 0
+        while pending:
+            expire = min([timer.expire for timer in pending])
+            nextExpire = wheel.nextExpire()
+            assert nextExpire <= expire + TICK
+            if rand.random() < 0.5:
+                now = nextExpire
+            else:
+                now = max(nextExpire, now + rand.expovariate(1.0 / (expire - now + 1)))
+            for timer in wheel.popDue(now):
+                assert timer.expire <= now
+                pending.remove(timer)
+            # end for
+            for timer in pending:
+                assert timer.expire > now - TICK
+            # end for
+            assert len(wheel) == len(pending)
+        # end while
+        assert wheel.nextExpire() is None
+
+    def testRemove(self):
+        wheel = TimerWheel(0)
+        timers = [Timer(i * 0.5, None, ()) for i in range(1, 1000)]
+        for timer in timers:
+            wheel.add(timer)
+        # end for
+        for timer in timers[::2]:
+            wheel.remove(timer)
+        # end for
+        assert len(wheel) == len(timers[1::2])
+        assert sorted(wheel.popDue(1000), key=lambda t: t.expire) == timers[1::2]
+        assert len(wheel) == 0
+
+    def testCancel(self):
+        fired = []
+        timer = Timer(0, fired.append, (1,))
+        assert timer.cancel()
+        timer._fire()
+        assert fired == []
+        assert not timer.cancel()
+        timer = Timer(0, fired.append, (2,))
+        timer._fire()
+        assert not timer.cancel()
+        assert fired == [2]
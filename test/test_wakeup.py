@@ -0,0 +1,109 @@
+"""Tests for processes with a wakeup file descriptor"""
+
+
+import select
+import unittest
+
+import candygram as cg
+from candygram.timer import socketpair
+from candygram.wakeup import WakeupProcess
+
+
+class TestWakeup(unittest.TestCase):
+    def tearDown(self):
+        # Remove any spurrious messages from mailbox
+        r = cg.Receiver()
+        timeout = object()
+        r.addHandler(cg.Any)
+        while r.receive(0, lambda: timeout) is not timeout:
+            pass
+        # end while
+
+    def testClear(self):
+        proc = WakeupProcess()
+        assert not isReadable(proc)
+        proc.send("a")
+        proc.send("b")
+        assert isReadable(proc)
+        proc.clear()
+        assert not isReadable(proc)
+        proc.sendMany(["c", "d"])
+        assert isReadable(proc)
+        proc.clear()
+        assert not isReadable(proc)
+
+    def testWakeupDuringClear(self):
+        # A message that arrives while clear() drains the socket must not
+        # keep later messages from making fileno() readable.
+        proc = WakeupProcess()
+        proc.send("a")
+        recv = InterruptedRecv(proc._WakeupProcess__wakeupRecv, proc._wakeup)
+        proc._WakeupProcess__wakeupRecv = recv
+        proc.clear()
+        proc._wakeup()
+        assert isReadable(proc)
+
+    def testSelectLoop(self):
+        sock, peer = socketpair()
+        try:
+            proc = cg.spawn(selectLoop, cg.self(), peer, _processClass=WakeupProcess)
+            r = cg.Receiver()
+            r.addHandler(("reply", cg.Any), lambda m: m[1], cg.Message)
+            proc.send(("echo", 1))
+            assert r.receive(1000) == 1
+            sock.send("data")
+            assert r.receive(1000) == "data"
+            proc.sendMany([("echo", 2), ("echo", 3)])
+            assert r.receive(1000) == 2
+            assert r.receive(1000) == 3
+            ref = cg.monitor(proc)
+            cg.exit(proc, "stop")
+            r = cg.Receiver()
+            r.addHandler(("DOWN", ref, proc, cg.Any), lambda m: m[3], cg.Message)
+            assert r.receive(1000) == "stop"
+        finally:
+            sock.close()
+            peer.close()
+        # end try
+
+
+class InterruptedRecv:
+    """socket wrapper that calls interrupt() during the first recv()"""
+
+    def __init__(self, sock, interrupt):
+        self.__sock = sock
+        self.__interrupt = interrupt
+
+    def recv(self, size):
+        if self.__interrupt is not None:
+            interrupt, self.__interrupt = self.__interrupt, None
+            interrupt()
+        # end if
+        return self.__sock.recv(size)
+
+    def __getattr__(self, name):
+        return getattr(self.__sock, name)
+
+
+def isReadable(proc):
+    return proc in select.select([proc], [], [], 0)[0]
+
+
+def selectLoop(parent, sock):
+    """echo messages and data from sock to parent, without blocking in
+    receive()"""
+    proc = cg.self()
+    r = cg.Receiver()
+    r.addHandler(("echo", cg.Any), lambda m: parent.send(("reply", m[1])), cg.Message)
+    empty = object()
+    while True:
+        readable = select.select([proc, sock], [], [], 5)[0]
+        if proc in readable:
+            proc.clear()
+            while r.receive(0, lambda: empty) is not empty:
+                pass
+            # end while
+        if sock in readable:
+            parent.send(("reply", sock.recv(4096)))
+        # end if
+    # end while